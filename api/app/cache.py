@@ -0,0 +1,79 @@
+"""Процессный TTL-кеш для горячих чтений из БД.
+
+@cached(key_fn, ttl=..., tag=...) оборачивает async-функцию чтения: ключ
+строится из её аргументов, результат живёт ttl секунд. Сервис, который
+пишет данные, сбрасывает ключ (invalidate) или группу ключей
+(invalidate_tag) сразу после записи; TTL ограничивает устаревание при
+правках из других воркеров или напрямую в БД.
+"""
+
+from __future__ import annotations
+
+import copy
+import functools
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+_MAXSIZE = 10_000
+
+# ключ -> (момент истечения, значение); порядок — LRU
+_entries: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+_tags: dict[str, set[str]] = {}
+# Растёт при каждой инвалидации: чтение, начатое до неё, не кладёт
+# в кеш уже устаревший результат
+_generation = 0
+
+
+def cached(
+    key_fn: Callable[..., str],
+    *,
+    ttl: float = 30.0,
+    tag: str | None = None,
+) -> Callable[[Callable[..., Awaitable[T]]], Callable[..., Awaitable[T]]]:
+    """Кешировать результат async-функции; None не кешируется."""
+
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @functools.wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> T:
+            key = key_fn(*args, **kwargs)
+            entry = _entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                _entries.move_to_end(key)
+                return copy.copy(entry[1])
+
+            generation = _generation
+            value = await func(*args, **kwargs)
+            if value is not None and generation == _generation:
+                _store(key, value, ttl, tag)
+            return value
+
+        return wrapper
+
+    return decorator
+
+
+def _store(key: str, value: Any, ttl: float, tag: str | None) -> None:
+    _entries[key] = (time.monotonic() + ttl, copy.copy(value))
+    _entries.move_to_end(key)
+    if tag is not None:
+        _tags.setdefault(tag, set()).add(key)
+    while len(_entries) > _MAXSIZE:
+        _entries.popitem(last=False)
+
+
+def invalidate(key: str) -> None:
+    """Сбросить один ключ."""
+    global _generation
+    _generation += 1
+    _entries.pop(key, None)
+
+
+def invalidate_tag(tag: str) -> None:
+    """Сбросить все ключи, закешированные с этим tag."""
+    global _generation
+    _generation += 1
+    for key in _tags.pop(tag, ()):
+        _entries.pop(key, None)
@@ -1,7 +1,12 @@
 from __future__ import annotations
 
-from typing import Any, Iterable
+import base64
+import json
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import Any, AsyncIterator, Iterable
 
+from psycopg import AsyncConnection, AsyncCursor
 from psycopg_pool import AsyncConnectionPool
 from psycopg.rows import dict_row
 
@@ -9,10 +14,19 @@ from .config import get_settings
 
 _settings = get_settings()
 
+
+async def _configure(conn: AsyncConnection) -> None:
+    conn.prepared_max = _settings.db_prepared_max
+
+
 pool = AsyncConnectionPool(
     conninfo=_settings.db_dsn,
-    min_size=1,
-    max_size=5,
+    min_size=_settings.db_pool_min_size,
+    max_size=_settings.db_pool_max_size,
+    max_idle=_settings.db_pool_max_idle,
+    # Кеш prepared statements на соединение, ключ — текст SQL
+    kwargs={"prepare_threshold": _settings.db_prepare_threshold},
+    configure=_configure,
     open=False,
 )
 
@@ -54,3 +68,36 @@ async def execute_returning(query: str, params: Iterable[Any] | None = None) ->
             row = await cur.fetchone()
             await conn.commit()
             return row
+
+
+@asynccontextmanager
+async def transaction() -> AsyncIterator[AsyncCursor]:
+    """Несколько запросов на одном соединении в одной транзакции (один COMMIT)."""
+    async with pool.connection() as conn:
+        async with conn.transaction():
+            async with conn.cursor(row_factory=dict_row) as cur:
+                yield cur
+
+
+def values_placeholders(rows: int, width: int) -> str:
+    """Плейсхолдеры для multi-row VALUES: ``(%s, %s), (%s, %s), ...``."""
+    row = "(" + ", ".join(["%s"] * width) + ")"
+    return ", ".join([row] * rows)
+
+
+def created_cursor(row: dict, column: str = "created_at") -> str:
+    """Непрозрачный keyset-курсор для списков ORDER BY <column> DESC, id DESC."""
+    value = row[column]
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    raw = json.dumps([value, row["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_created_cursor(cursor: str) -> tuple[datetime, int]:
+    """Разбор created_cursor(); ValueError — если курсор битый."""
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError) as exc:
+        raise ValueError(f"Invalid cursor: {cursor}") from exc
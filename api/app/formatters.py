@@ -754,6 +754,15 @@ def trim_text(text: str, limit: int, suffix: str = "...") -> str:
     return text[: max(0, limit - len(suffix))] + suffix
 
 
+_HTML_ESCAPES = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&#x27;",
+})
+
+
 def escape_html(text: str) -> str:
     """
     Экранирование HTML-символов для Telegram.
@@ -768,10 +777,4 @@ def escape_html(text: str) -> str:
         >>> escape_html("<script>alert('xss')</script>")
         '&lt;script&gt;alert(&#x27;xss&#x27;)&lt;/script&gt;'
     """
-    return (
-        text.replace("&", "&amp;")
-        .replace("<", "&lt;")
-        .replace(">", "&gt;")
-        .replace('"', "&quot;")
-        .replace("'", "&#x27;")
-    )
+    return text.translate(_HTML_ESCAPES)
@@ -11,7 +11,10 @@ from fastapi import FastAPI
 from .config import get_settings
 from .db import init_pool, close_pool, execute
 from .telegram_client import close_client
+from .services import calendar as calendar_service
+from .services.predictions import close_llm_client
 from .services import templates as template_service
+from .services import updates as update_service
 from .services.bots import BotRegistry, auto_register_from_env
 from .routers import health, messages, media, templates, commands, callbacks, chats, webhook, polls, reactions, updates, actions, checklists, predictions, balance, bots, webui, calendar, forums, stories, suggested_posts, sync, chat_data, users, stats
 
@@ -54,8 +57,17 @@ async def lifespan(app: FastAPI) -> AsyncIterator[None]:
             await template_service.seed_templates_from_files()
         except Exception:
             pass
+    calendar_service.start_history_writer()
+    update_service.start_webhook_writer()
+    update_service.start_entity_writer()
+    update_service.start_webhook_purger(settings.webhook_updates_retention_days)
     yield
+    await update_service.stop_webhook_purger()
+    await update_service.stop_entity_writer()
+    await update_service.stop_webhook_writer()
+    await calendar_service.stop_history_writer()
     await close_client()
+    await close_llm_client()
     await close_pool()
 
 
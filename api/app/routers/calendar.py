@@ -42,7 +42,7 @@ async def create_calendar(payload: CreateCalendarIn):
             title=payload.title,
             description=payload.description,
             owner_id=payload.owner_id,
-            chat_id=str(payload.chat_id) if payload.chat_id else None,
+            chat_id=payload.chat_id or None,
             bot_id=payload.bot_id,
             timezone=payload.timezone,
             is_public=payload.is_public,
@@ -87,8 +87,6 @@ async def update_calendar(calendar_id: int, payload: UpdateCalendarIn):
         raise HTTPException(status_code=404, detail="Calendar not found")
 
     updates = payload.model_dump(exclude_none=True)
-    if "chat_id" in updates and updates["chat_id"] is not None:
-        updates["chat_id"] = str(updates["chat_id"])
     if updates:
         await cal_svc.update_calendar(calendar_id, **updates)
     return {"ok": True, "calendar": await cal_svc.get_calendar(calendar_id)}
@@ -198,19 +196,24 @@ async def list_entries(
     source_module: str | None = Query(None, description="Модуль-источник"),
     limit: int = Query(50, ge=1, le=500),
     offset: int = Query(0, ge=0),
+    cursor: str | None = Query(None, description="next_cursor предыдущей страницы (вместо offset)"),
 ):
     """Список записей с фильтрами."""
     tag_list = [t.strip() for t in tags.split(",") if t.strip()] if tags else None
-    entries = await cal_svc.list_entries(
-        calendar_id=calendar_id,
-        start=start, end=end,
-        tags=tag_list, status=status, priority=priority,
-        ai_actionable=ai_actionable, series_id=series_id,
-        entry_type=entry_type, trigger_status=trigger_status,
-        source_module=source_module,
-        limit=limit, offset=offset,
-    )
-    return {"ok": True, "entries": entries, "count": len(entries)}
+    try:
+        entries = await cal_svc.list_entries(
+            calendar_id=calendar_id,
+            start=start, end=end,
+            tags=tag_list, status=status, priority=priority,
+            ai_actionable=ai_actionable, series_id=series_id,
+            entry_type=entry_type, trigger_status=trigger_status,
+            source_module=source_module,
+            limit=limit, offset=offset, cursor=cursor,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    next_cursor = cal_svc.entry_cursor(entries[-1]) if len(entries) == limit else None
+    return {"ok": True, "entries": entries, "count": len(entries), "next_cursor": next_cursor}
 
 
 @router.get("/entries/{entry_id}")
@@ -232,62 +235,53 @@ async def get_chain(entry_id: int):
 @router.put("/entries/{entry_id}")
 async def update_entry(entry_id: int, payload: UpdateEntryIn):
     """Обновить запись."""
-    entry = await cal_svc.get_entry(entry_id)
-    if not entry:
-        raise HTTPException(status_code=404, detail="Entry not found")
-
     updates = payload.model_dump(exclude_none=True)
     performed_by = updates.pop("performed_by", None)
-    if updates:
-        await cal_svc.update_entry(entry_id, performed_by=performed_by, **updates)
-    return {"ok": True, "entry": await cal_svc.get_entry(entry_id)}
+    entry = await cal_svc.update_entry(entry_id, performed_by=performed_by, **updates)
+    if not entry:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return {"ok": True, "entry": entry}
 
 
 @router.post("/entries/{entry_id}/move")
 async def move_entry(entry_id: int, payload: MoveEntryIn):
     """Переместить запись на новое время."""
-    entry = await cal_svc.get_entry(entry_id)
-    if not entry:
-        raise HTTPException(status_code=404, detail="Entry not found")
-
-    await cal_svc.move_entry(
+    entry = await cal_svc.move_entry(
         entry_id,
         start_at=payload.start_at,
         end_at=payload.end_at,
         performed_by=payload.performed_by,
     )
-    return {"ok": True, "entry": await cal_svc.get_entry(entry_id)}
+    if not entry:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return {"ok": True, "entry": entry}
 
 
 @router.post("/entries/{entry_id}/status")
 async def set_entry_status(entry_id: int, payload: SetStatusIn):
     """Изменить статус записи."""
-    entry = await cal_svc.get_entry(entry_id)
-    if not entry:
-        raise HTTPException(status_code=404, detail="Entry not found")
-
-    await cal_svc.set_status(
+    entry = await cal_svc.set_status(
         entry_id,
         status=payload.status,
         performed_by=payload.performed_by,
     )
-    return {"ok": True, "entry": await cal_svc.get_entry(entry_id)}
+    if not entry:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return {"ok": True, "entry": entry}
 
 
 @router.post("/entries/{entry_id}/fire")
 async def fire_entry(entry_id: int, payload: FireEntryIn):
     """Записать результат исполнения триггера."""
-    entry = await cal_svc.get_entry(entry_id)
-    if not entry:
-        raise HTTPException(status_code=404, detail="Entry not found")
-
-    await cal_svc.fire_entry(
+    entry = await cal_svc.fire_entry(
         entry_id,
         result=payload.result,
         trigger_status=payload.trigger_status,
         performed_by=payload.performed_by,
     )
-    return {"ok": True, "entry": await cal_svc.get_entry(entry_id)}
+    if not entry:
+        raise HTTPException(status_code=404, detail="Entry not found")
+    return {"ok": True, "entry": entry}
 
 
 @router.post("/entries/{entry_id}/tick")
@@ -369,13 +363,16 @@ async def get_upcoming(
 
 
 @router.get("/calendars/{calendar_id}/preview.png")
-async def get_preview(calendar_id: int):
-    """Превью-изображение календаря (PNG 800x420)."""
+async def get_preview(
+    calendar_id: int,
+    scale: float = Query(1.0, ge=0.25, le=1.0, description="Масштаб холста: 1.0 — 4K, 0.5 — 1920×909 (округляется до 0.25, 0.5, 0.75 или 1.0)"),
+):
+    """Превью-изображение календаря (PNG 4K 19:9 или уменьшенное через scale)."""
     cal = await cal_svc.get_calendar(calendar_id)
     if not cal:
         raise HTTPException(status_code=404, detail="Calendar not found")
 
-    png_data = await calendar_preview.generate_preview(calendar_id)
+    png_data = await calendar_preview.generate_preview(calendar_id, scale=scale)
     return Response(
         content=png_data,
         media_type="image/png",
@@ -8,6 +8,7 @@ from typing import Any
 from fastapi import APIRouter
 
 from ..db import fetch_all
+from ..services import updates as updates_svc
 
 router = APIRouter()
 
@@ -30,4 +31,10 @@ async def metrics_api() -> dict[str, Any]:
         ORDER BY status
         """
     )
-    return {"message_status": rows}
+    return {
+        "message_status": rows,
+        "dropped": {
+            "webhook_updates": updates_svc.dropped_webhook_rows(),
+            "entity_writes": updates_svc.dropped_entity_writes(),
+        },
+    }
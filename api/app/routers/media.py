@@ -385,11 +385,8 @@ async def send_media_group_api(payload: SendMediaGroupIn) -> dict[str, Any]:
     messages = result if isinstance(result, list) else [result]
     media_group_id = messages[0].get("media_group_id") if messages else None
 
-    saved_messages = []
+    rows = []
     for msg in messages:
-        telegram_message_id = msg.get("message_id")
-        text_content = msg.get("caption", "")
-
         # Определяем тип медиа
         message_type = "photo"
         if "video" in msg:
@@ -397,27 +394,25 @@ async def send_media_group_api(payload: SendMediaGroupIn) -> dict[str, Any]:
         elif "document" in msg:
             message_type = "document"
 
-        row = await message_service.create_message(
-            chat_id=payload.chat_id,
-            bot_id=resolved_bot_id,
-            direction="outbound",
-            text=text_content,
-            parse_mode=None,  # parse_mode обязательный параметр
-            status="sent",
-            request_id=payload.request_id,
-            payload=telegram_payload,
-            is_live=False,
-            reply_to_message_id=payload.reply_to_message_id,
-            message_thread_id=payload.message_thread_id,
-            message_type=message_type,
-        )
-
-        await message_service.update_message(
-            row["id"],
-            telegram_message_id=telegram_message_id,
-            sent=True,
-        )
-        saved_messages.append(await message_service.get_message(row["id"]))
+        rows.append({
+            "chat_id": payload.chat_id,
+            "bot_id": resolved_bot_id,
+            "direction": "outbound",
+            "text": msg.get("caption", ""),
+            "parse_mode": None,
+            "status": "sent",
+            "request_id": payload.request_id,
+            "payload": telegram_payload,
+            "is_live": False,
+            "reply_to_message_id": payload.reply_to_message_id,
+            "message_thread_id": payload.message_thread_id,
+            "message_type": message_type,
+            "telegram_message_id": msg.get("message_id"),
+            "sent": True,
+        })
+
+    # Все сообщения группы — одним INSERT вместо create/update/get на каждое
+    saved_messages = await message_service.create_messages_bulk(rows)
 
     return {
         "ok": True,
@@ -6,6 +6,7 @@ from typing import Any
 
 from fastapi import APIRouter, HTTPException
 
+from ..db import created_cursor
 from ..models import (
     EditMessageIn,
     SendMessageIn,
@@ -233,15 +234,21 @@ async def list_messages_api(
     status: str | None = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: str | None = None,
 ) -> dict[str, Any]:
-    rows = await message_service.list_messages(
-        chat_id=chat_id,
-        bot_id=bot_id,
-        status=status,
-        limit=limit,
-        offset=offset,
-    )
-    return {"items": rows, "count": len(rows)}
+    try:
+        rows = await message_service.list_messages(
+            chat_id=chat_id,
+            bot_id=bot_id,
+            status=status,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    next_cursor = created_cursor(rows[-1]) if len(rows) == limit else None
+    return {"items": rows, "count": len(rows), "next_cursor": next_cursor}
 
 
 @router.post("/forward")
@@ -6,6 +6,7 @@ from typing import Any
 
 from fastapi import APIRouter, HTTPException
 
+from ..db import created_cursor
 from ..models import SendPollIn
 from ..services import messages as message_service
 from ..services import polls as poll_service
@@ -159,10 +160,17 @@ async def list_polls_api(
     bot_id: int | None = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: str | None = None,
 ) -> dict[str, Any]:
-    """Список опросов."""
-    rows = await poll_service.list_polls(chat_id=chat_id, bot_id=bot_id, limit=limit, offset=offset)
-    return {"items": rows, "count": len(rows)}
+    """Список опросов (cursor — next_cursor предыдущей страницы вместо offset)."""
+    try:
+        rows = await poll_service.list_polls(
+            chat_id=chat_id, bot_id=bot_id, limit=limit, offset=offset, cursor=cursor,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    next_cursor = created_cursor(rows[-1]) if len(rows) == limit else None
+    return {"items": rows, "count": len(rows), "next_cursor": next_cursor}
 
 
 @router.get("/{poll_id}")
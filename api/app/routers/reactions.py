@@ -6,6 +6,7 @@ from typing import Any
 
 from fastapi import APIRouter, HTTPException
 
+from ..db import created_cursor
 from ..models import SetMessageReactionIn
 from ..services import reactions as reaction_service
 from ..services.bots import BotRegistry
@@ -47,16 +48,22 @@ async def list_reactions_api(
     user_id: str | None = None,
     limit: int = 100,
     offset: int = 0,
+    cursor: str | None = None,
 ) -> dict[str, Any]:
-    """Список реакций с фильтрацией."""
-    rows = await reaction_service.list_reactions(
-        message_id=message_id,
-        chat_id=chat_id,
-        user_id=user_id,
-        limit=limit,
-        offset=offset,
-    )
-    return {"items": rows, "count": len(rows)}
+    """Список реакций с фильтрацией (cursor — next_cursor предыдущей страницы вместо offset)."""
+    try:
+        rows = await reaction_service.list_reactions(
+            message_id=message_id,
+            chat_id=chat_id,
+            user_id=user_id,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    next_cursor = created_cursor(rows[-1], "date") if len(rows) == limit else None
+    return {"items": rows, "count": len(rows), "next_cursor": next_cursor}
 
 
 @router.get("/{chat_id}/{message_id}")
@@ -7,6 +7,7 @@ from typing import Any
 from fastapi import APIRouter, HTTPException
 from fastapi.responses import JSONResponse
 
+from ..db import created_cursor
 from ..models import SetWebhookIn
 from ..services import updates as update_service
 from ..telegram_client import (
@@ -46,10 +47,39 @@ async def list_updates_api(
     offset: int = 0,
     update_type: str | None = None,
     bot_id: int | None = None,
+    cursor: str | None = None,
+    include_payload: bool = True,
 ) -> dict[str, Any]:
-    """List stored inbound updates with optional filters."""
-    rows = await update_service.list_updates(limit=limit, offset=offset, update_type=update_type, bot_id=bot_id)
-    return {"items": rows, "count": len(rows)}
+    """List stored inbound updates (cursor — next_cursor of the previous page instead of offset)."""
+    try:
+        rows = await update_service.list_updates(
+            limit=limit,
+            offset=offset,
+            update_type=update_type,
+            bot_id=bot_id,
+            cursor=cursor,
+            include_payload=include_payload,
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+    next_cursor = created_cursor(rows[-1], "received_at") if len(rows) == limit else None
+    return {"items": rows, "count": len(rows), "next_cursor": next_cursor}
+
+
+@router.get("/v1/updates/{update_row_id}/payload")
+async def get_update_payload_api(update_row_id: int) -> dict[str, Any]:
+    """Full JSON of a stored update (list with include_payload=false omits it)."""
+    payload = await update_service.get_update_payload(update_row_id)
+    if payload is None:
+        raise HTTPException(status_code=404, detail="update not found")
+    return {"id": update_row_id, "payload": payload}
+
+
+@router.post("/v1/updates/import")
+async def import_updates_api(updates: list[dict[str, Any]], bot_id: int | None = None) -> dict[str, Any]:
+    """Bulk-load stored updates (replay/backfill) without running update handlers."""
+    count = await update_service.bulk_ingest_updates(updates, bot_id=bot_id)
+    return {"ok": True, "count": count}
 
 
 @router.post("/v1/webhook/set")
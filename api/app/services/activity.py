@@ -50,7 +50,7 @@ async def log_activity(
                 status,
                 error,
                 duration_ms,
-                json.dumps(metadata or {}),
+                json.dumps(metadata) if metadata else "{}",
             ],
         )
     except Exception as exc:  # pragma: no cover - best effort logging
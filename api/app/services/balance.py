@@ -9,6 +9,8 @@ from __future__ import annotations
 import logging
 from typing import Any
 
+from psycopg import AsyncCursor
+
 from ..db import execute, execute_returning, fetch_all, fetch_one
 
 logger = logging.getLogger(__name__)
@@ -137,6 +139,83 @@ async def add_to_balance(
     return new_balance
 
 
+async def credit_many(
+    credits: list[tuple[int, int, int | None]],
+    transaction_type: str = "win",
+    reference_type: str | None = None,
+    description: str | None = None,
+    *,
+    cur: AsyncCursor | None = None,
+) -> None:
+    """
+    Пакетное зачисление: один запрос вместо add_to_balance на каждую строку.
+
+    Args:
+        credits: Список (user_id, amount, reference_id); amount > 0
+        transaction_type: Тип транзакции (deposit, win, refund)
+        reference_type: Тип ссылки
+        description: Описание транзакции (общее для пачки)
+        cur: Курсор открытой транзакции (db.transaction()); без него —
+            отдельный запрос
+
+    balance_before/balance_after в истории считаются нарастающим итогом
+    по пользователю в порядке credits — как при последовательных вызовах
+    add_to_balance.
+    """
+    if not credits:
+        return
+    if any(amount <= 0 for _, amount, _ in credits):
+        raise ValueError("Amount must be positive")
+
+    user_ids = [user_id for user_id, _, _ in credits]
+    amounts = [amount for _, amount, _ in credits]
+    reference_ids = [reference_id for _, _, reference_id in credits]
+
+    await (cur.execute if cur is not None else execute)(
+        """
+        WITH c AS (
+            SELECT *
+            FROM unnest(%s::bigint[], %s::int[], %s::int[])
+                 WITH ORDINALITY AS c(user_id, amount, reference_id, ord)
+        ), base AS (
+            SELECT user_id, balance
+            FROM user_balances
+            WHERE user_id IN (SELECT user_id FROM c)
+            FOR UPDATE
+        ), upsert AS (
+            INSERT INTO user_balances (user_id, balance, total_deposited, total_won)
+            SELECT user_id,
+                   SUM(amount),
+                   CASE WHEN %s = 'deposit' THEN SUM(amount) ELSE 0 END,
+                   CASE WHEN %s = 'win' THEN SUM(amount) ELSE 0 END
+            FROM c
+            GROUP BY user_id
+            ON CONFLICT (user_id) DO UPDATE
+            SET balance = user_balances.balance + EXCLUDED.balance,
+                total_deposited = user_balances.total_deposited + EXCLUDED.total_deposited,
+                total_won = user_balances.total_won + EXCLUDED.total_won,
+                updated_at = NOW()
+        )
+        INSERT INTO balance_transactions
+        (user_id, amount, balance_before, balance_after, transaction_type, reference_type, reference_id, description)
+        SELECT c.user_id,
+               c.amount,
+               COALESCE(b.balance, 0) + SUM(c.amount) OVER w - c.amount,
+               COALESCE(b.balance, 0) + SUM(c.amount) OVER w,
+               %s, %s, c.reference_id, %s
+        FROM c
+        LEFT JOIN base b ON b.user_id = c.user_id
+        WINDOW w AS (PARTITION BY c.user_id ORDER BY c.ord)
+        ORDER BY c.ord
+        """,
+        [user_ids, amounts, reference_ids,
+         transaction_type, transaction_type,
+         transaction_type, reference_type, description],
+    )
+
+    logger.info(f"Credited {sum(amounts)}⭐ to {len(set(user_ids))} users ({transaction_type}, {len(credits)} transactions)")
+
+
 async def deduct_from_balance(
     user_id: int,
     amount: int,
@@ -144,7 +223,7 @@ async def deduct_from_balance(
     reference_type: str | None = None,
     reference_id: int | None = None,
     description: str | None = None,
-) -> bool:
+) -> int | None:
     """
     Списать с баланса пользователя.
 
@@ -157,54 +236,40 @@ async def deduct_from_balance(
         description: Описание транзакции
 
     Returns:
-        True если успешно, False если недостаточно средств
+        Новый баланс, или None если недостаточно средств
     """
     if amount <= 0:
         raise ValueError("Amount must be positive")
 
-    current_balance = await get_user_balance(user_id)
-
-    if current_balance < amount:
-        return False
-
-    # Списать
-    update_fields = ["balance = balance - %s"]
-    params = [amount]
-
-    if transaction_type == "bet":
-        # При ставке не обновляем total_lost (это сделаем при проигрыше)
-        pass
-    elif transaction_type == "withdrawal":
-        update_fields.append("total_withdrawn = total_withdrawn + %s")
-        params.append(amount)
-
-    params.append(user_id)
-    params.append(amount)  # Для WHERE
-
-    await execute(
-        f"""
-        UPDATE user_balances
-        SET {', '.join(update_fields)}, updated_at = NOW()
-        WHERE user_id = %s AND balance >= %s
-        """,
-        params
-    )
-
-    new_balance = current_balance - amount
-
-    # Записать транзакцию
-    await execute(
+    # Проверка остатка, списание и запись транзакции — одним запросом:
+    # UPDATE с условием balance >= amount атомарен, транзакция пишется
+    # только если строка действительно обновилась
+    row = await execute_returning(
         """
+        WITH upd AS (
+            UPDATE user_balances
+            SET balance = balance - %s,
+                total_withdrawn = total_withdrawn + CASE WHEN %s = 'withdrawal' THEN %s ELSE 0 END,
+                updated_at = NOW()
+            WHERE user_id = %s AND balance >= %s
+            RETURNING balance
+        )
         INSERT INTO balance_transactions
         (user_id, amount, balance_before, balance_after, transaction_type, reference_type, reference_id, description)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+        SELECT %s, %s, balance + %s, balance, %s, %s, %s, %s
+        FROM upd
+        RETURNING balance_after
         """,
-        [user_id, -amount, current_balance, new_balance, transaction_type, reference_type, reference_id, description]
+        [amount, transaction_type, amount, user_id, amount,
+         user_id, -amount, amount, transaction_type, reference_type, reference_id, description],
     )
+    if row is None:
+        return None
 
+    new_balance = row["balance_after"]
     logger.info(f"Deducted {amount}⭐ from user {user_id} balance ({transaction_type}). New balance: {new_balance}⭐")
 
-    return True
+    return new_balance
 
 
 async def record_loss(user_id: int, amount: int) -> None:
@@ -227,6 +292,32 @@ async def record_loss(user_id: int, amount: int) -> None:
     )
 
 
+async def record_losses(
+    losses: list[tuple[int, int]],
+    *,
+    cur: AsyncCursor | None = None,
+) -> None:
+    """
+    Пакетный record_loss: total_lost по всем (user_id, amount) одним запросом.
+
+    cur — курсор открытой транзакции, если запись должна войти в неё.
+    """
+    if not losses:
+        return
+    await (cur.execute if cur is not None else execute)(
+        """
+        INSERT INTO user_balances (user_id, total_lost)
+        SELECT user_id, SUM(amount)
+        FROM unnest(%s::bigint[], %s::int[]) AS l(user_id, amount)
+        GROUP BY user_id
+        ON CONFLICT (user_id) DO UPDATE
+        SET total_lost = user_balances.total_lost + EXCLUDED.total_lost,
+            updated_at = NOW()
+        """,
+        [[user_id for user_id, _ in losses], [amount for _, amount in losses]],
+    )
+
+
 async def get_balance_history(
     user_id: int,
     limit: int = 50,
@@ -6,26 +6,40 @@
 
 from __future__ import annotations
 
-import re
+import asyncio
+import base64
+import json
+import logging
 from datetime import datetime, timedelta, timezone
-from typing import Any
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Any, Mapping
 
-from psycopg.types.json import Json
+from psycopg.types.json import Json, Jsonb
 
-from ..db import execute, execute_returning, fetch_all, fetch_one
+from ..db import (
+    execute,
+    execute_returning,
+    fetch_all,
+    fetch_one,
+    transaction,
+    values_placeholders,
+)
+
+logger = logging.getLogger(__name__)
 
 # ---------------------------------------------------------------------------
 # Вспомогательные функции
 # ---------------------------------------------------------------------------
 
-# Цвета для тегов (детерминированный выбор)
-_TAG_COLORS: dict[str, str] = {
+# Цвета для тегов (детерминированный выбор); ключи — только в нижнем регистре
+_TAG_COLORS: Mapping[str, str] = MappingProxyType({
     "work": "#4A90D9",
     "personal": "#9B59B6",
     "meeting": "#2ECC71",
     "deadline": "#E74C3C",
     "idea": "#F39C12",
-}
+})
 
 # Цвета для приоритетов (5 = критичный, 1 = низкий)
 _PRIORITY_COLORS: dict[int, str] = {
@@ -40,20 +54,128 @@ _PRIORITY_COLORS: dict[int, str] = {
 def _auto_color(tags: list[str] | None, priority: int) -> str:
     """Детерминированный выбор цвета: первый тег с цветом, иначе по приоритету."""
     if tags:
-        for tag in tags:
-            color = _TAG_COLORS.get(tag.lower())
-            if color:
-                return color
+        color = next((c for tag in tags if (c := _TAG_COLORS.get(tag.lower()))), None)
+        if color:
+            return color
     return _PRIORITY_COLORS.get(priority, "#FFC107")
 
 
+# ---------------------------------------------------------------------------
+# История изменений — фоновая запись пачками
+# ---------------------------------------------------------------------------
+
+_HISTORY_FLUSH_INTERVAL = 0.05  # секунд между пачками
+_HISTORY_BATCH_MAX = 500
+
+_history_queue: asyncio.Queue[tuple[int, str, Json, str | None, datetime]] | None = None
+_history_task: asyncio.Task | None = None
+# Держит writer, пока пачка вынута из очереди и не записана: flush_history
+# дожидается её, иначе get_entry_history не увидел бы последние изменения
+_history_lock = asyncio.Lock()
+
+
+async def _write_history_batch(
+    batch: list[tuple[int, str, Json, str | None, datetime]],
+) -> None:
+    """Один multi-row INSERT в calendar_entry_history.
+
+    JOIN с calendar_entries отбрасывает строки уже удалённых записей
+    (каскад всё равно удалил бы их историю) — иначе FK уронил бы всю пачку.
+    """
+    values: list[Any] = []
+    for row in batch:
+        values.extend(row)
+    await execute(
+        f"""
+        INSERT INTO calendar_entry_history (entry_id, action, changes, performed_by, created_at)
+        SELECT v.entry_id, v.action, v.changes, v.performed_by, v.created_at
+        FROM (VALUES {values_placeholders(len(batch), 5)})
+            AS v(entry_id, action, changes, performed_by, created_at)
+        JOIN calendar_entries ce ON ce.id = v.entry_id::bigint
+        """,
+        values,
+    )
+
+
+def _drain_history_queue(limit: int | None = None) -> list[tuple]:
+    """Забрать из очереди до limit элементов без ожидания."""
+    batch: list[tuple] = []
+    while _history_queue is not None and not _history_queue.empty():
+        if limit is not None and len(batch) >= limit:
+            break
+        batch.append(_history_queue.get_nowait())
+    return batch
+
+
+async def _history_writer() -> None:
+    """Фоновый цикл: ждёт первую запись, копит пачку ~50 мс, пишет одним INSERT."""
+    assert _history_queue is not None
+    while True:
+        batch = [await _history_queue.get()]
+        try:
+            async with _history_lock:
+                await asyncio.sleep(_HISTORY_FLUSH_INTERVAL)
+                batch.extend(_drain_history_queue(_HISTORY_BATCH_MAX - 1))
+                await _write_history_batch(batch)
+        except asyncio.CancelledError:
+            # Остановка посреди пачки: строки уже вынуты из очереди и
+            # flush их не увидит — дописать перед выходом
+            try:
+                await _write_history_batch(batch)
+            except Exception as exc:
+                logger.warning("Failed to write calendar history batch (%d rows): %s", len(batch), exc)
+            raise
+        except Exception as exc:
+            logger.warning("Failed to write calendar history batch (%d rows): %s", len(batch), exc)
+
+
+def start_history_writer() -> None:
+    """Запуск фоновой записи истории (lifespan приложения)."""
+    global _history_queue, _history_task
+    if _history_task is not None:
+        return
+    _history_queue = asyncio.Queue()
+    _history_task = asyncio.create_task(_history_writer())
+
+
+async def flush_history() -> None:
+    """Синхронно записать всё, что накопилось в очереди, и дождаться пачки writer'а."""
+    async with _history_lock:
+        while batch := _drain_history_queue(_HISTORY_BATCH_MAX):
+            await _write_history_batch(batch)
+
+
+async def stop_history_writer() -> None:
+    """Остановка фоновой записи с дозаписью хвоста очереди."""
+    global _history_queue, _history_task
+    if _history_task is None:
+        return
+    _history_task.cancel()
+    try:
+        await _history_task
+    except asyncio.CancelledError:
+        pass
+    await flush_history()
+    _history_queue = None
+    _history_task = None
+
+
 async def _record_history(
     entry_id: int,
     action: str,
     changes: dict[str, Any] | None = None,
     performed_by: str | None = None,
 ) -> None:
-    """Запись в лог изменений calendar_entry_history."""
+    """Запись в лог изменений calendar_entry_history.
+
+    При запущенном writer'е — неблокирующая постановка в очередь
+    (время фиксируется здесь), иначе — прямой INSERT.
+    """
+    if _history_queue is not None:
+        _history_queue.put_nowait(
+            (entry_id, action, Json(changes or {}), performed_by, datetime.now(timezone.utc))
+        )
+        return
     await execute(
         """
         INSERT INTO calendar_entry_history (entry_id, action, changes, performed_by)
@@ -63,10 +185,102 @@ async def _record_history(
     )
 
 
+@lru_cache(maxsize=256)
+def _update_returning_old_sql(assignments: tuple[str, ...]) -> str:
+    """SQL для _update_entry_returning_old (кеш по набору SET-выражений)."""
+    return f"""
+        WITH old AS (
+            SELECT * FROM calendar_entries WHERE id = %s FOR UPDATE
+        )
+        UPDATE calendar_entries ce
+        SET {', '.join(assignments)}
+        FROM old
+        WHERE ce.id = old.id
+        RETURNING ce.*, to_jsonb(old) AS old_row
+    """
+
+
+async def _update_entry_returning_old(
+    entry_id: int,
+    assignments: list[str],
+    values: list[Any],
+) -> tuple[dict, dict] | None:
+    """UPDATE записи одним запросом, возвращает (старая, новая) версии.
+
+    Старая версия читается в CTE под FOR UPDATE и отдаётся через
+    RETURNING как JSONB — без отдельного get_entry перед записью.
+    """
+    row = await execute_returning(
+        _update_returning_old_sql(tuple(assignments)),
+        [entry_id, *values],
+    )
+    if not row:
+        return None
+    old = row.pop("old_row")
+    return old, row
+
+
+@lru_cache(maxsize=1024)
+def _update_if_changed_sql(columns: tuple[str, ...]) -> str:
+    """SQL для _update_entry_if_changed (кеш по набору колонок)."""
+    assignments = ", ".join(f"{column} = %s" for column in columns)
+    current = ", ".join(f"ce.{column}" for column in columns)
+    dirty = ", ".join(
+        f"CASE WHEN old.{column} IS DISTINCT FROM ce.{column} THEN '{column}' END"
+        for column in columns
+    )
+    return f"""
+        WITH old AS (
+            SELECT * FROM calendar_entries WHERE id = %s FOR UPDATE
+        )
+        UPDATE calendar_entries ce
+        SET {assignments}
+        FROM old
+        WHERE ce.id = old.id
+          AND ROW({current}) IS DISTINCT FROM ROW({', '.join(['%s'] * len(columns))})
+        RETURNING ce.*, to_jsonb(old) AS old_row,
+                  array_remove(ARRAY[{dirty}]::text[], NULL) AS dirty_columns
+    """
+
+
+async def _update_entry_if_changed(
+    entry_id: int,
+    columns: list[str],
+    values: list[Any],
+) -> tuple[dict, dict, list[str]] | None:
+    """UPDATE только если хотя бы одна колонка реально меняется.
+
+    Строка не переписывается (и JSONB не перетостится), если все новые
+    значения IS NOT DISTINCT FROM текущих. Какие колонки изменились,
+    вычисляет сам Postgres — возвращает (старая, новая, dirty-колонки)
+    или None, если записи нет либо изменений нет.
+    """
+    row = await execute_returning(
+        _update_if_changed_sql(tuple(columns)),
+        [entry_id, *values, *values],
+    )
+    if not row:
+        return None
+    old = row.pop("old_row")
+    dirty_columns = row.pop("dirty_columns")
+    return old, row, dirty_columns
+
+
 # ---------------------------------------------------------------------------
 # Календари — CRUD
 # ---------------------------------------------------------------------------
 
+
+def _chat_id_text(chat_id: int | str | None) -> str | None:
+    """chat_id в представлении колонки calendars.chat_id (TEXT, как chats.chat_id).
+
+    Единственная точка приведения: параметр всегда уходит как text,
+    поэтому сравнение chat_id = %s идёт по idx_calendars_chat без
+    неявных кастов, а @username-чаты продолжают работать.
+    """
+    return str(chat_id) if chat_id is not None else None
+
+
 async def create_calendar(
     *,
     slug: str,
@@ -93,7 +307,7 @@ async def create_calendar(
             title,
             description,
             owner_id,
-            str(chat_id) if chat_id is not None else None,
+            _chat_id_text(chat_id),
             bot_id,
             timezone,
             is_public,
@@ -112,6 +326,22 @@ async def get_calendar_by_slug(slug: str) -> dict | None:
     return await fetch_one("SELECT * FROM calendars WHERE slug = %s", [slug])
 
 
+# Опциональные фильтры list_calendars; индекс в кортеже — бит маски
+_CALENDAR_FILTERS: tuple[str, ...] = (
+    "owner_id = %s",
+    "chat_id = %s",
+    "bot_id = %s",
+)
+
+
+@lru_cache(maxsize=16)
+def _list_calendars_sql(mask: int) -> str:
+    """SELECT для list_calendars под конкретный набор фильтров."""
+    where = [f for bit, f in enumerate(_CALENDAR_FILTERS) if mask & (1 << bit)]
+    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
+    return f"SELECT * FROM calendars {where_sql} ORDER BY created_at DESC LIMIT %s OFFSET %s"
+
+
 async def list_calendars(
     *,
     owner_id: int | None = None,
@@ -121,24 +351,19 @@ async def list_calendars(
     offset: int = 0,
 ) -> list[dict]:
     """Список календарей с фильтрацией."""
-    where: list[str] = []
+    mask = 0
     values: list[Any] = []
-
-    if owner_id is not None:
-        where.append("owner_id = %s")
-        values.append(owner_id)
-    if chat_id is not None:
-        where.append("chat_id = %s")
-        values.append(str(chat_id))
-    if bot_id is not None:
-        where.append("bot_id = %s")
-        values.append(bot_id)
-
-    where_sql = f"WHERE {' AND '.join(where)}" if where else ""
-    sql = f"SELECT * FROM calendars {where_sql} ORDER BY created_at DESC LIMIT %s OFFSET %s"
+    for bit, value in enumerate((
+        owner_id,
+        _chat_id_text(chat_id),
+        bot_id,
+    )):
+        if value is not None:
+            mask |= 1 << bit
+            values.append(value)
     values.extend([limit, offset])
 
-    return await fetch_all(sql, values)
+    return await fetch_all(_list_calendars_sql(mask), values)
 
 
 async def update_calendar(calendar_id: int, **kwargs: Any) -> None:
@@ -165,7 +390,7 @@ async def update_calendar(calendar_id: int, **kwargs: Any) -> None:
                 values.append(Json(kwargs[key]))
             elif key == "chat_id":
                 updates.append(f"{column} = %s")
-                values.append(str(kwargs[key]))
+                values.append(_chat_id_text(kwargs[key]))
             else:
                 updates.append(f"{column} = %s")
                 values.append(kwargs[key])
@@ -187,6 +412,60 @@ async def delete_calendar(calendar_id: int) -> None:
 # Записи календаря — CRUD
 # ---------------------------------------------------------------------------
 
+# Порядок колонок INSERT — общий для create_entry и bulk_create_entries
+_ENTRY_COLUMNS: tuple[str, ...] = (
+    "calendar_id", "parent_id", "title", "description", "emoji", "icon",
+    "start_at", "end_at", "all_day", "status", "priority", "color",
+    "tags", "attachments", "metadata",
+    "series_id", "repeat", "repeat_until", "position",
+    "created_by", "ai_actionable",
+    "entry_type", "trigger_at", "trigger_status", "action", "result",
+    "source_module", "cost_estimate",
+    "tick_interval", "next_tick_at", "tick_count", "max_ticks", "expires_at",
+)
+
+# Проекции для чтения: полная (get_entry, due-записи) и облегчённая для
+# списков — без attachments/action, которые списки и превью не рендерят
+_ENTRY_READ_COLUMNS: tuple[str, ...] = (
+    "id", *_ENTRY_COLUMNS, "root_id", "created_at", "updated_at",
+)
+_ENTRY_COLS_FULL = ", ".join(_ENTRY_READ_COLUMNS)
+_ENTRY_COLS_LIST = ", ".join(
+    c for c in _ENTRY_READ_COLUMNS if c not in ("attachments", "action")
+)
+
+_ENTRY_INSERT_SQL = f"INSERT INTO calendar_entries ({', '.join(_ENTRY_COLUMNS)}) VALUES"
+
+# Значения по умолчанию — как в сигнатуре create_entry
+_ENTRY_DEFAULTS: dict[str, Any] = {
+    "all_day": False,
+    "status": "active",
+    "priority": 3,
+    "position": 0,
+    "ai_actionable": True,
+    "entry_type": "event",
+    "trigger_status": "pending",
+    "cost_estimate": 0.0,
+    "tick_count": 0,
+}
+
+
+def _entry_values(calendar_id: int, entry: dict[str, Any]) -> list[Any]:
+    """Параметры одной строки INSERT в порядке _ENTRY_COLUMNS.
+
+    Цвет резолвится и JSON-поля оборачиваются в Json() здесь,
+    чтобы одиночная и массовая вставка не расходились.
+    """
+    data = {**_ENTRY_DEFAULTS, **entry, "calendar_id": calendar_id}
+    data["color"] = data.get("color") or _auto_color(data.get("tags"), data["priority"])
+    data["tags"] = data.get("tags") or []
+    data["attachments"] = Json(data.get("attachments") or [])
+    data["metadata"] = Json(data.get("metadata") or {})
+    data["action"] = Json(data.get("action") or {})
+    data["result"] = Json(data["result"]) if data.get("result") else None
+    return [data.get(column) for column in _ENTRY_COLUMNS]
+
+
 async def create_entry(
     *,
     calendar_id: int,
@@ -226,59 +505,44 @@ async def create_entry(
     expires_at: str | None = None,
 ) -> dict:
     """Создание записи в календаре + запись в историю."""
-    resolved_color = color or _auto_color(tags, priority)
+    entry = {
+        "parent_id": parent_id,
+        "title": title,
+        "description": description,
+        "emoji": emoji,
+        "icon": icon,
+        "start_at": start_at,
+        "end_at": end_at,
+        "all_day": all_day,
+        "status": status,
+        "priority": priority,
+        "color": color,
+        "tags": tags,
+        "attachments": attachments,
+        "metadata": metadata,
+        "series_id": series_id,
+        "repeat": repeat,
+        "repeat_until": repeat_until,
+        "position": position,
+        "created_by": created_by,
+        "ai_actionable": ai_actionable,
+        "entry_type": entry_type,
+        "trigger_at": trigger_at,
+        "trigger_status": trigger_status,
+        "action": action,
+        "result": result,
+        "source_module": source_module,
+        "cost_estimate": cost_estimate,
+        "tick_interval": tick_interval,
+        "next_tick_at": next_tick_at,
+        "tick_count": tick_count,
+        "max_ticks": max_ticks,
+        "expires_at": expires_at,
+    }
 
     row = await execute_returning(
-        """
-        INSERT INTO calendar_entries
-            (calendar_id, parent_id, title, description, emoji, icon,
-             start_at, end_at, all_day, status, priority, color,
-             tags, attachments, metadata,
-             series_id, repeat, repeat_until, position,
-             created_by, ai_actionable,
-             entry_type, trigger_at, trigger_status, action, result,
-             source_module, cost_estimate,
-             tick_interval, next_tick_at, tick_count, max_ticks, expires_at)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s, %s, %s,
-                %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-        RETURNING *
-        """,
-        [
-            calendar_id,
-            parent_id,
-            title,
-            description,
-            emoji,
-            icon,
-            start_at,
-            end_at,
-            all_day,
-            status,
-            priority,
-            resolved_color,
-            tags or [],
-            Json(attachments or []),
-            Json(metadata or {}),
-            series_id,
-            repeat,
-            repeat_until,
-            position,
-            created_by,
-            ai_actionable,
-            entry_type,
-            trigger_at,
-            trigger_status,
-            Json(action or {}),
-            Json(result) if result else None,
-            source_module,
-            cost_estimate,
-            tick_interval,
-            next_tick_at,
-            tick_count,
-            max_ticks,
-            expires_at,
-        ],
+        f"{_ENTRY_INSERT_SQL} {values_placeholders(1, len(_ENTRY_COLUMNS))} RETURNING *",
+        _entry_values(calendar_id, entry),
     )
 
     await _record_history(row["id"], "created", performed_by=performed_by)
@@ -287,10 +551,60 @@ async def create_entry(
 
 async def get_entry(entry_id: int) -> dict | None:
     """Получение записи по id."""
-    return await fetch_one("SELECT * FROM calendar_entries WHERE id = %s", [entry_id])
+    return await fetch_one(
+        f"SELECT {_ENTRY_COLS_FULL} FROM calendar_entries WHERE id = %s", [entry_id]
+    )
 
 
-_SENTINEL = object()
+def entry_cursor(entry: dict) -> str:
+    """Непрозрачный keyset-курсор списка записей: (start_at, position, id)."""
+    start_at = entry["start_at"]
+    if isinstance(start_at, datetime):
+        start_at = start_at.isoformat()
+    raw = json.dumps([start_at, entry["position"], entry["id"]])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_entry_cursor(cursor: str) -> tuple[datetime, int, int]:
+    """Разбор курсора entry_cursor(); ValueError — если курсор битый."""
+    try:
+        start_at, position, entry_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.fromisoformat(start_at), int(position), int(entry_id)
+    except (ValueError, TypeError) as exc:
+        raise ValueError(f"Invalid cursor: {cursor}") from exc
+
+
+# Опциональные фильтры list_entries; индекс в кортеже — бит маски
+_ENTRY_FILTERS: tuple[str, ...] = (
+    "start_at >= %s",
+    "start_at <= %s",
+    "tags @> %s::text[]",
+    "status = %s",
+    "priority = %s",
+    "parent_id IS NULL",
+    "parent_id = %s",
+    "ai_actionable = %s",
+    "series_id = %s",
+    "entry_type = %s",
+    "trigger_status = %s",
+    "source_module = %s",
+    "(start_at, position, id) > (%s::timestamptz, %s, %s)",
+)
+
+
+@lru_cache(maxsize=1024)
+def _list_entries_sql(mask: int) -> str:
+    """SELECT для list_entries под конкретный набор фильтров.
+
+    Одинаковая маска → байт-в-байт одинаковый SQL, поэтому psycopg
+    переиспользует для него prepared statement на соединении.
+    """
+    where = ["calendar_id = %s"]
+    where.extend(f for bit, f in enumerate(_ENTRY_FILTERS) if mask & (1 << bit))
+    return (
+        f"SELECT {_ENTRY_COLS_LIST} FROM calendar_entries WHERE {' AND '.join(where)} "
+        f"ORDER BY start_at ASC, position ASC, id ASC LIMIT %s OFFSET %s"
+    )
 
 
 async def list_entries(
@@ -301,7 +615,8 @@ async def list_entries(
     tags: list[str] | None = None,
     status: str | None = None,
     priority: int | None = None,
-    parent_id: int | _SENTINEL.__class__ = _SENTINEL,
+    parent_id: int | None = None,
+    filter_parent: bool = False,
     ai_actionable: bool | None = None,
     series_id: str | None = None,
     entry_type: str | None = None,
@@ -309,90 +624,55 @@ async def list_entries(
     source_module: str | None = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: str | None = None,
 ) -> list[dict]:
     """Список записей с динамическими фильтрами.
 
-    Если parent_id передан явно (в том числе None) — фильтруем по нему.
-    Если не передан (sentinel) — не фильтруем.
-    """
-    where: list[str] = ["calendar_id = %s"]
-    values: list[Any] = [calendar_id]
+    filter_parent=True включает фильтр по parent_id (None — только корневые
+    записи); по умолчанию parent_id не фильтруется.
 
-    if start is not None:
-        where.append("start_at >= %s")
-        values.append(start)
-    if end is not None:
-        where.append("start_at <= %s")
-        values.append(end)
-    if tags is not None:
-        where.append("tags @> %s::text[]")
-        values.append(tags)
-    if status is not None:
-        where.append("status = %s")
-        values.append(status)
-    if priority is not None:
-        where.append("priority = %s")
-        values.append(priority)
-    if parent_id is not _SENTINEL:
-        if parent_id is None:
-            where.append("parent_id IS NULL")
-        else:
-            where.append("parent_id = %s")
-            values.append(parent_id)
-    if ai_actionable is not None:
-        where.append("ai_actionable = %s")
-        values.append(ai_actionable)
-    if series_id is not None:
-        where.append("series_id = %s")
-        values.append(series_id)
-    if entry_type is not None:
-        where.append("entry_type = %s")
-        values.append(entry_type)
-    if trigger_status is not None:
-        where.append("trigger_status = %s")
-        values.append(trigger_status)
-    if source_module is not None:
-        where.append("source_module = %s")
-        values.append(source_module)
-
-    where_sql = " AND ".join(where)
-    sql = (
-        f"SELECT * FROM calendar_entries WHERE {where_sql} "
-        f"ORDER BY start_at ASC, position ASC LIMIT %s OFFSET %s"
+    cursor (из entry_cursor() последней записи страницы) включает keyset-
+    пагинацию по (start_at, position, id) — seek по индексу вместо OFFSET.
+    """
+    filters: tuple[tuple[bool, tuple[Any, ...]], ...] = (
+        (start is not None, (start,)),
+        (end is not None, (end,)),
+        (tags is not None, (tags,)),
+        (status is not None, (status,)),
+        (priority is not None, (priority,)),
+        (filter_parent and parent_id is None, ()),
+        (filter_parent and parent_id is not None, (parent_id,)),
+        (ai_actionable is not None, (ai_actionable,)),
+        (series_id is not None, (series_id,)),
+        (entry_type is not None, (entry_type,)),
+        (trigger_status is not None, (trigger_status,)),
+        (source_module is not None, (source_module,)),
+        (cursor is not None, _decode_entry_cursor(cursor) if cursor is not None else ()),
     )
+
+    mask = 0
+    values: list[Any] = [calendar_id]
+    for bit, (present, params) in enumerate(filters):
+        if present:
+            mask |= 1 << bit
+            values.extend(params)
+    if cursor is not None:
+        offset = 0
     values.extend([limit, offset])
 
-    return await fetch_all(sql, values)
+    return await fetch_all(_list_entries_sql(mask), values)
 
 
 async def get_linked_chain(entry_id: int) -> list[dict]:
-    """Получение цепочки связанных записей (вверх до корня + все потомки).
+    """Получение цепочки связанных записей (корень + все потомки).
 
-    Рекурсивный CTE: сначала идём вверх по parent_id до корня,
-    затем собираем всех потомков от корня вниз.
+    root_id поддерживается триггером (19_calendar_chain_root.sql),
+    поэтому цепочка — один range scan по (root_id, start_at).
     """
-    sql = """
-        WITH RECURSIVE
-        -- Поднимаемся до корня
-        ancestors AS (
-            SELECT * FROM calendar_entries WHERE id = %s
-            UNION ALL
-            SELECT ce.* FROM calendar_entries ce
-            JOIN ancestors a ON ce.id = a.parent_id
-        ),
-        root AS (
-            SELECT id FROM ancestors WHERE parent_id IS NULL
-            LIMIT 1
-        ),
-        -- От корня вниз собираем всех потомков
-        chain AS (
-            SELECT ce.* FROM calendar_entries ce
-            JOIN root r ON ce.id = r.id
-            UNION ALL
-            SELECT ce.* FROM calendar_entries ce
-            JOIN chain c ON ce.parent_id = c.id
-        )
-        SELECT * FROM chain ORDER BY start_at ASC
+    sql = f"""
+        SELECT {_ENTRY_COLS_LIST} FROM calendar_entries
+        WHERE root_id = (SELECT root_id FROM calendar_entries WHERE id = %s)
+        ORDER BY start_at ASC
     """
     return await fetch_all(sql, [entry_id])
 
@@ -402,16 +682,12 @@ async def update_entry(
     *,
     performed_by: str | None = None,
     **kwargs: Any,
-) -> None:
-    """Обновление записи — вычисляем diff, обновляем, пишем в историю."""
-    old = await get_entry(entry_id)
-    if not old:
-        return
-
-    updates: list[str] = []
-    values: list[Any] = []
-    changes: dict[str, Any] = {}
+) -> dict | None:
+    """Обновление записи — UPDATE ... RETURNING old/new, diff, запись в историю.
 
+    Колонки без изменений не переписываются; diff считает Postgres.
+    Возвращает актуальную запись или None, если записи нет.
+    """
     # Поля, допустимые для обновления
     field_map: dict[str, str] = {
         "title": "title",
@@ -449,43 +725,43 @@ async def update_entry(
         "expires_at": "expires_at",
     }
 
+    columns: list[str] = []
+    values: list[Any] = []
     for key, column in field_map.items():
         if key not in kwargs:
             continue
         new_val = kwargs[key]
+        columns.append(column)
 
-        # Сериализуем для сравнения
-        old_val = old.get(key)
-        if old_val == new_val:
-            continue
-
-        # Записываем diff
-        changes[key] = {"old": old_val, "new": new_val}
-
+        # Jsonb (а не Json): значение сравнивается с колонкой в IS DISTINCT FROM
         if key == "attachments":
-            updates.append(f"{column} = %s")
-            values.append(Json(new_val or []))
+            values.append(Jsonb(new_val or []))
         elif key in ("metadata", "action"):
-            updates.append(f"{column} = %s")
-            values.append(Json(new_val or {}))
+            values.append(Jsonb(new_val or {}))
         elif key == "result":
-            updates.append(f"{column} = %s")
-            values.append(Json(new_val) if new_val else None)
+            values.append(Jsonb(new_val) if new_val else None)
         elif key == "tags":
-            updates.append(f"{column} = %s")
             values.append(new_val or [])
         else:
-            updates.append(f"{column} = %s")
             values.append(new_val)
 
-    if not updates:
-        return
+    if not columns:
+        return await get_entry(entry_id)
 
-    values.append(entry_id)
-    sql = f"UPDATE calendar_entries SET {', '.join(updates)} WHERE id = %s"
-    await execute(sql, values)
+    updated = await _update_entry_if_changed(entry_id, columns, values)
+    if not updated:
+        # Записи нет или ничего не изменилось — строку не трогали
+        return await get_entry(entry_id)
+    old, row, dirty_columns = updated
+
+    changes: dict[str, Any] = {
+        key: {"old": old.get(column), "new": kwargs[key]}
+        for key, column in field_map.items()
+        if column in dirty_columns
+    }
 
     await _record_history(entry_id, "updated", changes=changes, performed_by=performed_by)
+    return row
 
 
 async def move_entry(
@@ -494,23 +770,24 @@ async def move_entry(
     start_at: str,
     end_at: str | None = None,
     performed_by: str | None = None,
-) -> None:
+) -> dict | None:
     """Перемещение записи во времени + запись в историю."""
-    old = await get_entry(entry_id)
-    if not old:
-        return
+    updated = await _update_entry_returning_old(
+        entry_id,
+        ["start_at = %s", "end_at = %s"],
+        [start_at, end_at],
+    )
+    if not updated:
+        return None
+    old, row = updated
 
     changes: dict[str, Any] = {
-        "start_at": {"old": str(old["start_at"]) if old["start_at"] else None, "new": start_at},
-        "end_at": {"old": str(old["end_at"]) if old["end_at"] else None, "new": end_at},
+        "start_at": {"old": old["start_at"], "new": start_at},
+        "end_at": {"old": old["end_at"], "new": end_at},
     }
 
-    await execute(
-        "UPDATE calendar_entries SET start_at = %s, end_at = %s WHERE id = %s",
-        [start_at, end_at, entry_id],
-    )
-
     await _record_history(entry_id, "moved", changes=changes, performed_by=performed_by)
+    return row
 
 
 async def set_status(
@@ -518,22 +795,19 @@ async def set_status(
     *,
     status: str,
     performed_by: str | None = None,
-) -> None:
+) -> dict | None:
     """Изменение статуса записи + запись в историю."""
-    old = await get_entry(entry_id)
-    if not old:
-        return
+    updated = await _update_entry_returning_old(entry_id, ["status = %s"], [status])
+    if not updated:
+        return None
+    old, row = updated
 
     changes: dict[str, Any] = {
         "status": {"old": old["status"], "new": status},
     }
 
-    await execute(
-        "UPDATE calendar_entries SET status = %s WHERE id = %s",
-        [status, entry_id],
-    )
-
     await _record_history(entry_id, "status_changed", changes=changes, performed_by=performed_by)
+    return row
 
 
 async def delete_entry(
@@ -565,17 +839,89 @@ async def delete_entry(
 # Массовые операции
 # ---------------------------------------------------------------------------
 
+# Порог, после которого multi-row VALUES заменяется на COPY
+# (лимит 65535 параметров на запрос ≈ 1985 строк по 33 колонки)
+_BULK_COPY_THRESHOLD = 500
+
+
+async def _bulk_copy_entries(calendar_id: int, entries: list[dict]) -> list[dict]:
+    """COPY записей с заранее выделенными id + INSERT истории одной транзакцией.
+
+    COPY не умеет RETURNING, поэтому id берутся из sequence заранее —
+    в порядке entries, что сохраняет порядок результата.
+    """
+    async with transaction() as cur:
+        await cur.execute(
+            "SELECT nextval(pg_get_serial_sequence('calendar_entries', 'id')) AS id "
+            "FROM generate_series(1, %s)",
+            [len(entries)],
+        )
+        ids = [r["id"] for r in await cur.fetchall()]
+
+        async with cur.copy(
+            f"COPY calendar_entries (id, {', '.join(_ENTRY_COLUMNS)}) FROM STDIN"
+        ) as copy:
+            for entry_id, entry in zip(ids, entries):
+                fields = {k: v for k, v in entry.items() if k != "performed_by"}
+                await copy.write_row([entry_id, *_entry_values(calendar_id, fields)])
+
+        # unnest массивов — два параметра при любом размере пачки
+        await cur.execute(
+            """
+            INSERT INTO calendar_entry_history (entry_id, action, changes, performed_by)
+            SELECT entry_id, 'created', '{}'::jsonb, performed_by
+            FROM unnest(%s::bigint[], %s::text[]) AS h(entry_id, performed_by)
+            """,
+            [ids, [entry.get("performed_by") for entry in entries]],
+        )
+
+        await cur.execute(
+            f"SELECT {_ENTRY_COLS_FULL} FROM calendar_entries WHERE id = ANY(%s) ORDER BY id",
+            [ids],
+        )
+        return await cur.fetchall()
+
+
 async def bulk_create_entries(
     *,
     calendar_id: int,
     entries: list[dict],
 ) -> list[dict]:
-    """Массовое создание записей — вызывает create_entry для каждой."""
-    results: list[dict] = []
+    """Массовое создание записей — один multi-row INSERT + один INSERT истории.
+
+    Большие пачки (> _BULK_COPY_THRESHOLD) идут через COPY.
+    """
+    if not entries:
+        return []
+    if len(entries) > _BULK_COPY_THRESHOLD:
+        return await _bulk_copy_entries(calendar_id, entries)
+
+    values: list[Any] = []
     for entry in entries:
-        row = await create_entry(calendar_id=calendar_id, **entry)
-        results.append(row)
-    return results
+        fields = {k: v for k, v in entry.items() if k != "performed_by"}
+        values.extend(_entry_values(calendar_id, fields))
+
+    # Записи и история — одной транзакцией на одном соединении
+    async with transaction() as cur:
+        await cur.execute(
+            f"{_ENTRY_INSERT_SQL} {values_placeholders(len(entries), len(_ENTRY_COLUMNS))} "
+            f"RETURNING *",
+            values,
+        )
+        rows = await cur.fetchall()
+
+        # RETURNING multi-row VALUES отдаёт строки в порядке вставки
+        history: list[Any] = []
+        for row, entry in zip(rows, entries):
+            history.extend([row["id"], "created", Json({}), entry.get("performed_by")])
+        await cur.execute(
+            f"""
+            INSERT INTO calendar_entry_history (entry_id, action, changes, performed_by)
+            VALUES {values_placeholders(len(rows), 4)}
+            """,
+            history,
+        )
+    return rows
 
 
 async def bulk_delete_entries(
@@ -583,9 +929,34 @@ async def bulk_delete_entries(
     ids: list[int],
     performed_by: str | None = None,
 ) -> None:
-    """Массовое удаление записей — вызывает delete_entry для каждой."""
-    for entry_id in ids:
-        await delete_entry(entry_id, performed_by=performed_by)
+    """Массовое удаление записей — INSERT истории + DELETE по ANY(ids).
+
+    История пишется до удаления одним INSERT ... SELECT (FK на
+    calendar_entries не даёт вставить её после DELETE).
+    """
+    if not ids:
+        return
+
+    async with transaction() as cur:
+        await cur.execute(
+            """
+            INSERT INTO calendar_entry_history (entry_id, action, changes, performed_by)
+            SELECT id, 'deleted',
+                   jsonb_build_object(
+                       'id', id,
+                       'title', title,
+                       'calendar_id', calendar_id,
+                       'start_at', start_at::text,
+                       'end_at', end_at::text,
+                       'status', status
+                   ),
+                   %s
+            FROM calendar_entries
+            WHERE id = ANY(%s)
+            """,
+            [performed_by, ids],
+        )
+        await cur.execute("DELETE FROM calendar_entries WHERE id = ANY(%s)", [ids])
 
 
 # ---------------------------------------------------------------------------
@@ -598,7 +969,8 @@ async def get_entry_history(
     limit: int = 50,
     offset: int = 0,
 ) -> list[dict]:
-    """Лог изменений записи."""
+    """Лог изменений записи (с дозаписью очереди истории этого процесса)."""
+    await flush_history()
     return await fetch_all(
         """
         SELECT * FROM calendar_entry_history
@@ -617,8 +989,8 @@ async def get_upcoming(
 ) -> list[dict]:
     """Ближайшие активные записи в календаре."""
     return await fetch_all(
-        """
-        SELECT * FROM calendar_entries
+        f"""
+        SELECT {_ENTRY_COLS_LIST} FROM calendar_entries
         WHERE calendar_id = %s AND status = 'active' AND start_at >= NOW()
         ORDER BY start_at ASC
         LIMIT %s
@@ -631,37 +1003,22 @@ async def get_upcoming(
 # v3: Триггеры, тики, бюджет
 # ---------------------------------------------------------------------------
 
-_TICK_UNITS: dict[str, str] = {"m": "minutes", "h": "hours", "d": "days"}
-
-
-def _compute_next_tick(interval: str, from_time: datetime | None = None) -> datetime:
-    """Вычислить время следующего тика на основе интервала (5m, 1h, 6h, 1d)."""
-    match = re.match(r"^(\d+)(m|h|d)$", interval)
-    if not match:
-        raise ValueError(f"Invalid tick_interval: {interval}")
-    n, unit = int(match.group(1)), match.group(2)
-    base = from_time or datetime.now(timezone.utc)
-    return base + timedelta(**{_TICK_UNITS[unit]: n})
-
-
 async def get_due_entries(
     *,
     calendar_id: int | None = None,
     limit: int = 10,
 ) -> list[dict]:
-    """Записи, готовые к исполнению (trigger_at <= NOW, pending, active).
+    """Записи, готовые к исполнению (due_at <= NOW, pending, active).
 
-    Для мониторов также проверяем next_tick_at.
-    Сортировка: приоритет DESC, trigger_at ASC.
+    due_at — generated-колонка: next_tick_at для мониторов, trigger_at
+    для остальных (20_calendar_due_at.sql).
+    Сортировка: приоритет DESC, due_at ASC.
     """
     where: list[str] = [
         "status = 'active'",
         "trigger_status = 'pending'",
-        """(
-            (entry_type != 'monitor' AND trigger_at IS NOT NULL AND trigger_at <= NOW())
-            OR
-            (entry_type = 'monitor' AND next_tick_at IS NOT NULL AND next_tick_at <= NOW())
-        )""",
+        "due_at IS NOT NULL",
+        "due_at <= NOW()",
     ]
     values: list[Any] = []
 
@@ -671,8 +1028,8 @@ async def get_due_entries(
 
     where_sql = " AND ".join(where)
     sql = (
-        f"SELECT * FROM calendar_entries WHERE {where_sql} "
-        f"ORDER BY priority DESC, trigger_at ASC NULLS LAST "
+        f"SELECT {_ENTRY_COLS_FULL} FROM calendar_entries WHERE {where_sql} "
+        f"ORDER BY priority DESC, due_at ASC "
         f"LIMIT %s"
     )
     values.append(limit)
@@ -686,27 +1043,24 @@ async def fire_entry(
     result: dict[str, Any],
     trigger_status: str = "success",
     performed_by: str | None = None,
-) -> None:
+) -> dict | None:
     """Записать результат исполнения триггера."""
-    old = await get_entry(entry_id)
-    if not old:
-        return
+    updated = await _update_entry_returning_old(
+        entry_id,
+        ["trigger_status = %s", "result = %s"],
+        [trigger_status, Json(result)],
+    )
+    if not updated:
+        return None
+    old, row = updated
 
     changes = {
         "trigger_status": {"old": old.get("trigger_status"), "new": trigger_status},
         "result": {"old": None, "new": "(result recorded)"},
     }
 
-    await execute(
-        """
-        UPDATE calendar_entries
-        SET trigger_status = %s, result = %s
-        WHERE id = %s
-        """,
-        [trigger_status, Json(result), entry_id],
-    )
-
     await _record_history(entry_id, "fired", changes=changes, performed_by=performed_by)
+    return row
 
 
 async def tick_entry(
@@ -718,44 +1072,40 @@ async def tick_entry(
     """Продвинуть тик монитора: tick_count += 1, пересчитать next_tick_at.
 
     Если max_ticks достигнут → trigger_status = 'success'.
-    Возвращает обновлённую запись.
+    Вся логика — в одном UPDATE: next_tick_at = NOW() + tick_interval::interval
+    (Postgres сам разбирает '5m', '1h', '1d'). Возвращает обновлённую запись.
     """
-    old = await get_entry(entry_id)
-    if not old:
+    limit_reached = "COALESCE(ce.max_ticks, 0) > 0 AND ce.tick_count + 1 >= ce.max_ticks"
+    updated = await _update_entry_returning_old(
+        entry_id,
+        [
+            "tick_count = ce.tick_count + 1",
+            f"""next_tick_at = CASE
+                WHEN {limit_reached} THEN NULL
+                WHEN ce.tick_interval IS NOT NULL THEN NOW() + ce.tick_interval::interval
+                ELSE NULL
+            END""",
+            f"trigger_status = CASE WHEN {limit_reached} THEN 'success' ELSE ce.trigger_status END",
+            "result = %s",
+        ],
+        [Json(result) if result else None],
+    )
+    if not updated:
         return None
+    old, row = updated
 
-    new_count = (old.get("tick_count") or 0) + 1
-    max_ticks = old.get("max_ticks")
-    interval = old.get("tick_interval")
-
-    # Проверяем лимит тиков
-    if max_ticks and new_count >= max_ticks:
-        new_status = "success"
-        new_next = None
-    elif interval:
-        new_status = old.get("trigger_status", "pending")
-        new_next = _compute_next_tick(interval)
-    else:
-        new_status = old.get("trigger_status", "pending")
-        new_next = None
-
+    new_next = row["next_tick_at"]
     changes = {
-        "tick_count": {"old": old.get("tick_count", 0), "new": new_count},
-        "next_tick_at": {"old": str(old.get("next_tick_at")), "new": str(new_next)},
-        "trigger_status": {"old": old.get("trigger_status"), "new": new_status},
+        "tick_count": {"old": old.get("tick_count", 0), "new": row["tick_count"]},
+        "next_tick_at": {
+            "old": old.get("next_tick_at"),
+            "new": new_next.isoformat() if new_next else None,
+        },
+        "trigger_status": {"old": old.get("trigger_status"), "new": row["trigger_status"]},
     }
 
-    await execute(
-        """
-        UPDATE calendar_entries
-        SET tick_count = %s, next_tick_at = %s, trigger_status = %s, result = %s
-        WHERE id = %s
-        """,
-        [new_count, new_next, new_status, Json(result) if result else None, entry_id],
-    )
-
     await _record_history(entry_id, "ticked", changes=changes, performed_by=performed_by)
-    return await get_entry(entry_id)
+    return row
 
 
 async def get_budget(
@@ -806,28 +1156,25 @@ async def get_budget(
 
     where_sql = " AND ".join(where)
 
-    # Общая сумма
-    row = await fetch_one(
-        f"SELECT COALESCE(SUM(cost_estimate), 0) AS total, COUNT(*) AS cnt "
-        f"FROM calendar_entries WHERE {where_sql}",
-        values,
-    )
-
-    total_cost = float(row["total"]) if row else 0.0
-    entry_count = int(row["cnt"]) if row else 0
-
-    # По модулям
-    by_module_rows = await fetch_all(
-        f"SELECT source_module, COALESCE(SUM(cost_estimate), 0) AS total "
+    # Одним сканом: строки по модулям + итоговая строка ROLLUP.
+    # GROUPING() отличает итог от группы source_module IS NULL.
+    rows = await fetch_all(
+        f"SELECT source_module, GROUPING(source_module) AS is_total, "
+        f"COALESCE(SUM(cost_estimate), 0) AS total, COUNT(*) AS cnt "
         f"FROM calendar_entries WHERE {where_sql} "
-        f"GROUP BY source_module",
+        f"GROUP BY ROLLUP (source_module)",
         values,
     )
 
-    by_module = {
-        (r["source_module"] or "unknown"): float(r["total"])
-        for r in by_module_rows
-    }
+    total_cost = 0.0
+    entry_count = 0
+    by_module: dict[str, float] = {}
+    for r in rows:
+        if r["is_total"]:
+            total_cost = float(r["total"])
+            entry_count = int(r["cnt"])
+        else:
+            by_module[r["source_module"] or "unknown"] = float(r["total"])
 
     return {
         "total_cost": round(total_cost, 6),
@@ -844,16 +1191,21 @@ async def expire_entries() -> int:
 
     Возвращает количество обновлённых записей.
     """
-    rows = await fetch_all(
+    row = await execute_returning(
         """
-        UPDATE calendar_entries
-        SET trigger_status = 'expired', status = 'archived'
-        WHERE expires_at IS NOT NULL AND expires_at <= NOW()
-          AND status = 'active'
-        RETURNING id
+        WITH expired AS (
+            UPDATE calendar_entries
+            SET trigger_status = 'expired', status = 'archived'
+            WHERE expires_at IS NOT NULL AND expires_at <= NOW()
+              AND status = 'active'
+            RETURNING id
+        ),
+        history AS (
+            INSERT INTO calendar_entry_history (entry_id, action, changes, performed_by)
+            SELECT id, 'expired', '{}'::jsonb, 'system' FROM expired
+        )
+        SELECT COUNT(*) AS cnt FROM expired
         """,
         [],
     )
-    for row in rows:
-        await _record_history(row["id"], "expired", performed_by="system")
-    return len(rows)
+    return int(row["cnt"]) if row else 0
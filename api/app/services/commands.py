@@ -1,8 +1,9 @@
 from __future__ import annotations
 
-import json
 from typing import Any
 
+from psycopg.types.json import Json
+
 from ..db import execute, execute_returning, fetch_all, fetch_one
 from .bots import BotRegistry
 from ..telegram_client import set_my_commands
@@ -20,14 +21,14 @@ async def upsert_command_set(
     row = await execute_returning(
         """
         INSERT INTO bot_commands (bot_id, scope_type, chat_id, user_id, language_code, commands_json)
-        VALUES (%s, %s, %s, %s, %s, %s::jsonb)
+        VALUES (%s, %s, %s, %s, %s, %s)
         ON CONFLICT (scope_type, chat_id, user_id, language_code) DO UPDATE
         SET bot_id = COALESCE(EXCLUDED.bot_id, bot_commands.bot_id),
             commands_json = EXCLUDED.commands_json,
             updated_at = NOW()
         RETURNING *
         """,
-        [bot_id, scope_type, chat_id, user_id, language_code, json.dumps(commands)],
+        [bot_id, scope_type, chat_id, user_id, language_code, Json(commands)],
     )
     return row or {}
 
@@ -42,15 +43,21 @@ async def get_command_set(command_set_id: int) -> dict | None:
     return await fetch_one("SELECT * FROM bot_commands WHERE id = %s", [command_set_id])
 
 
+# Типы BotCommandScope, которым нужен chat_id
+_CHAT_SCOPES = frozenset({"chat", "chat_administrators", "chat_member"})
+
+
 def _build_scope(row: dict) -> dict[str, Any] | None:
     scope_type = row.get("scope_type")
     if not scope_type or scope_type == "default":
         return None
     scope: dict[str, Any] = {"type": scope_type}
-    if scope_type in {"chat", "chat_administrators", "chat_member"}:
-        scope["chat_id"] = int(row.get("chat_id")) if row.get("chat_id") is not None else None
+    if scope_type in _CHAT_SCOPES:
+        chat_id = row.get("chat_id")
+        scope["chat_id"] = int(chat_id) if chat_id is not None else None
     if scope_type == "chat_member":
-        scope["user_id"] = int(row.get("user_id")) if row.get("user_id") is not None else None
+        user_id = row.get("user_id")
+        scope["user_id"] = int(user_id) if user_id is not None else None
     return scope
 
 
@@ -6,11 +6,27 @@
 
 from __future__ import annotations
 
+from typing import Any
+
 from ..config import get_settings
 
 settings = get_settings()
 
 
+def _predict_url_prefix() -> str | None:
+    """Префикс ссылки кнопки «Предсказать» (None — только callback)."""
+    if settings.webui_enabled and settings.webui_bot_username and settings.webui_app_name:
+        # Direct Link Mini App: открывается внутри Telegram
+        return f"https://t.me/{settings.webui_bot_username}/{settings.webui_app_name}?startapp=predict-"
+    if settings.webui_enabled and settings.webui_public_url:
+        return f"{settings.webui_public_url}/p/predict-"
+    return None
+
+
+# Настройки web-ui неизменны на время жизни процесса — выбираем вид кнопки один раз
+_PREDICT_URL_PREFIX = _predict_url_prefix()
+
+
 def bet_event_button(event_id: int) -> list[list[dict]]:
     """Кнопка «Предсказать» для публичного анонса в чате.
 
@@ -19,16 +35,10 @@ def bet_event_button(event_id: int) -> list[list[dict]]:
     Если web-ui включён без Mini App — обычный url.
     Иначе — callback_data.
     """
-    if settings.webui_enabled and settings.webui_bot_username and settings.webui_app_name:
-        # Direct Link Mini App: открывается внутри Telegram
-        return [[{
-            "text": "\U0001f3af Предсказать",
-            "url": f"https://t.me/{settings.webui_bot_username}/{settings.webui_app_name}?startapp=predict-{event_id}",
-        }]]
-    if settings.webui_enabled and settings.webui_public_url:
+    if _PREDICT_URL_PREFIX is not None:
         return [[{
             "text": "\U0001f3af Предсказать",
-            "url": f"{settings.webui_public_url}/p/predict-{event_id}",
+            "url": f"{_PREDICT_URL_PREFIX}{event_id}",
         }]]
     return [[{
         "text": "\U0001f4b0 Поставить",
@@ -47,12 +57,18 @@ def bet_options_keyboard(
     Каждый вариант — отдельная строка.
     В конце — кнопка статистики.
     """
-    keyboard: list[list[dict]] = []
-    for opt in options:
-        keyboard.append([{
-            "text": f"💰 {opt['text'] if isinstance(opt, dict) else opt.text}",
-            "callback_data": f"bet_{event_id}_{opt['id'] if isinstance(opt, dict) else opt.id}",
-        }])
+    # Тип вариантов (dict или модель) определяем один раз, а не на каждой итерации
+    if not options:
+        items: list[tuple[Any, Any]] = []
+    elif isinstance(options[0], dict):
+        items = [(opt["id"], opt["text"]) for opt in options]
+    else:
+        items = [(opt.id, opt.text) for opt in options]
+
+    keyboard: list[list[dict]] = [
+        [{"text": f"💰 {text}", "callback_data": f"bet_{event_id}_{opt_id}"}]
+        for opt_id, text in items
+    ]
 
     if with_stats:
         keyboard.append([{
@@ -2,10 +2,12 @@
 
 from __future__ import annotations
 
-import json
+from functools import lru_cache
 from typing import Any
 
-from ..db import execute, execute_returning, fetch_all, fetch_one
+from psycopg.types.json import Json
+
+from ..db import decode_created_cursor, execute, execute_returning, fetch_all, fetch_one
 
 
 async def create_message(
@@ -39,7 +41,7 @@ async def create_message(
             message_thread_id,
             message_type
         )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s, %s, %s, %s)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
         RETURNING *
         """,
         [
@@ -50,7 +52,7 @@ async def create_message(
             text,
             parse_mode,
             status,
-            json.dumps(payload or {}),
+            Json(payload or {}),
             is_live,
             reply_to_message_id,
             message_thread_id,
@@ -60,6 +62,81 @@ async def create_message(
     return row or {}
 
 
+# Строка VALUES для create_messages_bulk (порядок — как в _bulk_message_values)
+_BULK_MESSAGE_ROW = (
+    "(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, "
+    "CASE WHEN %s THEN NOW() END)"
+)
+
+
+def _bulk_message_values(row: dict[str, Any]) -> list[Any]:
+    return [
+        row.get("request_id"),
+        str(row["chat_id"]),
+        row.get("bot_id"),
+        row["direction"],
+        row.get("text"),
+        row.get("parse_mode"),
+        row["status"],
+        Json(row.get("payload") or {}),
+        row.get("is_live", False),
+        row.get("reply_to_message_id"),
+        row.get("message_thread_id"),
+        row.get("message_type", "text"),
+        row.get("telegram_message_id"),
+        bool(row.get("sent")),
+    ]
+
+
+async def create_messages_bulk(rows: list[dict[str, Any]]) -> list[dict]:
+    """Пакетная вставка сообщений одним INSERT (один round-trip на пачку).
+
+    Ключи строки — как аргументы create_message, плюс необязательные
+    telegram_message_id и sent (sent_at = NOW()). Возвращает вставленные
+    строки в порядке rows.
+    """
+    if not rows:
+        return []
+    values: list[Any] = []
+    for row in rows:
+        values.extend(_bulk_message_values(row))
+    return await fetch_all(
+        f"""
+        WITH ins AS (
+            INSERT INTO messages (
+                external_id,
+                chat_id,
+                bot_id,
+                direction,
+                text,
+                parse_mode,
+                status,
+                payload_json,
+                is_live,
+                reply_to_message_id,
+                message_thread_id,
+                message_type,
+                telegram_message_id,
+                sent_at
+            )
+            VALUES {", ".join([_BULK_MESSAGE_ROW] * len(rows))}
+            RETURNING *
+        )
+        SELECT * FROM ins ORDER BY id
+        """,
+        values,
+    )
+
+
+@lru_cache(maxsize=256)
+def _update_message_sql(columns: tuple[str, ...], stamps: tuple[str, ...]) -> str:
+    """UPDATE для update_message под набор колонок (стабильный текст SQL)."""
+    sets = [f"{column} = %s" for column in columns]
+    sets.extend(f"{column} = NOW()" for column in stamps)
+    sets.append("updated_at = NOW()")
+    return f"UPDATE messages SET {', '.join(sets)} WHERE id = %s"
+
+
 async def update_message(
     message_id: int,
     *,
@@ -73,49 +150,32 @@ async def update_message(
     edited: bool = False,
     deleted: bool = False,
 ) -> None:
-    sets = []
-    values: list[Any] = []
-    if status is not None:
-        sets.append("status = %s")
-        values.append(status)
-    if telegram_message_id is not None:
-        sets.append("telegram_message_id = %s")
-        values.append(telegram_message_id)
-    if error is not None:
-        sets.append("error = %s")
-        values.append(error)
-    if text is not None:
-        sets.append("text = %s")
-        values.append(text)
-    if parse_mode is not None:
-        sets.append("parse_mode = %s")
-        values.append(parse_mode)
-    if media_file_id is not None:
-        sets.append("media_file_id = %s")
-        values.append(media_file_id)
-    if sent:
-        sets.append("sent_at = NOW()")
-    if edited:
-        sets.append("edited_at = NOW()")
-    if deleted:
-        sets.append("deleted_at = NOW()")
-    sets.append("updated_at = NOW()")
-    if not sets:
-        return
-    values.append(message_id)
-    await execute(
-        f"UPDATE messages SET {', '.join(sets)} WHERE id = %s",
-        values,
+    fields = {
+        "status": status,
+        "telegram_message_id": telegram_message_id,
+        "error": error,
+        "text": text,
+        "parse_mode": parse_mode,
+        "media_file_id": media_file_id,
+    }
+    columns = tuple(column for column, value in fields.items() if value is not None)
+    stamps = tuple(
+        column
+        for column, flag in (("sent_at", sent), ("edited_at", edited), ("deleted_at", deleted))
+        if flag
     )
+    values: list[Any] = [fields[column] for column in columns]
+    values.append(message_id)
+    await execute(_update_message_sql(columns, stamps), values)
 
 
 async def add_event(message_id: int, event_type: str, payload: dict[str, Any] | None = None) -> None:
     await execute(
         """
         INSERT INTO message_events (message_id, event_type, payload_json)
-        VALUES (%s, %s, %s::jsonb)
+        VALUES (%s, %s, %s)
         """,
-        [message_id, event_type, json.dumps(payload or {})],
+        [message_id, event_type, Json(payload or {})],
     )
 
 
@@ -130,7 +190,13 @@ async def list_messages(
     status: str | None = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: str | None = None,
 ) -> list[dict]:
+    """Список сообщений, новые первыми.
+
+    cursor (created_cursor() последней строки страницы) включает keyset-
+    пагинацию по (created_at, id) — seek по индексу вместо OFFSET.
+    """
     where = []
     values: list[Any] = []
     if chat_id:
@@ -142,7 +208,11 @@ async def list_messages(
     if status:
         where.append("status = %s")
         values.append(status)
+    if cursor is not None:
+        where.append("(created_at, id) < (%s::timestamptz, %s)")
+        values.extend(decode_created_cursor(cursor))
+        offset = 0
     where_sql = f"WHERE {' AND '.join(where)}" if where else ""
-    sql = f"SELECT * FROM messages {where_sql} ORDER BY created_at DESC LIMIT %s OFFSET %s"
+    sql = f"SELECT * FROM messages {where_sql} ORDER BY created_at DESC, id DESC LIMIT %s OFFSET %s"
     values.extend([limit, offset])
     return await fetch_all(sql, values)
@@ -2,11 +2,12 @@
 
 from __future__ import annotations
 
+from functools import lru_cache
 from typing import Any
 
 from psycopg.types.json import Json
 
-from ..db import execute, execute_returning, fetch_all, fetch_one
+from ..db import decode_created_cursor, execute, execute_returning, fetch_all, fetch_one
 
 
 async def create_poll(
@@ -64,6 +65,13 @@ async def get_poll(poll_id: str) -> dict[str, Any] | None:
     return await fetch_one("SELECT * FROM polls WHERE poll_id = %s", [poll_id])
 
 
+@lru_cache(maxsize=16)
+def _update_poll_sql(columns: tuple[str, ...]) -> str:
+    """UPDATE для update_poll под набор колонок (стабильный текст SQL)."""
+    sets = ", ".join(f"{column} = %s" for column in columns)
+    return f"UPDATE polls SET {sets}, updated_at = NOW() WHERE poll_id = %s"
+
+
 async def update_poll(
     poll_id: str,
     is_closed: bool | None = None,
@@ -71,27 +79,18 @@ async def update_poll(
     results: dict[str, Any] | None = None,
 ) -> None:
     """Обновление опроса (результаты, закрытие)."""
-    updates = []
-    values = []
-
-    if is_closed is not None:
-        updates.append("is_closed = %s")
-        values.append(is_closed)
-    if total_voter_count is not None:
-        updates.append("total_voter_count = %s")
-        values.append(total_voter_count)
-    if results is not None:
-        updates.append("results = %s")
-        values.append(Json(results))
-
-    if not updates:
+    fields = {
+        "is_closed": is_closed,
+        "total_voter_count": total_voter_count,
+        "results": Json(results) if results is not None else None,
+    }
+    columns = tuple(column for column, value in fields.items() if value is not None)
+    if not columns:
         return
 
-    updates.append("updated_at = NOW()")
+    values: list[Any] = [fields[column] for column in columns]
     values.append(poll_id)
-
-    sql = f"UPDATE polls SET {', '.join(updates)} WHERE poll_id = %s"
-    await execute(sql, values)
+    await execute(_update_poll_sql(columns), values)
 
 
 async def list_polls(
@@ -99,8 +98,9 @@ async def list_polls(
     bot_id: int | None = None,
     limit: int = 50,
     offset: int = 0,
+    cursor: str | None = None,
 ) -> list[dict[str, Any]]:
-    """Список опросов с фильтрацией."""
+    """Список опросов с фильтрацией (cursor — keyset по created_at, id)."""
     where = []
     values: list[Any] = []
 
@@ -110,9 +110,13 @@ async def list_polls(
     if bot_id is not None:
         where.append("bot_id = %s")
         values.append(bot_id)
+    if cursor is not None:
+        where.append("(created_at, id) < (%s::timestamptz, %s)")
+        values.extend(decode_created_cursor(cursor))
+        offset = 0
 
     where_sql = f"WHERE {' AND '.join(where)}" if where else ""
-    sql = f"SELECT * FROM polls {where_sql} ORDER BY created_at DESC LIMIT %s OFFSET %s"
+    sql = f"SELECT * FROM polls {where_sql} ORDER BY created_at DESC, id DESC LIMIT %s OFFSET %s"
     values.extend([limit, offset])
 
     return await fetch_all(sql, values)
@@ -10,13 +10,18 @@ from __future__ import annotations
 import asyncio
 import json as json_lib
 import logging
+import time
+from collections.abc import Mapping
+from types import MappingProxyType
 from typing import Any
 
 import httpx
+import numpy as np
 from psycopg.types.json import Json
 
+from ..cache import invalidate
 from ..config import get_settings
-from ..db import execute, execute_returning, fetch_all, fetch_one
+from ..db import execute, execute_returning, fetch_all, fetch_one, transaction
 from ..telegram_client import (
     get_star_transactions,
     refund_star_payment,
@@ -31,14 +36,14 @@ logger = logging.getLogger(__name__)
 settings = get_settings()
 
 # Символы валют для отображения в сообщениях
-CURRENCY_SYMBOLS: dict[str, str] = {
+CURRENCY_SYMBOLS: Mapping[str, str] = MappingProxyType({
     "XTR": "⭐",
     "AC": "🪙",
     "TON": "💎",
-}
+})
 
 # Виртуальные валюты (оплата через баланс, без invoice)
-VIRTUAL_CURRENCIES = {"AC"}
+VIRTUAL_CURRENCIES = frozenset({"AC"})
 
 # Начальный баланс для виртуальных валют
 INITIAL_BALANCE: dict[str, int] = {
@@ -46,6 +51,30 @@ INITIAL_BALANCE: dict[str, int] = {
 }
 
 
+def event_key(event_id: int) -> str:
+    """Ключ кеша события с вариантами (сбрасывается при ставках и смене статуса)."""
+    return f"prediction_event:{event_id}"
+
+
+# Ссылки на фоновые задачи, чтобы их не собрал GC до завершения
+_background_tasks: set[asyncio.Task] = set()
+
+
+def _spawn(coro: Any) -> None:
+    """Запустить корутину в фоне (fire-and-forget)."""
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _send_message_quietly(payload: dict, *, bot_token: str, error_message: str) -> None:
+    """send_message, который только логирует ошибку."""
+    try:
+        await send_message(payload, bot_token=bot_token)
+    except Exception as e:
+        logger.warning(error_message, e)
+
+
 def currency_symbol(currency: str) -> str:
     """Символ валюты для отображения."""
     return CURRENCY_SYMBOLS.get(currency, currency)
@@ -85,64 +114,76 @@ async def create_event(
         )
     sym = currency_symbol(currency)
 
-    # Вставка события
+    # Событие и все варианты — одним запросом (data-modifying CTE + unnest)
     event_id = await execute_returning(
         """
-        INSERT INTO prediction_events
-        (title, description, chat_id, creator_id, deadline, resolution_date,
-         min_bet, max_bet, is_anonymous, status, bot_id, currency)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'active', %s, %s)
-        RETURNING id
+        WITH ev AS (
+            INSERT INTO prediction_events
+            (title, description, chat_id, creator_id, deadline, resolution_date,
+             min_bet, max_bet, is_anonymous, status, bot_id, currency)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, 'active', %s, %s)
+            RETURNING id
+        ), opts AS (
+            INSERT INTO prediction_options (event_id, option_id, text, value)
+            SELECT ev.id, o.option_id, o.text, o.value
+            FROM ev, unnest(%s::text[], %s::text[], %s::text[]) AS o(option_id, text, value)
+        )
+        SELECT id FROM ev
         """,
         [title, description, chat_id, creator_id, deadline, resolution_date,
-         min_bet, max_bet, is_anonymous, resolved_bot_id, currency],
+         min_bet, max_bet, is_anonymous, resolved_bot_id, currency,
+         [opt.id for opt in options],
+         [opt.text for opt in options],
+         [opt.value for opt in options]],
     )
 
-    # Создание вариантов
-    for opt in options:
-        await execute(
-            """
-            INSERT INTO prediction_options (event_id, option_id, text, value)
-            VALUES (%s, %s, %s, %s)
-            """,
-            [event_id["id"], opt.id, opt.text, opt.value],
-        )
-
     eid = event_id["id"]
 
-    # Публичный анонс в чат
+    # Строки вариантов (с экранированным value) — один раз на оба сообщения
+    option_lines = [_option_line(opt) for opt in options]
+
+    # Анонс в чат и сообщение создателю независимы — отправляем параллельно
+    sends = []
     if chat_id:
-        await _send_public_announcement(
+        sends.append(_send_public_announcement(
             bot_token=bot_token,
             event_id=eid,
             chat_id=chat_id,
             title=title,
             description=description or "",
-            options=options,
+            option_lines=option_lines,
             min_bet=min_bet,
             max_bet=max_bet,
             deadline=deadline,
             currency=currency,
             sym=sym,
-        )
-
-    # Персональное сообщение создателю
+        ))
     if creator_id:
-        await _send_creator_message(
+        sends.append(_send_creator_message(
             bot_token=bot_token,
             event_id=eid,
             creator_id=creator_id,
             title=title,
             description=description or "",
             options=options,
+            option_lines=option_lines,
             min_bet=min_bet,
             max_bet=max_bet,
             sym=sym,
-        )
+        ))
+    # Обе функции сами логируют ошибки отправки
+    await asyncio.gather(*sends)
 
     return {"ok": True, "event_id": eid}
 
 
+def _option_line(opt: Any) -> str:
+    """Строка варианта для анонса и сообщения создателю."""
+    if opt.value:
+        return f"  • {opt.text} <code>({escape_html(opt.value)})</code>"
+    return f"  • {opt.text}"
+
+
 async def _send_public_announcement(
     *,
     bot_token: str,
@@ -150,7 +191,7 @@ async def _send_public_announcement(
     chat_id: int,
     title: str,
     description: str,
-    options: list[Any],
+    option_lines: list[str],
     min_bet: int,
     max_bet: int,
     deadline: str | None,
@@ -158,14 +199,9 @@ async def _send_public_announcement(
     sym: str,
 ) -> None:
     """Анонс события в публичный чат."""
-    options_lines = []
-    for opt in options:
-        value_str = f" <code>({escape_html(opt.value)})</code>" if opt.value else ""
-        options_lines.append(
-            f"  • {opt.text}{value_str}\n    0 ставок, 0 {sym}"
-        )
-
-    formatted_options = "\n\n".join(options_lines)
+    formatted_options = "\n\n".join(
+        f"{line}\n    0 ставок, 0 {sym}" for line in option_lines
+    )
 
     text = (
         f"<b>🎯 Новое событие для предсказаний</b>\n\n"
@@ -195,6 +231,7 @@ async def _send_public_announcement(
             "UPDATE prediction_events SET telegram_message_id = %s WHERE id = %s",
             [msg_result["message_id"], event_id],
         )
+        invalidate(event_key(event_id))
     except Exception as e:
         logger.warning("Не удалось отправить анонс события в чат: %s", e)
 
@@ -207,6 +244,7 @@ async def _send_creator_message(
     title: str,
     description: str,
     options: list[Any],
+    option_lines: list[str],
     min_bet: int,
     max_bet: int,
     sym: str,
@@ -215,11 +253,7 @@ async def _send_creator_message(
     opts_for_kb = [{"text": opt.text, "id": opt.id} for opt in options]
     keyboard = bet_options_keyboard(event_id, opts_for_kb)
 
-    options_text = "\n".join(
-        f"  • {opt.text}"
-        + (f" <code>({escape_html(opt.value)})</code>" if opt.value else "")
-        for opt in options
-    )
+    options_text = "\n".join(option_lines)
 
     text = (
         f"<b>✅ Событие создано!</b>\n\n"
@@ -260,31 +294,50 @@ async def list_events(
     params: list[Any] = []
 
     if status:
-        conditions.append("status = %s")
+        conditions.append("e.status = %s")
         params.append(status)
     if chat_id:
-        conditions.append("chat_id = %s")
+        conditions.append("e.chat_id = %s")
         params.append(chat_id)
 
     where_clause = f"WHERE {' AND '.join(conditions)}" if conditions else ""
 
+    # total_count — полное число событий под фильтром, считается в том же
+    # запросе, что и страница
     query = f"""
         SELECT
             e.*,
-            (SELECT COUNT(*) FROM prediction_bets WHERE event_id = e.id) as bet_count,
-            (SELECT json_agg(json_build_object(
+            COUNT(*) OVER () AS total_count,
+            b.bet_count,
+            o.options
+        FROM prediction_events e
+        LEFT JOIN LATERAL (
+            SELECT COUNT(*) AS bet_count FROM prediction_bets WHERE event_id = e.id
+        ) b ON TRUE
+        LEFT JOIN LATERAL (
+            SELECT json_agg(json_build_object(
                 'id', option_id, 'text', text, 'value', value,
                 'total_bets', total_bets, 'total_amount', total_amount
-            )) FROM prediction_options WHERE event_id = e.id) as options
-        FROM prediction_events e
+            )) AS options
+            FROM prediction_options WHERE event_id = e.id
+        ) o ON TRUE
         {where_clause}
-        ORDER BY created_at DESC
+        ORDER BY e.created_at DESC
         LIMIT %s OFFSET %s
     """
-    params.extend([limit, offset])
 
-    events = await fetch_all(query, params)
-    return {"ok": True, "events": events, "total": len(events)}
+    events = await fetch_all(query, [*params, limit, offset])
+    if events:
+        total = events[0]["total_count"]
+        for event in events:
+            del event["total_count"]
+    elif offset:
+        # Страница за пределами списка — окно не вернуло ни одной строки
+        row = await fetch_one(f"SELECT COUNT(*) AS total FROM prediction_events e {where_clause}", params)
+        total = row["total"] if row else 0
+    else:
+        total = 0
+    return {"ok": True, "events": events, "total": total}
 
 
 async def get_event(event_id: int) -> dict | None:
@@ -293,16 +346,28 @@ async def get_event(event_id: int) -> dict | None:
         """
         SELECT
             e.*,
-            (SELECT json_agg(json_build_object(
+            o.options,
+            b.bet_count,
+            b.bets
+        FROM prediction_events e
+        LEFT JOIN LATERAL (
+            SELECT json_agg(json_build_object(
                 'id', option_id, 'text', text, 'value', value,
                 'total_bets', total_bets, 'total_amount', total_amount
-            )) FROM prediction_options WHERE event_id = e.id) as options,
-            (SELECT COUNT(*) FROM prediction_bets WHERE event_id = e.id) as bet_count,
-            (SELECT json_agg(json_build_object(
-                'user_id', user_id, 'option_id', option_id,
-                'amount', amount, 'status', status
-            )) FROM prediction_bets WHERE event_id = e.id AND e.is_anonymous = FALSE) as bets
-        FROM prediction_events e
+            )) AS options
+            FROM prediction_options WHERE event_id = e.id
+        ) o ON TRUE
+        -- Счётчик и список ставок — за один проход по prediction_bets;
+        -- для анонимных событий список не собирается
+        LEFT JOIN LATERAL (
+            SELECT
+                COUNT(*) AS bet_count,
+                json_agg(json_build_object(
+                    'user_id', user_id, 'option_id', option_id,
+                    'amount', amount, 'status', status
+                )) FILTER (WHERE e.is_anonymous = FALSE) AS bets
+            FROM prediction_bets WHERE event_id = e.id
+        ) b ON TRUE
         WHERE e.id = %s
         """,
         [event_id],
@@ -323,8 +388,15 @@ async def place_bet(
     bot_id: int | None = None,
 ) -> dict:
     """Разместить ставку: через баланс (AC) или Stars invoice (XTR)."""
+    # Событие и выбранный вариант — одним запросом
     event = await fetch_one(
-        "SELECT * FROM prediction_events WHERE id = %s", [event_id]
+        """
+        SELECT e.*, to_jsonb(o) AS _option
+        FROM prediction_events e
+        LEFT JOIN prediction_options o ON o.event_id = e.id AND o.option_id = %s
+        WHERE e.id = %s
+        """,
+        [option_id, event_id],
     )
     if not event:
         raise ValueError("Событие не найдено")
@@ -339,10 +411,7 @@ async def place_bet(
             f"Сумма ставки должна быть от {event['min_bet']} до {event['max_bet']} {sym}"
         )
 
-    option = await fetch_one(
-        "SELECT * FROM prediction_options WHERE event_id = %s AND option_id = %s",
-        [event_id, option_id],
-    )
+    option = event.pop("_option")
     if not option:
         raise ValueError("Вариант не найден")
 
@@ -385,11 +454,7 @@ async def _place_balance_bet(
     bot_token: str,
 ) -> dict:
     """Ставка с виртуального баланса (AC)."""
-    initial = INITIAL_BALANCE.get(currency, 0)
-    if initial > 0:
-        await fetch_one("SELECT ensure_user_balance(%s, %s)", [user_id, initial])
-
-    deducted = await balance.deduct_from_balance(
+    deduct = dict(
         user_id=user_id,
         amount=amount,
         transaction_type="bet",
@@ -397,42 +462,63 @@ async def _place_balance_bet(
         reference_id=event["id"],
         description=f"Ставка {amount} {sym} на '{option['text']}' ({event['title'][:50]})",
     )
-    if not deducted:
+    new_bal = await balance.deduct_from_balance(**deduct)
+
+    # Начальный баланс создаём только если списать не удалось —
+    # у постоянных игроков строка уже есть, лишний запрос не нужен
+    initial = INITIAL_BALANCE.get(currency, 0)
+    if new_bal is None and initial > 0:
+        ensured = await fetch_one("SELECT ensure_user_balance(%s, %s) AS balance", [user_id, initial])
+        if ensured and ensured["balance"] >= amount:
+            new_bal = await balance.deduct_from_balance(**deduct)
+    if new_bal is None:
         user_bal = await balance.get_user_balance(user_id)
         raise ValueError(
             f"Недостаточно средств. Баланс: {user_bal} {sym}, ставка: {amount} {sym}"
         )
 
+    # Ставка и статистика банка/варианта — одним запросом
     bet = await execute_returning(
         """
-        INSERT INTO prediction_bets
-        (event_id, option_id, user_id, amount, status, source, currency)
-        VALUES (%s, %s, %s, %s, 'active', 'balance', %s)
-        RETURNING id
+        WITH b AS (
+            INSERT INTO prediction_bets
+            (event_id, option_id, user_id, amount, status, source, currency)
+            VALUES (%s, %s, %s, %s, 'active', 'balance', %s)
+            RETURNING id, event_id, option_id, amount
+        ), opt AS (
+            UPDATE prediction_options o
+            SET total_bets = o.total_bets + 1, total_amount = o.total_amount + b.amount
+            FROM b
+            WHERE o.event_id = b.event_id AND o.option_id = b.option_id
+        ), evt AS (
+            UPDATE prediction_events e
+            SET total_pool = e.total_pool + b.amount
+            FROM b
+            WHERE e.id = b.event_id
+        )
+        SELECT id FROM b
         """,
         [event["id"], option["option_id"], user_id, amount, currency],
     )
-
-    await _update_pool_stats(event["id"], option["option_id"], amount)
-
-    new_bal = await balance.get_user_balance(user_id)
-    try:
-        await send_message(
-            {
-                "chat_id": user_id,
-                "text": (
-                    f"✅ <b>Ставка принята!</b>\n\n"
-                    f"<b>Событие:</b> {event['title']}\n"
-                    f"<b>Вариант:</b> {option['text']}\n"
-                    f"<b>Сумма:</b> {amount} {sym}\n"
-                    f"<b>Остаток:</b> {new_bal} {sym}"
-                ),
-                "parse_mode": "HTML",
-            },
-            bot_token=bot_token,
-        )
-    except Exception as e:
-        logger.warning("Не удалось отправить подтверждение ставки: %s", e)
+    invalidate(event_key(event["id"]))
+
+    # Вся работа с БД завершена — подтверждение уходит в фоне,
+    # ответ на ставку не ждёт Telegram
+    _spawn(_send_message_quietly(
+        {
+            "chat_id": user_id,
+            "text": (
+                f"✅ <b>Ставка принята!</b>\n\n"
+                f"<b>Событие:</b> {event['title']}\n"
+                f"<b>Вариант:</b> {option['text']}\n"
+                f"<b>Сумма:</b> {amount} {sym}\n"
+                f"<b>Остаток:</b> {new_bal} {sym}"
+            ),
+            "parse_mode": "HTML",
+        },
+        bot_token=bot_token,
+        error_message="Не удалось отправить подтверждение ставки: %s",
+    ))
 
     return {
         "ok": True,
@@ -501,22 +587,6 @@ async def _place_payment_bet(
     }
 
 
-async def _update_pool_stats(event_id: int, option_id: str, amount: int) -> None:
-    """Обновить статистику банка и варианта после ставки."""
-    await execute(
-        """
-        UPDATE prediction_options
-        SET total_bets = total_bets + 1, total_amount = total_amount + %s
-        WHERE event_id = %s AND option_id = %s
-        """,
-        [amount, event_id, option_id],
-    )
-    await execute(
-        "UPDATE prediction_events SET total_pool = total_pool + %s WHERE id = %s",
-        [amount, event_id],
-    )
-
-
 # ---------------------------------------------------------------------------
 # Разрешение события
 # ---------------------------------------------------------------------------
@@ -544,113 +614,180 @@ async def resolve_event(
     sym = currency_symbol(currency)
 
     all_bets = await fetch_all(
-        "SELECT * FROM prediction_bets WHERE event_id = %s AND status = 'active'",
+        """
+        SELECT id, option_id, user_id, amount
+        FROM prediction_bets
+        WHERE event_id = %s AND status = 'active'
+        """,
         [event_id],
     )
 
-    total_pool = event["total_pool"]
-    winning_bets = [b for b in all_bets if b["option_id"] in winning_option_ids]
-    losing_bets = [b for b in all_bets if b["option_id"] not in winning_option_ids]
+    total_pool = event["total_pool"] or 0
+    winning_set = frozenset(winning_option_ids)
+    winning_bets: list[dict] = []
+    losing_bets: list[dict] = []
+    for bet in all_bets:
+        (winning_bets if bet["option_id"] in winning_set else losing_bets).append(bet)
 
     payouts_summary: list[dict] = []
+    # Новые статусы и выплаты ставок; payout=None — оставить как есть
+    bet_ids: list[int] = []
+    bet_statuses: list[str] = []
+    bet_payouts: list[int | None] = []
+    credits: list[tuple[int, int, int]] = []
+    losses: list[tuple[int, int]] = []
 
     if not winning_bets:
         # Нет победителей → возврат всем
         for bet in all_bets:
-            await execute(
-                "UPDATE prediction_bets SET status = 'refunded', payout = amount WHERE id = %s",
-                [bet["id"]],
-            )
-            await balance.add_to_balance(
-                user_id=bet["user_id"],
-                amount=bet["amount"],
-                transaction_type="refund",
-                reference_type="prediction_bet",
-                reference_id=bet["id"],
-                description=f"Возврат ставки ({currency}): '{event['title']}'",
-            )
+            bet_ids.append(bet["id"])
+            bet_statuses.append("refunded")
+            bet_payouts.append(bet["amount"])
+            credits.append((bet["user_id"], bet["amount"], bet["id"]))
             payouts_summary.append({
                 "user_id": bet["user_id"],
                 "amount": bet["amount"],
                 "type": "refund",
             })
     else:
-        total_winning_amount = sum(b["amount"] for b in winning_bets)
-        for bet in winning_bets:
-            payout = int((bet["amount"] / total_winning_amount) * total_pool)
-            await execute(
-                "UPDATE prediction_bets SET status = 'won', payout = %s WHERE id = %s",
-                [payout, bet["id"]],
-            )
-            await balance.add_to_balance(
-                user_id=bet["user_id"],
-                amount=payout,
-                transaction_type="win",
-                reference_type="prediction_bet",
-                reference_id=bet["id"],
-                description=f"Выигрыш ({currency}) в '{event['title']}'",
-            )
-            profit = payout - bet["amount"]
+        # Пропорциональные выплаты целочисленно и сразу для всех победителей:
+        # floor(amount * pool / total) не теряет точность на float
+        # и гарантирует sum(payouts) <= total_pool
+        amounts = np.fromiter((b["amount"] for b in winning_bets), dtype=np.int64, count=len(winning_bets))
+        payouts = (amounts * total_pool // amounts.sum()).tolist()
+        for bet, payout in zip(winning_bets, payouts):
+            bet_ids.append(bet["id"])
+            bet_statuses.append("won")
+            bet_payouts.append(payout)
+            if payout > 0:
+                credits.append((bet["user_id"], payout, bet["id"]))
             payouts_summary.append({
                 "user_id": bet["user_id"],
                 "bet_amount": bet["amount"],
                 "payout": payout,
-                "profit": profit,
+                "profit": payout - bet["amount"],
                 "type": "win",
             })
 
         for bet in losing_bets:
-            await execute(
-                "UPDATE prediction_bets SET status = 'lost' WHERE id = %s",
-                [bet["id"]],
-            )
-            await balance.record_loss(bet["user_id"], bet["amount"])
+            bet_ids.append(bet["id"])
+            bet_statuses.append("lost")
+            bet_payouts.append(None)
+            losses.append((bet["user_id"], bet["amount"]))
             payouts_summary.append({
                 "user_id": bet["user_id"],
                 "bet_amount": bet["amount"],
                 "type": "loss",
             })
 
-    # Уведомления
-    await _send_resolution_notifications(
+    total_payout = sum(item.get("payout", 0) for item in payouts_summary if item["type"] == "win")
+
+    # Все записи разрешения — одной транзакцией: сбой на середине не оставит
+    # ставки рассчитанными без зачислений или событие открытым после выплат.
+    # Статус меняется первым и только из нерешённого — строка события
+    # блокируется, параллельный resolve не выплатит второй раз
+    async with transaction() as cur:
+        await cur.execute(
+            """
+            UPDATE prediction_events SET status = 'resolved', updated_at = NOW()
+            WHERE id = %s AND status <> 'resolved'
+            """,
+            [event_id],
+        )
+        if cur.rowcount == 0:
+            raise ValueError("Event already resolved")
+
+        # Все ставки события — одним UPDATE, зачисления и проигрыши — пачкой
+        if bet_ids:
+            await cur.execute(
+                """
+                UPDATE prediction_bets b
+                SET status = v.status, payout = COALESCE(v.payout, b.payout)
+                FROM unnest(%s::int[], %s::text[], %s::int[]) AS v(id, status, payout)
+                WHERE b.id = v.id
+                """,
+                [bet_ids, bet_statuses, bet_payouts],
+            )
+        if winning_bets:
+            await balance.credit_many(
+                credits,
+                transaction_type="win",
+                reference_type="prediction_bet",
+                description=f"Выигрыш ({currency}) в '{event['title']}'",
+                cur=cur,
+            )
+            await balance.record_losses(losses, cur=cur)
+        else:
+            await balance.credit_many(
+                credits,
+                transaction_type="refund",
+                reference_type="prediction_bet",
+                description=f"Возврат ставки ({currency}): '{event['title']}'",
+                cur=cur,
+            )
+
+        # Запись разрешения
+        await cur.execute(
+            """
+            INSERT INTO prediction_resolutions
+            (event_id, winning_option_ids, resolution_source, resolution_data,
+             total_winners, total_payout)
+            VALUES (%s, %s, %s, %s, %s, %s)
+            """,
+            [
+                event_id,
+                winning_option_ids,
+                resolution_source,
+                Json(resolution_data) if resolution_data else None,
+                len(winning_bets),
+                total_payout,
+            ],
+        )
+    invalidate(event_key(event_id))
+
+    # Уведомления — в фоне и только после COMMIT: ответ не ждёт
+    # рассылки по всем участникам
+    _spawn(_send_resolution_notifications(
         payouts=payouts_summary,
         event_title=event["title"],
         sym=sym,
         bot_token=event_bot_token,
-    )
-
-    # Запись разрешения
-    await execute(
-        """
-        INSERT INTO prediction_resolutions
-        (event_id, winning_option_ids, resolution_source, resolution_data,
-         total_winners, total_payout)
-        VALUES (%s, %s, %s, %s, %s, %s)
-        """,
-        [
-            event_id,
-            winning_option_ids,
-            resolution_source,
-            Json(resolution_data) if resolution_data else None,
-            len(winning_bets),
-            sum(item.get("payout", 0) for item in payouts_summary if item["type"] == "win"),
-        ],
-    )
-
-    await execute(
-        "UPDATE prediction_events SET status = 'resolved', updated_at = NOW() WHERE id = %s",
-        [event_id],
-    )
+    ))
 
     return {
         "ok": True,
         "event_id": event_id,
         "currency": currency,
         "winners": len(winning_bets),
-        "total_payout": sum(b["payout"] for b in winning_bets) if winning_bets else 0,
+        "total_payout": total_payout,
     }
 
 
+# Тексты уведомлений об итогах; поля — из payouts_summary + event_title/sym
+_RESULT_TEMPLATES: dict[str, str] = {
+    "win": (
+        "🎉 <b>Поздравляем! Вы выиграли!</b>\n\n"
+        "<b>Событие:</b> {event_title}\n\n"
+        "<b>Ваша ставка:</b> {bet_amount} {sym}\n"
+        "<b>Выплата:</b> {payout} {sym}\n"
+        "<b>Чистая прибыль:</b> +{profit} {sym}\n\n"
+        "<i>Выигрыш зачислен на ваш баланс.</i>"
+    ),
+    "loss": (
+        "😔 <b>К сожалению, вы проиграли</b>\n\n"
+        "<b>Событие:</b> {event_title}\n\n"
+        "<b>Ваша ставка:</b> {bet_amount} {sym}\n\n"
+        "<i>Попробуйте в следующий раз!</i>"
+    ),
+    "refund": (
+        "↩️ <b>Ставка возвращена</b>\n\n"
+        "<b>Событие:</b> {event_title}\n\n"
+        "<b>Возвращено:</b> {amount} {sym}\n\n"
+        "<i>Событие завершилось без победителей, ставка полностью возвращена.</i>"
+    ),
+}
+
+
 async def _send_resolution_notifications(
     *,
     payouts: list[dict],
@@ -658,47 +795,60 @@ async def _send_resolution_notifications(
     sym: str,
     bot_token: str,
 ) -> None:
-    """Уведомить каждого участника о результате."""
-    for item in payouts:
+    """Уведомить каждого участника о результате.
+
+    Отправки идут параллельно, не больше settings.notify_concurrency
+    одновременно — чтобы не упереться в лимиты Telegram.
+    """
+    sem = asyncio.Semaphore(max(1, settings.notify_concurrency))
+
+    async def notify(item: dict) -> None:
         user_id = item["user_id"]
 
-        if item["type"] == "win":
-            text = (
-                f"🎉 <b>Поздравляем! Вы выиграли!</b>\n\n"
-                f"<b>Событие:</b> {event_title}\n\n"
-                f"<b>Ваша ставка:</b> {item['bet_amount']} {sym}\n"
-                f"<b>Выплата:</b> {item['payout']} {sym}\n"
-                f"<b>Чистая прибыль:</b> +{item['profit']} {sym}\n\n"
-                f"<i>Выигрыш зачислен на ваш баланс.</i>"
-            )
-        elif item["type"] == "loss":
-            text = (
-                f"😔 <b>К сожалению, вы проиграли</b>\n\n"
-                f"<b>Событие:</b> {event_title}\n\n"
-                f"<b>Ваша ставка:</b> {item['bet_amount']} {sym}\n\n"
-                f"<i>Попробуйте в следующий раз!</i>"
-            )
-        else:
-            text = (
-                f"↩️ <b>Ставка возвращена</b>\n\n"
-                f"<b>Событие:</b> {event_title}\n\n"
-                f"<b>Возвращено:</b> {item['amount']} {sym}\n\n"
-                f"<i>Событие завершилось без победителей, ставка полностью возвращена.</i>"
-            )
+        text = _RESULT_TEMPLATES[item["type"]].format_map(
+            {**item, "event_title": event_title, "sym": sym}
+        )
 
-        try:
-            await send_message(
-                {"chat_id": user_id, "text": text, "parse_mode": "HTML"},
-                bot_token=bot_token,
-            )
-        except Exception as e:
-            logger.warning("Не удалось отправить уведомление пользователю %s: %s", user_id, e)
+        async with sem:
+            try:
+                await send_message(
+                    {"chat_id": user_id, "text": text, "parse_mode": "HTML"},
+                    bot_token=bot_token,
+                )
+            except Exception as e:
+                logger.warning("Не удалось отправить уведомление пользователю %s: %s", user_id, e)
+
+    await asyncio.gather(*(notify(item) for item in payouts))
 
 
 # ---------------------------------------------------------------------------
 # Авто-разрешение (LLM)
 # ---------------------------------------------------------------------------
 
+# Один клиент на процесс: keep-alive к LLM-MCP вместо нового соединения
+# на каждое разрешение и каждый опрос статуса задачи
+_llm_client: httpx.AsyncClient | None = None
+
+
+async def get_llm_client() -> httpx.AsyncClient:
+    """Переиспользуемый AsyncClient для LLM-MCP (ленивая инициализация)."""
+    global _llm_client
+    if _llm_client is None or _llm_client.is_closed:
+        _llm_client = httpx.AsyncClient(
+            timeout=120.0,
+            limits=httpx.Limits(max_keepalive_connections=10),
+        )
+    return _llm_client
+
+
+async def close_llm_client() -> None:
+    """Закрыть клиент LLM-MCP при остановке приложения."""
+    global _llm_client
+    if _llm_client is not None and not _llm_client.is_closed:
+        await _llm_client.aclose()
+        _llm_client = None
+
+
 async def auto_resolve_event(event_id: int) -> dict:
     """Автоматическое разрешение через LLM-MCP."""
     if not settings.llm_mcp_enabled:
@@ -748,42 +898,45 @@ async def auto_resolve_event(event_id: int) -> dict:
 - Отвечай только JSON, без markdown и комментариев
 """
 
-    async with httpx.AsyncClient(timeout=120.0) as client:
-        llm_response = await client.post(
-            f"{settings.llm_mcp_url}/v1/llm/request",
-            json={
-                "task": "chat",
-                "provider": "auto",
-                "model": "claude-3-7-sonnet",
-                "prompt": prompt,
-                "priority": 5,
-                "source": "telegram-api-predictions",
-                "max_attempts": 3,
-                "constraints": {"force_cloud": True, "prefer_local": False},
-            },
-        )
-        llm_response.raise_for_status()
-        job_id = llm_response.json().get("job_id")
-        if not job_id:
-            raise RuntimeError("LLM-MCP did not return job_id")
-
-        logger.info("LLM job created: %s for event %s", job_id, event_id)
-
-        # Polling
-        for _ in range(45):
-            await asyncio.sleep(2)
-            job_resp = await client.get(f"{settings.llm_mcp_url}/v1/jobs/{job_id}")
-            job_resp.raise_for_status()
-            job_data = job_resp.json()
-            status = job_data.get("status")
-
-            if status == "done":
-                result = job_data.get("result", {})
-                break
-            elif status == "error":
-                raise RuntimeError(f"LLM job failed: {job_data.get('error')}")
-        else:
+    client = await get_llm_client()
+    llm_response = await client.post(
+        f"{settings.llm_mcp_url}/v1/llm/request",
+        json={
+            "task": "chat",
+            "provider": "auto",
+            "model": "claude-3-7-sonnet",
+            "prompt": prompt,
+            "priority": 5,
+            "source": "telegram-api-predictions",
+            "max_attempts": 3,
+            "constraints": {"force_cloud": True, "prefer_local": False},
+        },
+    )
+    llm_response.raise_for_status()
+    job_id = llm_response.json().get("job_id")
+    if not job_id:
+        raise RuntimeError("LLM-MCP did not return job_id")
+
+    logger.info("LLM job created: %s for event %s", job_id, event_id)
+
+    # Polling: частые проверки в начале, затем реже (0.2с → ×1.5 → 2с)
+    delay = 0.2
+    deadline = time.monotonic() + 90
+    while True:
+        if time.monotonic() >= deadline:
             raise TimeoutError("LLM job timeout")
+        await asyncio.sleep(delay)
+        job_resp = await client.get(f"{settings.llm_mcp_url}/v1/jobs/{job_id}")
+        job_resp.raise_for_status()
+        job_data = job_resp.json()
+        status = job_data.get("status")
+
+        if status == "done":
+            result = job_data.get("result", {})
+            break
+        elif status == "error":
+            raise RuntimeError(f"LLM job failed: {job_data.get('error')}")
+        delay = min(delay * 1.5, 2.0)
 
     llm_text = result.get("response", result.get("content", ""))
     if "```json" in llm_text:
@@ -838,27 +991,37 @@ async def list_user_bets(
     limit: int = 50,
 ) -> dict:
     """Ставки пользователя с информацией о событии и варианте."""
-    conditions = ["user_id = %s"]
+    conditions = ["b.user_id = %s"]
     params: list[Any] = [user_id]
 
     if event_id:
-        conditions.append("event_id = %s")
+        conditions.append("b.event_id = %s")
         params.append(event_id)
     if status:
-        conditions.append("status = %s")
+        conditions.append("b.status = %s")
         params.append(status)
 
     where_clause = " AND ".join(conditions)
 
     bets = await fetch_all(
         f"""
-        SELECT b.*, e.title as event_title, o.text as option_text
-        FROM prediction_bets b
-        JOIN prediction_events e ON b.event_id = e.id
-        JOIN prediction_options o ON b.event_id = o.event_id AND b.option_id = o.option_id
-        WHERE {where_clause}
-        ORDER BY b.created_at DESC
-        LIMIT %s
+        WITH page AS (
+            SELECT b.*
+            FROM prediction_bets b
+            WHERE {where_clause}
+            ORDER BY b.created_at DESC
+            LIMIT %s
+        ), labels AS (
+            -- Названия события и варианта — по разу на пару, а не на ставку
+            SELECT k.event_id, k.option_id, e.title AS event_title, o.text AS option_text
+            FROM (SELECT DISTINCT event_id, option_id FROM page) k
+            JOIN prediction_events e ON e.id = k.event_id
+            JOIN prediction_options o ON o.event_id = k.event_id AND o.option_id = k.option_id
+        )
+        SELECT page.*, l.event_title, l.option_text
+        FROM page
+        JOIN labels l USING (event_id, option_id)
+        ORDER BY page.created_at DESC
         """,
         [*params, limit],
     )
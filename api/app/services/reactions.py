@@ -4,7 +4,13 @@ from __future__ import annotations
 
 from typing import Any
 
-from ..db import execute, execute_returning, fetch_all, fetch_one
+from ..cache import cached, invalidate
+from ..db import decode_created_cursor, execute, execute_returning, fetch_all, fetch_one, transaction
+
+
+def reactions_key(chat_id: str, telegram_message_id: int) -> str:
+    """Ключ кеша реакций сообщения (сбрасывается при любой записи реакций)."""
+    return f"reactions:{chat_id}:{telegram_message_id}"
 
 
 async def add_reaction(
@@ -15,8 +21,10 @@ async def add_reaction(
     reaction_type: str,
     reaction_emoji: str | None = None,
     reaction_custom_emoji_id: str | None = None,
-) -> dict[str, Any]:
-    """Добавление реакции на сообщение."""
+    *,
+    return_row: bool = True,
+) -> dict[str, Any] | None:
+    """Добавление реакции на сообщение (return_row=False — без RETURNING)."""
     sql = """
         INSERT INTO message_reactions (
             message_id, chat_id, telegram_message_id, user_id,
@@ -24,20 +32,85 @@ async def add_reaction(
         ) VALUES (%s, %s, %s, %s, %s, %s, %s)
         ON CONFLICT (chat_id, telegram_message_id, user_id, reaction_type, reaction_emoji, reaction_custom_emoji_id)
         DO UPDATE SET date = NOW()
-        RETURNING *
     """
-    return await execute_returning(
-        sql,
-        [
-            message_id,
-            chat_id,
-            telegram_message_id,
-            user_id,
-            reaction_type,
-            reaction_emoji,
-            reaction_custom_emoji_id,
-        ],
-    )
+    values = [
+        message_id,
+        chat_id,
+        telegram_message_id,
+        user_id,
+        reaction_type,
+        reaction_emoji,
+        reaction_custom_emoji_id,
+    ]
+    row = None
+    if return_row:
+        row = await execute_returning(sql + " RETURNING *", values)
+    else:
+        await execute(sql, values)
+    invalidate(reactions_key(chat_id, telegram_message_id))
+    return row
+
+
+async def add_reactions_bulk(
+    rows: list[dict[str, Any]],
+    *,
+    return_rows: bool = True,
+) -> list[dict[str, Any]]:
+    """
+    Добавление нескольких реакций одним INSERT ... SELECT FROM unnest(...).
+
+    rows — словари с ключами аргументов add_reaction. Повторы одной реакции
+    схлопываются до последней: ON CONFLICT DO UPDATE не может затронуть
+    строку дважды в одном операторе. return_rows=False — без RETURNING
+    (путь вебхука, которому строки не нужны); тогда возвращается [].
+    """
+    unique = {
+        (
+            row["chat_id"],
+            row["telegram_message_id"],
+            row["user_id"],
+            row["reaction_type"],
+            row.get("reaction_emoji"),
+            row.get("reaction_custom_emoji_id"),
+        ): row
+        for row in rows
+    }
+    if not unique:
+        return []
+    rows = list(unique.values())
+    sql = """
+        INSERT INTO message_reactions (
+            message_id, chat_id, telegram_message_id, user_id,
+            reaction_type, reaction_emoji, reaction_custom_emoji_id
+        )
+        SELECT * FROM unnest(
+            %s::bigint[], %s::text[], %s::bigint[], %s::text[],
+            %s::text[], %s::text[], %s::text[]
+        )
+        ON CONFLICT (chat_id, telegram_message_id, user_id, reaction_type, reaction_emoji, reaction_custom_emoji_id)
+        DO UPDATE SET date = NOW()
+    """
+    if return_rows:
+        sql += " RETURNING *"
+    inserted: list[dict[str, Any]] = []
+    async with transaction() as cur:
+        await cur.execute(
+            sql,
+            [
+                [row["message_id"] for row in rows],
+                [row["chat_id"] for row in rows],
+                [row["telegram_message_id"] for row in rows],
+                [row["user_id"] for row in rows],
+                [row["reaction_type"] for row in rows],
+                [row.get("reaction_emoji") for row in rows],
+                [row.get("reaction_custom_emoji_id") for row in rows],
+            ],
+        )
+        if return_rows:
+            inserted = await cur.fetchall()
+    for chat_id, telegram_message_id in {(row["chat_id"], row["telegram_message_id"]) for row in rows}:
+        invalidate(reactions_key(chat_id, telegram_message_id))
+    return inserted
 
 
 async def remove_reaction(
@@ -53,8 +126,8 @@ async def remove_reaction(
         DELETE FROM message_reactions
         WHERE chat_id = %s AND telegram_message_id = %s AND user_id = %s
           AND reaction_type = %s
-          AND (reaction_emoji = %s OR (%s IS NULL AND reaction_emoji IS NULL))
-          AND (reaction_custom_emoji_id = %s OR (%s IS NULL AND reaction_custom_emoji_id IS NULL))
+          AND reaction_emoji IS NOT DISTINCT FROM %s
+          AND reaction_custom_emoji_id IS NOT DISTINCT FROM %s
     """
     await execute(
         sql,
@@ -64,13 +137,13 @@ async def remove_reaction(
             user_id,
             reaction_type,
             reaction_emoji,
-            reaction_emoji,
-            reaction_custom_emoji_id,
             reaction_custom_emoji_id,
         ],
     )
+    invalidate(reactions_key(chat_id, telegram_message_id))
 
 
+@cached(reactions_key, ttl=30.0)
 async def get_message_reactions(
     chat_id: str,
     telegram_message_id: int,
@@ -90,8 +163,13 @@ async def list_reactions(
     user_id: str | None = None,
     limit: int = 100,
     offset: int = 0,
+    cursor: str | None = None,
 ) -> list[dict[str, Any]]:
-    """Список реакций с фильтрацией."""
+    """Список реакций с фильтрацией, новые первыми.
+
+    cursor (created_cursor(row, "date") последней строки страницы) включает
+    keyset-пагинацию по (date, id) вместо OFFSET.
+    """
     where = []
     values: list[Any] = []
 
@@ -104,9 +182,13 @@ async def list_reactions(
     if user_id:
         where.append("user_id = %s")
         values.append(user_id)
+    if cursor is not None:
+        where.append("(date, id) < (%s::timestamptz, %s)")
+        values.extend(decode_created_cursor(cursor))
+        offset = 0
 
     where_sql = f"WHERE {' AND '.join(where)}" if where else ""
-    sql = f"SELECT * FROM message_reactions {where_sql} ORDER BY date DESC LIMIT %s OFFSET %s"
+    sql = f"SELECT * FROM message_reactions {where_sql} ORDER BY date DESC, id DESC LIMIT %s OFFSET %s"
     values.extend([limit, offset])
 
     return await fetch_all(sql, values)
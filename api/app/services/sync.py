@@ -122,6 +122,10 @@ async def sync_chat_admins(chat_id: str, bot_id: int | None = None) -> list[dict
         admins = []
 
     synced: list[dict[str, Any]] = []
+    # Пользователи и членства всех админов — одним запросом (повтор
+    # user_id схлопывается до последнего: ON CONFLICT не трогает строку дважды)
+    user_rows: dict[str, list[Any]] = {}
+    member_rows: dict[str, list[Any]] = {}
 
     for admin in admins:
         user = admin.get("user", {})
@@ -129,37 +133,18 @@ async def sync_chat_admins(chat_id: str, bot_id: int | None = None) -> list[dict
         if not user_id:
             continue
 
-        # Upsert пользователя
-        await execute(
-            """
-            INSERT INTO users (user_id, is_bot, first_name, last_name, username,
-                               language_code, is_premium, added_to_attachment_menu,
-                               last_seen_at, first_seen_at)
-            VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
-            ON CONFLICT (user_id) DO UPDATE
-            SET is_bot = EXCLUDED.is_bot,
-                first_name = EXCLUDED.first_name,
-                last_name = EXCLUDED.last_name,
-                username = EXCLUDED.username,
-                language_code = EXCLUDED.language_code,
-                is_premium = EXCLUDED.is_premium,
-                added_to_attachment_menu = COALESCE(EXCLUDED.added_to_attachment_menu, users.added_to_attachment_menu),
-                last_seen_at = NOW(),
-                updated_at = NOW()
-            """,
-            [
-                str(user_id),
-                bool(user.get("is_bot")),
-                user.get("first_name"),
-                user.get("last_name"),
-                user.get("username"),
-                user.get("language_code"),
-                bool(user.get("is_premium")) if user.get("is_premium") is not None else None,
-                bool(user.get("added_to_attachment_menu")) if user.get("added_to_attachment_menu") is not None else None,
-            ],
-        )
-
-        # Upsert членства с расширенными полями
+        user_rows[str(user_id)] = [
+            str(user_id),
+            bool(user.get("is_bot")),
+            user.get("first_name"),
+            user.get("last_name"),
+            user.get("username"),
+            user.get("language_code"),
+            bool(user.get("is_premium")) if user.get("is_premium") is not None else None,
+            bool(user.get("added_to_attachment_menu")) if user.get("added_to_attachment_menu") is not None else None,
+        ]
+
+        # Членство с расширенными полями
         status = admin.get("status", "administrator")
         custom_title = admin.get("custom_title")
         is_anonymous = admin.get("is_anonymous")
@@ -170,13 +155,44 @@ async def sync_chat_admins(chat_id: str, bot_id: int | None = None) -> list[dict
             and not k.startswith("can_")
             and isinstance(v, (bool, int, str))
         }
+        member_rows[str(user_id)] = [
+            str(chat_id), str(user_id), resolved_bot_id, status,
+            custom_title, is_anonymous,
+            json.dumps(permissions) if permissions else None,
+            json.dumps(metadata),
+        ]
+
+        synced.append({
+            "user_id": str(user_id),
+            "username": user.get("username"),
+            "status": status,
+        })
 
+    if user_rows:
+        user_values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())"] * len(user_rows))
+        member_values = ", ".join(["(%s, %s, %s, %s, %s, %s, %s::jsonb, NOW(), NOW(), %s::jsonb)"] * len(member_rows))
         await execute(
-            """
+            f"""
+            WITH u AS (
+                INSERT INTO users (user_id, is_bot, first_name, last_name, username,
+                                   language_code, is_premium, added_to_attachment_menu,
+                                   last_seen_at, first_seen_at)
+                VALUES {user_values}
+                ON CONFLICT (user_id) DO UPDATE
+                SET is_bot = EXCLUDED.is_bot,
+                    first_name = EXCLUDED.first_name,
+                    last_name = EXCLUDED.last_name,
+                    username = EXCLUDED.username,
+                    language_code = EXCLUDED.language_code,
+                    is_premium = EXCLUDED.is_premium,
+                    added_to_attachment_menu = COALESCE(EXCLUDED.added_to_attachment_menu, users.added_to_attachment_menu),
+                    last_seen_at = NOW(),
+                    updated_at = NOW()
+            )
             INSERT INTO chat_members (chat_id, user_id, bot_id, status, custom_title,
                                       is_anonymous, permissions, last_seen_at,
                                       first_seen_at, metadata)
-            VALUES (%s, %s, %s, %s, %s, %s, %s::jsonb, NOW(), NOW(), %s::jsonb)
+            VALUES {member_values}
             ON CONFLICT (chat_id, user_id) DO UPDATE
             SET bot_id = COALESCE(EXCLUDED.bot_id, chat_members.bot_id),
                 status = EXCLUDED.status,
@@ -188,19 +204,11 @@ async def sync_chat_admins(chat_id: str, bot_id: int | None = None) -> list[dict
                 updated_at = NOW()
             """,
             [
-                str(chat_id), str(user_id), resolved_bot_id, status,
-                custom_title, is_anonymous,
-                json.dumps(permissions) if permissions else None,
-                json.dumps(metadata),
+                *(value for row in user_rows.values() for value in row),
+                *(value for row in member_rows.values() for value in row),
             ],
         )
 
-        synced.append({
-            "user_id": str(user_id),
-            "username": user.get("username"),
-            "status": status,
-        })
-
     return synced
 
 
@@ -2,10 +2,15 @@ from __future__ import annotations
 
 from typing import Any
 
-from ..db import execute, execute_returning, fetch_all, fetch_one
+from ..cache import cached, invalidate, invalidate_tag
+from ..db import execute, execute_returning, fetch_all, fetch_one, transaction
 from ..templates import list_template_files, read_template_file, render_from_string
 
 
+def _template_key(name: str) -> str:
+    return f"tpl:{name}"
+
+
 async def create_template(
     name: str,
     body: str,
@@ -20,6 +25,7 @@ async def create_template(
         """,
         [name, body, parse_mode, description],
     )
+    invalidate(_template_key(name))
     return row or {}
 
 
@@ -42,9 +48,11 @@ async def upsert_template(
         """,
         [name, body, parse_mode, description],
     )
+    invalidate(_template_key(name))
     return row or {}
 
 
+@cached(_template_key, ttl=60.0, tag="templates")
 async def get_template(name: str) -> dict | None:
     return await fetch_one("SELECT * FROM templates WHERE name = %s", [name])
 
@@ -62,10 +70,33 @@ async def render_template(name: str, variables: dict[str, Any] | None = None) ->
 
 
 async def seed_templates_from_files() -> list[dict]:
-    results: list[dict] = []
-    for filename in list_template_files():
-        body = read_template_file(filename)
-        name = filename.rsplit(".", 1)[0]
-        tpl = await upsert_template(name=name, body=body, parse_mode="HTML", description="seeded")
-        results.append(tpl)
-    return results
+    """Залить все *.j2 из templates_dir одним multi-row upsert'ом."""
+    files = list_template_files()
+    if not files:
+        return []
+    names = [filename.rsplit(".", 1)[0] for filename in files]
+    bodies = [read_template_file(filename) for filename in files]
+    async with transaction() as cur:
+        await cur.execute(
+            """
+            WITH src AS (
+                SELECT t.name, t.body, t.ord
+                FROM unnest(%s::text[], %s::text[]) WITH ORDINALITY AS t(name, body, ord)
+            ),
+            up AS (
+                INSERT INTO templates (name, body, parse_mode, description)
+                SELECT name, body, 'HTML', 'seeded' FROM src
+                ON CONFLICT (name) DO UPDATE
+                SET body = EXCLUDED.body,
+                    parse_mode = EXCLUDED.parse_mode,
+                    description = EXCLUDED.description,
+                    updated_at = NOW()
+                RETURNING *
+            )
+            SELECT up.* FROM up JOIN src USING (name) ORDER BY src.ord
+            """,
+            [names, bodies],
+        )
+        rows = await cur.fetchall()
+    invalidate_tag("templates")
+    return rows
@@ -5,9 +5,20 @@ from __future__ import annotations
 import asyncio
 import json
 import logging
-from typing import Any
-
-from ..db import execute, execute_returning, fetch_all, fetch_one
+from datetime import datetime, timezone
+from typing import Any, Iterable
+
+import orjson
+
+from ..cache import cached, invalidate
+from ..db import (
+    decode_created_cursor,
+    execute,
+    execute_returning,
+    fetch_all,
+    fetch_one,
+    transaction,
+)
 from ..telegram_client import (
     send_message,
     answer_callback_query,
@@ -15,49 +26,107 @@ from ..telegram_client import (
     send_invoice,
     answer_pre_checkout_query,
 )
-from . import user_state, balance
+from ..utils import escape_html
+from . import user_state, balance, predictions, reactions
 
 logger = logging.getLogger(__name__)
 
 
-def _detect_update_type(update: dict[str, Any]) -> str:
-    for key in (
-        "message",
-        "edited_message",
-        "channel_post",
-        "edited_channel_post",
-        "callback_query",
-        "my_chat_member",
-        "chat_member",
-        "chat_join_request",
-        "message_reaction",
-        "message_reaction_count",
-        "poll",
-        "poll_answer",
-        "inline_query",
-        "chosen_inline_result",
-        "shipping_query",
-        "pre_checkout_query",
-        "purchased_paid_media",
-        "business_connection",
-        "business_message",
-        "edited_business_message",
-        "deleted_business_messages",
-    ):
-        if key in update:
-            return key
-    return "unknown"
+def _dumps(value: Any) -> str:
+    """JSON для параметров ::jsonb (orjson — C-энкодер, в разы быстрее json)."""
+    return orjson.dumps(value).decode()
 
 
-def _extract_message(update: dict[str, Any]) -> dict[str, Any] | None:
-    for key in ("message", "edited_message", "channel_post", "edited_channel_post"):
-        if key in update:
-            return update[key]
+def _str_id(obj: dict[str, Any] | None) -> str | None:
+    """obj["id"] строкой (формат chat_id/user_id в БД) или None."""
+    if obj and obj.get("id") is not None:
+        return str(obj["id"])
     return None
 
 
-async def _upsert_user(user: dict[str, Any]) -> None:
-    await execute(
+# Типы обновлений в порядке приоритета определения
+_UPDATE_KEYS = (
+    "message",
+    "edited_message",
+    "channel_post",
+    "edited_channel_post",
+    "callback_query",
+    "my_chat_member",
+    "chat_member",
+    "chat_join_request",
+    "message_reaction",
+    "message_reaction_count",
+    "poll",
+    "poll_answer",
+    "inline_query",
+    "chosen_inline_result",
+    "shipping_query",
+    "pre_checkout_query",
+    "purchased_paid_media",
+    "business_connection",
+    "business_message",
+    "edited_business_message",
+    "deleted_business_messages",
+)
+
+# Тип -> приоритет (чем меньше, тем раньше в _UPDATE_KEYS)
+_UPDATE_PRIORITY = {key: i for i, key in enumerate(_UPDATE_KEYS)}
+
+# Типы, полезная нагрузка которых — объект Message
+_MSG_KEYS = frozenset(("message", "edited_message", "channel_post", "edited_channel_post"))
+
+
+def _classify(update: dict[str, Any]) -> tuple[str, dict[str, Any] | None]:
+    """
+    Тип обновления и его Message (если есть).
+
+    Идём по ключам самого апдейта (обычно update_id и одно поле типа),
+    а не по всем типам; при нескольких полях побеждает более раннее
+    в _UPDATE_KEYS.
+    """
+    message = update.get("message")
+    if message is not None:
+        return "message", message
+
+    found: str | None = None
+    for key in update:
+        if key in _UPDATE_PRIORITY and update[key] is not None and (
+            found is None or _UPDATE_PRIORITY[key] < _UPDATE_PRIORITY[found]
+        ):
+            found = key
+    if found is None:
+        return "unknown", None
+    return found, (update[found] if found in _MSG_KEYS else None)
+
+
+# Один SQL-оператор записи: (текст, параметры)
+_Statement = tuple[str, list[Any]]
+
+
+async def _execute_batch(statements: list[_Statement | None]) -> None:
+    """
+    Выполнить несколько INSERT/UPDATE одним запросом.
+
+    Все операторы, кроме последнего, становятся data-modifying CTE
+    (WITH s0 AS (...), s1 AS (...) <последний>) — один round-trip вместо
+    N. Операторы выполняются на одном снимке и не видят изменений друг
+    друга, поэтому в пачке не должно быть двух записей в одну строку.
+    FK-проверки выполняются в конце запроса и видят строки соседних CTE.
+    """
+    batch = [st for st in statements if st is not None]
+    if not batch:
+        return
+    *head, (last_sql, _) = batch
+    query = last_sql
+    if head:
+        ctes = ",\n".join(f"s{i} AS ({sql})" for i, (sql, _) in enumerate(head))
+        query = f"WITH {ctes}\n{last_sql}"
+    await execute(query, [param for _, params in batch for param in params])
+
+
+def _user_upsert(user: dict[str, Any], *, message_count: int = 0) -> _Statement:
+    """Upsert пользователя; message_count прибавляется к счётчику сообщений."""
+    return (
         """
         INSERT INTO users (
             user_id,
@@ -68,10 +137,11 @@ async def _upsert_user(user: dict[str, Any]) -> None:
             language_code,
             is_premium,
             added_to_attachment_menu,
+            message_count,
             last_seen_at,
             first_seen_at
         )
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, NOW(), NOW())
         ON CONFLICT (user_id) DO UPDATE
         SET is_bot = EXCLUDED.is_bot,
             first_name = EXCLUDED.first_name,
@@ -80,6 +150,7 @@ async def _upsert_user(user: dict[str, Any]) -> None:
             language_code = EXCLUDED.language_code,
             is_premium = EXCLUDED.is_premium,
             added_to_attachment_menu = COALESCE(EXCLUDED.added_to_attachment_menu, users.added_to_attachment_menu),
+            message_count = COALESCE(users.message_count, 0) + EXCLUDED.message_count,
             last_seen_at = NOW(),
             updated_at = NOW()
         """,
@@ -92,15 +163,22 @@ async def _upsert_user(user: dict[str, Any]) -> None:
             user.get("language_code"),
             bool(user.get("is_premium")) if user.get("is_premium") is not None else None,
             bool(user.get("added_to_attachment_menu")) if user.get("added_to_attachment_menu") is not None else None,
+            message_count,
         ],
     )
 
 
-async def _upsert_chat(chat: dict[str, Any], bot_id: int | None = None) -> None:
-    photo = chat.get("photo") or {}
-    chat_id = str(chat.get("id"))
+def _chat_upsert(chat: dict[str, Any], bot_id: int | None = None) -> _Statement:
+    """
+    Upsert чата из апдейта.
 
-    await execute(
+    Существующая строка переписывается, только если что-то изменилось или
+    updated_at старше минуты: updated_at входит в индекс chats_bot_id_idx,
+    и обновление на каждое сообщение горячего чата плодило бы новые версии
+    строки и записи индекса.
+    """
+    photo = chat.get("photo") or {}
+    return (
         """
         INSERT INTO chats (
             chat_id,
@@ -126,9 +204,31 @@ async def _upsert_chat(chat: dict[str, Any], bot_id: int | None = None) -> None:
             photo_file_id = COALESCE(EXCLUDED.photo_file_id, chats.photo_file_id),
             bot_id = COALESCE(EXCLUDED.bot_id, chats.bot_id),
             updated_at = NOW()
+        WHERE (
+            EXCLUDED.type,
+            EXCLUDED.title,
+            EXCLUDED.username,
+            COALESCE(EXCLUDED.description, chats.description),
+            COALESCE(EXCLUDED.is_forum, chats.is_forum),
+            COALESCE(EXCLUDED.member_count, chats.member_count),
+            COALESCE(EXCLUDED.invite_link, chats.invite_link),
+            COALESCE(EXCLUDED.photo_file_id, chats.photo_file_id),
+            COALESCE(EXCLUDED.bot_id, chats.bot_id)
+        ) IS DISTINCT FROM (
+            chats.type,
+            chats.title,
+            chats.username,
+            chats.description,
+            chats.is_forum,
+            chats.member_count,
+            chats.invite_link,
+            chats.photo_file_id,
+            chats.bot_id
+        )
+            OR chats.updated_at < NOW() - INTERVAL '1 minute'
         """,
         [
-            chat_id,
+            str(chat.get("id")),
             chat.get("type"),
             chat.get("title"),
             chat.get("username"),
@@ -141,12 +241,20 @@ async def _upsert_chat(chat: dict[str, Any], bot_id: int | None = None) -> None:
         ],
     )
 
-    # Авто-sync: запустить фоновую синхронизацию если member_count или photo_file_id не заполнены
+
+def _schedule_chat_sync(chat: dict[str, Any], bot_id: int | None = None) -> None:
+    """Авто-sync: запустить фоновую синхронизацию если member_count или photo_file_id не заполнены."""
+    chat_id = str(chat.get("id"))
     if chat_id not in _syncing_chats:
         _syncing_chats.add(chat_id)
         asyncio.create_task(_auto_sync_chat_if_needed(chat_id, bot_id))
 
 
+async def _upsert_chat(chat: dict[str, Any], bot_id: int | None = None) -> None:
+    await execute(*_chat_upsert(chat, bot_id=bot_id))
+    _schedule_chat_sync(chat, bot_id=bot_id)
+
+
 # Множество чатов, для которых уже запущен/выполнен авто-sync (в рамках этого процесса)
 _syncing_chats: set[str] = set()
 
@@ -185,15 +293,18 @@ async def _auto_sync_chat_if_needed(chat_id: str, bot_id: int | None) -> None:
         logger.debug("Авто-sync для чата %s не удался", chat_id, exc_info=True)
 
 
-async def _upsert_chat_member(
+def _chat_member_upsert(
     chat_id: str | int | None,
     user_id: str | int | None,
     bot_id: int | None = None,
     status: str | None = None,
     member_data: dict[str, Any] | None = None,
-) -> None:
+    *,
+    message_count: int = 0,
+) -> _Statement | None:
+    """Upsert участника чата; None, если чат или пользователь неизвестны."""
     if chat_id is None or user_id is None:
-        return
+        return None
 
     # Извлечь расширенные поля из ChatMember object
     md = member_data or {}
@@ -202,18 +313,17 @@ async def _upsert_chat_member(
     until_date_ts = md.get("until_date")
     until_date = None
     if until_date_ts and isinstance(until_date_ts, (int, float)):
-        from datetime import datetime, timezone
         until_date = datetime.fromtimestamp(until_date_ts, tz=timezone.utc).isoformat()
 
     # Собрать все can_* permissions в JSONB
     permissions = {k: v for k, v in md.items() if k.startswith("can_") and isinstance(v, bool)} or None
 
-    await execute(
+    return (
         """
         INSERT INTO chat_members (chat_id, user_id, bot_id, status, custom_title,
-                                  is_anonymous, until_date, permissions, last_seen_at,
-                                  first_seen_at, metadata)
-        VALUES (%s, %s, %s, %s, %s, %s, %s, %s::jsonb, NOW(), NOW(), %s::jsonb)
+                                  is_anonymous, until_date, permissions, message_count,
+                                  last_seen_at, first_seen_at, metadata)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s::jsonb, %s, NOW(), NOW(), %s::jsonb)
         ON CONFLICT (chat_id, user_id) DO UPDATE
         SET bot_id = COALESCE(EXCLUDED.bot_id, chat_members.bot_id),
             status = COALESCE(EXCLUDED.status, chat_members.status),
@@ -221,6 +331,7 @@ async def _upsert_chat_member(
             is_anonymous = COALESCE(EXCLUDED.is_anonymous, chat_members.is_anonymous),
             until_date = COALESCE(EXCLUDED.until_date, chat_members.until_date),
             permissions = COALESCE(EXCLUDED.permissions, chat_members.permissions),
+            message_count = COALESCE(chat_members.message_count, 0) + EXCLUDED.message_count,
             last_seen_at = NOW(),
             metadata = EXCLUDED.metadata,
             updated_at = NOW()
@@ -228,23 +339,21 @@ async def _upsert_chat_member(
         [
             str(chat_id), str(user_id), bot_id, status or "member",
             custom_title, is_anonymous, until_date,
-            json.dumps(permissions) if permissions else None,
-            json.dumps({}),
+            _dumps(permissions) if permissions else None,
+            message_count,
+            "{}",
         ],
     )
 
 
-async def _increment_message_count(user_id: str, chat_id: str) -> None:
-    """Инкремент счётчика сообщений в users и chat_members."""
-    await execute(
-        "UPDATE users SET message_count = COALESCE(message_count, 0) + 1 WHERE user_id = %s",
-        [user_id],
-    )
-    await execute(
-        """UPDATE chat_members SET message_count = COALESCE(message_count, 0) + 1
-           WHERE user_id = %s AND chat_id = %s""",
-        [user_id, chat_id],
-    )
+async def _upsert_chat_member(
+    chat_id: str | int | None,
+    user_id: str | int | None,
+    bot_id: int | None = None,
+    status: str | None = None,
+    member_data: dict[str, Any] | None = None,
+) -> None:
+    await _execute_batch([_chat_member_upsert(chat_id, user_id, bot_id, status, member_data)])
 
 
 def _extract_media_type(message: dict[str, Any]) -> str | None:
@@ -270,19 +379,19 @@ def _extract_forward_origin(message: dict[str, Any]) -> dict[str, Any] | None:
     return None
 
 
-async def _insert_inbound_message(message: dict[str, Any], update_type: str, bot_id: int | None = None) -> None:
+def _inbound_message_insert(message: dict[str, Any], update_type: str, bot_id: int | None = None) -> _Statement | None:
     message_id = message.get("message_id")
 
     # Если нет message_id, пропускаем сохранение
     if not message_id:
-        return
+        return None
 
     media_type = _extract_media_type(message)
     forward_origin = _extract_forward_origin(message)
     sender_chat = message.get("sender_chat")
     entities = message.get("entities") or message.get("caption_entities")
 
-    await execute(
+    return (
         """
         INSERT INTO messages (
             chat_id,
@@ -311,19 +420,19 @@ async def _insert_inbound_message(message: dict[str, Any], update_type: str, bot
             bot_id,
             message.get("text"),
             update_type,
-            json.dumps(message),
+            _dumps(message),
             media_type,
             message.get("caption"),
-            json.dumps(forward_origin) if forward_origin else None,
+            _dumps(forward_origin) if forward_origin else None,
             str(sender_chat["id"]) if sender_chat else None,
-            json.dumps(entities) if entities else None,
+            _dumps(entities) if entities else None,
             media_type is not None,
             bool(message.get("is_topic_message")),
         ],
     )
 
 
-async def _insert_chat_event(
+def _chat_event_insert(
     chat_id: str | int,
     bot_id: int | None,
     event_type: str,
@@ -331,9 +440,9 @@ async def _insert_chat_event(
     target_user_id: str | int | None = None,
     tg_msg_id: int | None = None,
     event_data: dict[str, Any] | None = None,
-) -> None:
-    """Записать системное событие чата (join, leave, pin, title_change и т.д.)."""
-    await execute(
+) -> _Statement:
+    """Запись системного события чата (join, leave, pin, title_change и т.д.)."""
+    return (
         """
         INSERT INTO chat_events
             (chat_id, bot_id, event_type, actor_user_id, target_user_id,
@@ -347,7 +456,7 @@ async def _insert_chat_event(
             str(actor_user_id) if actor_user_id is not None else None,
             str(target_user_id) if target_user_id is not None else None,
             tg_msg_id,
-            json.dumps(event_data or {}),
+            _dumps(event_data) if event_data else "{}",
         ],
     )
 
@@ -363,14 +472,8 @@ async def _handle_message_reaction(update: dict[str, Any], bot_id: int | None =
     if not chat_id or not tg_msg_id:
         return
 
-    # Upsert чат и юзер
-    if reaction_chat:
-        await _upsert_chat(reaction_chat, bot_id=bot_id)
-    user_id: str | None = None
-    if reaction_user:
-        user_id = str(reaction_user["id"])
-        await _upsert_user(reaction_user)
-        await _upsert_chat_member(chat_id, user_id, bot_id=bot_id)
+    # Чат, пользователь и участник уже записаны в ingest_update
+    user_id = str(reaction_user["id"]) if reaction_user else None
 
     # Найти внутренний message_id
     msg_row = await fetch_one(
@@ -402,20 +505,23 @@ async def _handle_message_reaction(update: dict[str, Any], bot_id: int | None =
                 """,
                 [chat_id, tg_msg_id, user_id, rtype, emoji],
             )
+    if removed and user_id:
+        invalidate(reactions.reactions_key(chat_id, tg_msg_id))
 
     # Добавить новые реакции
     added = new_set - old_set
-    for rtype, emoji, custom_id in added:
-        await execute(
-            """
-            INSERT INTO message_reactions
-                (message_id, chat_id, telegram_message_id, user_id,
-                 reaction_type, reaction_emoji, reaction_custom_emoji_id)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-            ON CONFLICT DO NOTHING
-            """,
-            [internal_msg_id, chat_id, tg_msg_id, user_id, rtype, emoji, custom_id or None],
-        )
+    await reactions.add_reactions_bulk([
+        {
+            "message_id": internal_msg_id,
+            "chat_id": chat_id,
+            "telegram_message_id": tg_msg_id,
+            "user_id": user_id,
+            "reaction_type": rtype,
+            "reaction_emoji": emoji,
+            "reaction_custom_emoji_id": custom_id or None,
+        }
+        for rtype, emoji, custom_id in added
+    ], return_rows=False)
 
 
 async def _handle_system_events(
@@ -427,90 +533,91 @@ async def _handle_system_events(
     """Обработка системных событий внутри message (join, leave, pin, photo, title)."""
     tg_msg_id = message.get("message_id")
 
+    # Пользователи, участники и события — одним запросом
+    writes: list[_Statement | None] = []
+
     # Новые участники чата
     if message.get("new_chat_members"):
         for new_member in message["new_chat_members"]:
-            await _upsert_user(new_member)
-            await _upsert_chat_member(
+            writes.append(_user_upsert(new_member))
+            writes.append(_chat_member_upsert(
                 chat_id, new_member.get("id"), bot_id=bot_id, status="member",
-            )
-            await _insert_chat_event(
+            ))
+            writes.append(_chat_event_insert(
                 chat_id, bot_id, "join",
                 actor_user_id=from_user_id,
                 target_user_id=new_member.get("id"),
                 tg_msg_id=tg_msg_id,
-            )
+            ))
 
     # Участник вышел / был удалён
     if message.get("left_chat_member"):
         left = message["left_chat_member"]
-        await _upsert_user(left)
-        await _upsert_chat_member(
+        writes.append(_user_upsert(left))
+        writes.append(_chat_member_upsert(
             chat_id, left.get("id"), bot_id=bot_id, status="left",
-        )
-        await _insert_chat_event(
+        ))
+        writes.append(_chat_event_insert(
             chat_id, bot_id, "leave",
             actor_user_id=from_user_id,
             target_user_id=left.get("id"),
             tg_msg_id=tg_msg_id,
-        )
+        ))
 
     # Закреплённое сообщение
     if message.get("pinned_message"):
         pinned = message["pinned_message"]
-        await _insert_chat_event(
+        writes.append(_chat_event_insert(
             chat_id, bot_id, "pin",
             actor_user_id=from_user_id,
             tg_msg_id=tg_msg_id,
             event_data={"pinned_message_id": pinned.get("message_id")},
-        )
+        ))
 
     # Новая фотография чата
     if message.get("new_chat_photo"):
-        await _insert_chat_event(
+        writes.append(_chat_event_insert(
             chat_id, bot_id, "new_photo",
             actor_user_id=from_user_id,
             tg_msg_id=tg_msg_id,
-        )
+        ))
 
     # Удаление фотографии чата
     if message.get("delete_chat_photo"):
-        await _insert_chat_event(
+        writes.append(_chat_event_insert(
             chat_id, bot_id, "delete_photo",
             actor_user_id=from_user_id,
             tg_msg_id=tg_msg_id,
-        )
+        ))
 
     # Смена названия чата
     if message.get("new_chat_title"):
-        await _insert_chat_event(
+        writes.append(_chat_event_insert(
             chat_id, bot_id, "title_change",
             actor_user_id=from_user_id,
             tg_msg_id=tg_msg_id,
             event_data={"new_title": message["new_chat_title"]},
-        )
+        ))
 
     # Миграция чата (supergroup upgrade)
     if message.get("migrate_to_chat_id"):
-        await _insert_chat_event(
+        writes.append(_chat_event_insert(
             chat_id, bot_id, "migrate",
             tg_msg_id=tg_msg_id,
             event_data={"migrate_to_chat_id": message["migrate_to_chat_id"]},
-        )
+        ))
+
+    await _execute_batch(writes)
 
 
-async def _insert_callback_query(callback_query: dict[str, Any], bot_id: int | None = None) -> None:
-    """Сохранение callback_query в БД."""
+def _callback_query_insert(callback_query: dict[str, Any], bot_id: int | None = None) -> _Statement:
+    """Сохранение callback_query в БД (пользователь upsert'ится отдельно)."""
     cq_id = str(callback_query.get("id"))
     cq_from = callback_query.get("from", {})
     message = callback_query.get("message", {})
     chat = message.get("chat", {})
 
-    # Upsert пользователя
-    if cq_from:
-        await _upsert_user(cq_from)
-
-    await execute(
+    return (
         """
         INSERT INTO callback_queries (
             callback_query_id, chat_id, user_id, message_id,
@@ -526,42 +633,70 @@ async def _insert_callback_query(callback_query: dict[str, Any], bot_id: int | N
             message.get("message_id"),
             callback_query.get("inline_message_id"),
             callback_query.get("data"),
-            json.dumps(callback_query),
+            _dumps(callback_query),
             bot_id,
         ],
     )
 
 
-async def _update_event_announcement(event_id: int) -> None:
+@cached(predictions.event_key, ttl=1.5)
+async def _fetch_event_with_options(event_id: int) -> dict[str, Any] | None:
     """
-    Обновить публичный анонс события с текущими коэффициентами и распределением.
+    Получить событие вместе с его вариантами за один запрос.
 
-    Вызывается после каждой новой ставки.
+    Варианты приходят обычными строками LEFT JOIN и собираются в список
+    event["options"] на стороне Python, в порядке создания. Результат
+    кешируется на 1.5 с: повторные нажатия «Статистика»/«Поставить» не ходят
+    в БД, а запись ставки сбрасывает ключ predictions.event_key.
     """
-    # Получить событие с полной информацией
-    event = await fetch_one(
+    rows = await fetch_all(
         """
         SELECT
             e.*,
-            (SELECT json_agg(json_build_object(
-                'id', option_id,
-                'text', text,
-                'value', value,
-                'total_bets', total_bets,
-                'total_amount', total_amount
-            )) FROM prediction_options WHERE event_id = e.id) as options
+            o.option_id AS _opt_id,
+            o.text AS _opt_text,
+            o.value AS _opt_value,
+            o.total_bets AS _opt_total_bets,
+            o.total_amount AS _opt_total_amount
         FROM prediction_events e
+        LEFT JOIN prediction_options o ON o.event_id = e.id
         WHERE e.id = %s
+        ORDER BY o.id
         """,
         [event_id]
     )
+    if not rows:
+        return None
+
+    options = []
+    for row in rows:
+        option = {
+            "id": row.pop("_opt_id"),
+            "text": row.pop("_opt_text"),
+            "value": row.pop("_opt_value"),
+            "total_bets": row.pop("_opt_total_bets"),
+            "total_amount": row.pop("_opt_total_amount"),
+        }
+        if option["id"] is not None:
+            options.append(option)
+
+    event = rows[0]
+    event["options"] = options
+    return event
+
+
+async def _update_event_announcement(event_id: int) -> None:
+    """
+    Обновить публичный анонс события с текущими коэффициентами и распределением.
+
+    Вызывается после каждой новой ставки.
+    """
+    # Получить событие с полной информацией
+    event = await _fetch_event_with_options(event_id)
 
     if not event or not event.get("telegram_message_id") or not event.get("chat_id"):
         return  # Нет сообщения для обновления
 
-    def escape_html(text: str) -> str:
-        return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-
     # Форматирование опций с распределением
     options_lines = []
     total_pool = event["total_pool"]
@@ -641,6 +776,65 @@ async def _update_event_announcement(event_id: int) -> None:
         logger.warning(f"Failed to update event announcement: {e}")
 
 
+def _render_betting_interface(
+    event: dict[str, Any], user_balance: int
+) -> tuple[str, dict[str, Any]]:
+    """
+    Сообщение выбора варианта ставки: (текст, reply_markup).
+
+    Общее для /bet_{event_id} и кнопки «Поставить» из анонса.
+    """
+    event_id = event["id"]
+    options = event.get("options") or []
+
+    options_text = "\n".join([
+        f"  • {opt['text']}" + (f" <code>({escape_html(opt['value'])})</code>" if opt.get('value') else "")
+        for opt in options
+    ])
+
+    # Коэффициенты — только для вариантов, на которые уже ставили
+    total_pool = event["total_pool"]
+    coefficients = [
+        f"  • {opt['text']}: x{round(total_pool / opt_amount, 2)}"
+        for opt in options
+        if (opt_amount := opt.get("total_amount", 0)) > 0
+    ] if total_pool > 0 else []
+    coefficients_text = (
+        f"\n\n<b>Текущие коэффициенты:</b>\n{chr(10).join(coefficients)}" if coefficients else ""
+    )
+
+    # Кнопка на каждый вариант и кнопка статистики
+    inline_keyboard = [
+        [{"text": f"💰 {opt['text']}", "callback_data": f"bet_{event_id}_{opt['id']}"}]
+        for opt in options
+    ]
+    inline_keyboard.append([
+        {
+            "text": "📊 Статистика события",
+            "callback_data": f"stats_{event_id}"
+        }
+    ])
+
+    message_text = f"""
+💰 <b>Размещение ставки</b>
+
+<b>{event['title']}</b>
+
+{event['description']}
+
+<b>Варианты:</b>
+{options_text}
+
+<b>Ставка:</b> {event['min_bet']}-{event['max_bet']} ⭐
+<b>Общий банк:</b> {total_pool} ⭐
+<b>Ваш баланс:</b> {user_balance} ⭐{coefficients_text}
+
+<i>Выберите вариант для ставки:</i>
+    """.strip()
+
+    return message_text, {"inline_keyboard": inline_keyboard}
+
+
 async def _handle_bet_command(user_id: int, text: str, chat_id: int) -> None:
     """
     Обработка команды /bet_{event_id}.
@@ -658,22 +852,10 @@ async def _handle_bet_command(user_id: int, text: str, chat_id: int) -> None:
         })
         return
 
-    # Получить событие с опциями
-    event = await fetch_one(
-        """
-        SELECT
-            e.*,
-            (SELECT json_agg(json_build_object(
-                'id', option_id,
-                'text', text,
-                'value', value,
-                'total_bets', total_bets,
-                'total_amount', total_amount
-            )) FROM prediction_options WHERE event_id = e.id) as options
-        FROM prediction_events e
-        WHERE e.id = %s
-        """,
-        [event_id]
+    # Событие с опциями и баланс пользователя — независимые чтения
+    event, user_balance = await asyncio.gather(
+        _fetch_event_with_options(event_id),
+        balance.get_user_balance(user_id),
     )
 
     if not event:
@@ -692,75 +874,13 @@ async def _handle_bet_command(user_id: int, text: str, chat_id: int) -> None:
         })
         return
 
-    # Получить баланс пользователя
-    user_balance = await balance.get_user_balance(user_id)
-
-    # Форматирование опций
-    def escape_html(text: str) -> str:
-        return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-
-    options_text = "\n".join([
-        f"  • {opt['text']}" + (f" <code>({escape_html(opt['value'])})</code>" if opt.get('value') else "")
-        for opt in (event.get("options") or [])
-    ])
-
-    # Расчёт коэффициентов
-    total_pool = event["total_pool"]
-    coefficients_text = ""
-
-    if total_pool > 0:
-        coefficients = []
-        for opt in (event.get("options") or []):
-            opt_amount = opt.get("total_amount", 0)
-            if opt_amount > 0:
-                coef = round(total_pool / opt_amount, 2)
-                coefficients.append(f"  • {opt['text']}: x{coef}")
-
-        if coefficients:
-            coefficients_text = f"\n\n<b>Текущие коэффициенты:</b>\n{chr(10).join(coefficients)}"
-
-    # Формируем кнопки для каждого варианта
-    inline_keyboard = []
-    for opt in (event.get("options") or []):
-        inline_keyboard.append([
-            {
-                "text": f"💰 {opt['text']}",
-                "callback_data": f"bet_{event_id}_{opt['id']}"
-            }
-        ])
-
-    # Кнопка для просмотра статистики
-    inline_keyboard.append([
-        {
-            "text": "📊 Статистика события",
-            "callback_data": f"stats_{event_id}"
-        }
-    ])
-
-    message_text = f"""
-💰 <b>Размещение ставки</b>
-
-<b>{event['title']}</b>
-
-{event['description']}
-
-<b>Варианты:</b>
-{options_text}
-
-<b>Ставка:</b> {event['min_bet']}-{event['max_bet']} ⭐
-<b>Общий банк:</b> {total_pool} ⭐
-<b>Ваш баланс:</b> {user_balance} ⭐{coefficients_text}
-
-<i>Выберите вариант для ставки:</i>
-    """.strip()
+    message_text, reply_markup = _render_betting_interface(event, user_balance)
 
     await send_message({
         "chat_id": chat_id,
         "text": message_text,
         "parse_mode": "HTML",
-        "reply_markup": {
-            "inline_keyboard": inline_keyboard
-        }
+        "reply_markup": reply_markup,
     })
 
     logger.info(f"User {user_id} requested betting interface for event {event_id}")
@@ -792,22 +912,10 @@ async def _handle_bet_event_callback(callback_query: dict[str, Any]) -> None:
         })
         return
 
-    # Получить событие с опциями
-    event = await fetch_one(
-        """
-        SELECT
-            e.*,
-            (SELECT json_agg(json_build_object(
-                'id', option_id,
-                'text', text,
-                'value', value,
-                'total_bets', total_bets,
-                'total_amount', total_amount
-            )) FROM prediction_options WHERE event_id = e.id) as options
-        FROM prediction_events e
-        WHERE e.id = %s
-        """,
-        [event_id]
+    # Событие с опциями и баланс пользователя — независимые чтения
+    event, user_balance = await asyncio.gather(
+        _fetch_event_with_options(event_id),
+        balance.get_user_balance(user_id),
     )
 
     if not event:
@@ -826,75 +934,13 @@ async def _handle_bet_event_callback(callback_query: dict[str, Any]) -> None:
         })
         return
 
-    # Получить баланс пользователя
-    user_balance = await balance.get_user_balance(user_id)
-
-    # Форматирование опций
-    def escape_html(text: str) -> str:
-        return text.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;")
-
-    options_text = "\n".join([
-        f"  • {opt['text']}" + (f" <code>({escape_html(opt['value'])})</code>" if opt.get('value') else "")
-        for opt in (event.get("options") or [])
-    ])
-
-    # Расчёт коэффициентов
-    total_pool = event["total_pool"]
-    coefficients_text = ""
-
-    if total_pool > 0:
-        coefficients = []
-        for opt in (event.get("options") or []):
-            opt_amount = opt.get("total_amount", 0)
-            if opt_amount > 0:
-                coef = round(total_pool / opt_amount, 2)
-                coefficients.append(f"  • {opt['text']}: x{coef}")
-
-        if coefficients:
-            coefficients_text = f"\n\n<b>Текущие коэффициенты:</b>\n{chr(10).join(coefficients)}"
-
-    # Формируем кнопки для каждого варианта
-    inline_keyboard = []
-    for opt in (event.get("options") or []):
-        inline_keyboard.append([
-            {
-                "text": f"💰 {opt['text']}",
-                "callback_data": f"bet_{event_id}_{opt['id']}"
-            }
-        ])
-
-    # Кнопка для просмотра статистики
-    inline_keyboard.append([
-        {
-            "text": "📊 Статистика события",
-            "callback_data": f"stats_{event_id}"
-        }
-    ])
-
-    message_text = f"""
-💰 <b>Размещение ставки</b>
-
-<b>{event['title']}</b>
-
-{event['description']}
-
-<b>Варианты:</b>
-{options_text}
-
-<b>Ставка:</b> {event['min_bet']}-{event['max_bet']} ⭐
-<b>Общий банк:</b> {total_pool} ⭐
-<b>Ваш баланс:</b> {user_balance} ⭐{coefficients_text}
-
-<i>Выберите вариант для ставки:</i>
-    """.strip()
+    message_text, reply_markup = _render_betting_interface(event, user_balance)
 
     await send_message({
         "chat_id": user_id,
         "text": message_text,
         "parse_mode": "HTML",
-        "reply_markup": {
-            "inline_keyboard": inline_keyboard
-        }
+        "reply_markup": reply_markup,
     })
 
     # Ответить на callback
@@ -936,10 +982,18 @@ async def _handle_bet_callback(callback_query: dict[str, Any]) -> None:
         })
         return
 
-    # Проверка события
-    event = await fetch_one(
-        "SELECT * FROM prediction_events WHERE id = %s",
-        [event_id]
+    # Событие, вариант и баланс не зависят друг от друга — читаем разом,
+    # проверяем после
+    event, option, user_balance = await asyncio.gather(
+        fetch_one(
+            "SELECT * FROM prediction_events WHERE id = %s",
+            [event_id]
+        ),
+        fetch_one(
+            "SELECT * FROM prediction_options WHERE event_id = %s AND option_id = %s",
+            [event_id, option_id]
+        ),
+        balance.get_user_balance(user_id),
     )
 
     if not event:
@@ -958,12 +1012,6 @@ async def _handle_bet_callback(callback_query: dict[str, Any]) -> None:
         })
         return
 
-    # Проверка варианта
-    option = await fetch_one(
-        "SELECT * FROM prediction_options WHERE event_id = %s AND option_id = %s",
-        [event_id, option_id]
-    )
-
     if not option:
         await answer_callback_query({
             "callback_query_id": cq_id,
@@ -972,9 +1020,6 @@ async def _handle_bet_callback(callback_query: dict[str, Any]) -> None:
         })
         return
 
-    # Получить текущий баланс
-    user_balance = await balance.get_user_balance(user_id)
-
     # Установить состояние FSM
     await user_state.set_user_state(
         user_id=user_id,
@@ -1050,22 +1095,7 @@ async def _handle_stats_callback(callback_query: dict[str, Any]) -> None:
         return
 
     # Получить событие с опциями
-    event = await fetch_one(
-        """
-        SELECT
-            e.*,
-            (SELECT json_agg(json_build_object(
-                'id', option_id,
-                'text', text,
-                'value', value,
-                'total_bets', total_bets,
-                'total_amount', total_amount
-            )) FROM prediction_options WHERE event_id = e.id) as options
-        FROM prediction_events e
-        WHERE e.id = %s
-        """,
-        [event_id]
-    )
+    event = await _fetch_event_with_options(event_id)
 
     if not event:
         await answer_callback_query({
@@ -1125,11 +1155,22 @@ async def _process_callback_query(callback_query: dict[str, Any]) -> None:
 async def _handle_balance_command(user_id: int, chat_id: int) -> None:
     """Обработка команды /balance — показать баланс и статистику."""
     try:
-        # Получить баланс
-        user_balance = await balance.get_user_balance(user_id)
-
-        # Получить статистику транзакций
-        history = await balance.get_balance_history(user_id, limit=5, transaction_type=None)
+        # Баланс, последние транзакции и активные ставки — параллельно
+        user_balance, history, active_bets = await asyncio.gather(
+            balance.get_user_balance(user_id),
+            balance.get_balance_history(user_id, limit=5),
+            fetch_all(
+                """
+                SELECT pb.*, pe.title as event_title, po.text as option_text
+                FROM prediction_bets pb
+                JOIN prediction_events pe ON pb.event_id = pe.id
+                JOIN prediction_options po ON pb.event_id = po.event_id AND pb.option_id = po.option_id
+                WHERE pb.user_id = %s AND pb.status = 'active'
+                ORDER BY pb.created_at DESC
+                """,
+                [user_id]
+            ),
+        )
 
         # Посчитать итоги
         total_deposits = sum(
@@ -1148,19 +1189,6 @@ async def _handle_balance_command(user_id: int, chat_id: int) -> None:
             if t.get("transaction_type") == "win"
         )
 
-        # Получить активные ставки
-        active_bets = await fetch_all(
-            """
-            SELECT pb.*, pe.title as event_title, po.text as option_text
-            FROM prediction_bets pb
-            JOIN prediction_events pe ON pb.event_id = pe.id
-            JOIN prediction_options po ON pb.event_id = po.event_id AND pb.option_id = po.option_id
-            WHERE pb.user_id = %s AND pb.status = 'active'
-            ORDER BY pb.created_at DESC
-            """,
-            [user_id]
-        )
-
         # Сформировать сообщение
         text = f"""
 💰 <b>Ваш баланс</b>
@@ -1233,6 +1261,41 @@ async def _process_text_message(message: dict[str, Any]) -> None:
         await _handle_bet_amount_input(user_id, text, state_data, chat_id)
 
 
+async def _insert_bet(
+    event_id: int,
+    option_id: str,
+    user_id: int,
+    net_amount: int,
+    commission: int,
+    *,
+    source: str,
+) -> dict[str, Any] | None:
+    """Ставка и статистика банка/варианта/комиссии — одним запросом."""
+    return await execute_returning(
+        """
+        WITH b AS (
+            INSERT INTO prediction_bets
+            (event_id, option_id, user_id, amount, status, source)
+            VALUES (%s, %s, %s, %s, 'active', %s)
+            RETURNING id, event_id, option_id, amount
+        ), opt AS (
+            UPDATE prediction_options o
+            SET total_bets = o.total_bets + 1, total_amount = o.total_amount + b.amount
+            FROM b
+            WHERE o.event_id = b.event_id AND o.option_id = b.option_id
+        ), evt AS (
+            UPDATE prediction_events e
+            SET total_pool = e.total_pool + b.amount,
+                bot_commission = e.bot_commission + %s
+            FROM b
+            WHERE e.id = b.event_id
+        )
+        SELECT id FROM b
+        """,
+        [event_id, option_id, user_id, net_amount, source, commission]
+    )
+
+
 async def _handle_bet_amount_input(
     user_id: int,
     text: str,
@@ -1354,7 +1417,7 @@ async def _handle_bet_amount_input(
     net_amount = amount - commission
 
     # Списать с баланса
-    success = await balance.deduct_from_balance(
+    new_balance = await balance.deduct_from_balance(
         user_id=user_id,
         amount=amount,
         transaction_type="bet",
@@ -1363,7 +1426,7 @@ async def _handle_bet_amount_input(
         description=f"Ставка на '{option_text}' в событии '{event_title}'"
     )
 
-    if not success:
+    if new_balance is None:
         await send_message({
             "chat_id": chat_id,
             "text": "❌ Ошибка списания средств. Попробуйте снова.",
@@ -1371,44 +1434,13 @@ async def _handle_bet_amount_input(
         })
         return
 
-    # Создать ставку
-    bet = await execute_returning(
-        """
-        INSERT INTO prediction_bets
-        (event_id, option_id, user_id, amount, status, source)
-        VALUES (%s, %s, %s, %s, 'active', 'balance')
-        RETURNING id
-        """,
-        [event_id, option_id, user_id, net_amount]
-    )
-
-    # Обновить статистику события
-    await execute(
-        """
-        UPDATE prediction_events
-        SET total_pool = total_pool + %s,
-            bot_commission = bot_commission + %s
-        WHERE id = %s
-        """,
-        [net_amount, commission, event_id]
-    )
-
-    # Обновить статистику опции
-    await execute(
-        """
-        UPDATE prediction_options
-        SET total_bets = total_bets + 1,
-            total_amount = total_amount + %s
-        WHERE event_id = %s AND option_id = %s
-        """,
-        [net_amount, event_id, option_id]
-    )
+    bet = await _insert_bet(event_id, option_id, user_id, net_amount, commission, source="balance")
+    invalidate(predictions.event_key(event_id))
 
     # Очистить состояние
     await user_state.clear_user_state(user_id)
 
     # Отправить подтверждение
-    new_balance = await balance.get_user_balance(user_id)
 
     confirmation_text = f"""
 ✅ <b>Ставка принята!</b>
@@ -1557,7 +1589,7 @@ async def _handle_successful_payment(message: dict[str, Any]) -> None:
     net_amount = bet_amount - commission
 
     # Списать с баланса
-    success = await balance.deduct_from_balance(
+    new_balance = await balance.deduct_from_balance(
         user_id=user_id,
         amount=bet_amount,
         transaction_type="bet",
@@ -1566,7 +1598,7 @@ async def _handle_successful_payment(message: dict[str, Any]) -> None:
         description=f"Ставка на '{option_text}' в событии '{event_title}'"
     )
 
-    if not success:
+    if new_balance is None:
         await send_message({
             "chat_id": chat_id,
             "text": "❌ Ошибка размещения ставки. Средства остались на балансе.",
@@ -1575,44 +1607,13 @@ async def _handle_successful_payment(message: dict[str, Any]) -> None:
         await user_state.clear_user_state(user_id)
         return
 
-    # Создать ставку
-    bet = await execute_returning(
-        """
-        INSERT INTO prediction_bets
-        (event_id, option_id, user_id, amount, status, source)
-        VALUES (%s, %s, %s, %s, 'active', 'payment')
-        RETURNING id
-        """,
-        [event_id, option_id, user_id, net_amount]
-    )
-
-    # Обновить статистику события
-    await execute(
-        """
-        UPDATE prediction_events
-        SET total_pool = total_pool + %s,
-            bot_commission = bot_commission + %s
-        WHERE id = %s
-        """,
-        [net_amount, commission, event_id]
-    )
-
-    # Обновить статистику опции
-    await execute(
-        """
-        UPDATE prediction_options
-        SET total_bets = total_bets + 1,
-            total_amount = total_amount + %s
-        WHERE event_id = %s AND option_id = %s
-        """,
-        [net_amount, event_id, option_id]
-    )
+    bet = await _insert_bet(event_id, option_id, user_id, net_amount, commission, source="payment")
+    invalidate(predictions.event_key(event_id))
 
     # Очистить состояние
     await user_state.clear_user_state(user_id)
 
     # Отправить подтверждение
-    new_balance = await balance.get_user_balance(user_id)
 
     confirmation_text = f"""
 ✅ <b>Оплата успешна! Ставка размещена!</b>
@@ -1645,62 +1646,527 @@ async def _handle_successful_payment(message: dict[str, Any]) -> None:
     await _update_event_announcement(event_id)
 
 
+# ---------------------------------------------------------------------------
+# Лог webhook_updates — фоновая запись пачками
+# ---------------------------------------------------------------------------
+
+_WEBHOOK_FLUSH_INTERVAL = 0.02  # секунд между пачками
+_WEBHOOK_BATCH_MAX = 500
+_WEBHOOK_WRITE_ATTEMPTS = 4
+_WEBHOOK_RETRY_DELAY = 0.5  # секунд, удваивается с каждой попыткой
+
+# (update_id, update_type, chat_id, user_id, message_id, payload_json, bot_id, received_at)
+_WebhookRow = tuple[Any, str, str | None, str | None, int | None, str, int | None, datetime]
+
+_webhook_queue: asyncio.Queue[_WebhookRow] | None = None
+_webhook_task: asyncio.Task | None = None
+_webhook_dropped = 0  # строк, потерянных после всех попыток записи
+
+
+async def _write_webhook_batch(batch: list[_WebhookRow]) -> None:
+    """Один multi-row upsert в webhook_updates.
+
+    Колонки передаются массивами в unnest(): текст SQL не зависит от
+    размера пачки, и prepared statement соединения переиспользуется.
+    Повторы update_id внутри пачки схлопываются до последнего —
+    ON CONFLICT DO UPDATE не может затронуть одну строку дважды.
+    """
+    rows = list({row[0]: row for row in batch}.values())
+    await execute(
+        """
+        INSERT INTO webhook_updates
+            (update_id, update_type, chat_id, user_id, message_id, payload_json, bot_id, received_at)
+        SELECT v.update_id, v.update_type, v.chat_id, v.user_id, v.message_id,
+               v.payload_json::jsonb, v.bot_id, v.received_at
+        FROM unnest(
+            %s::bigint[], %s::text[], %s::text[], %s::text[],
+            %s::bigint[], %s::text[], %s::bigint[], %s::timestamptz[]
+        ) AS v(update_id, update_type, chat_id, user_id, message_id, payload_json, bot_id, received_at)
+        ON CONFLICT (update_id) DO UPDATE
+        SET update_type = EXCLUDED.update_type,
+            chat_id = EXCLUDED.chat_id,
+            user_id = EXCLUDED.user_id,
+            message_id = EXCLUDED.message_id,
+            payload_json = EXCLUDED.payload_json,
+            bot_id = EXCLUDED.bot_id,
+            received_at = EXCLUDED.received_at
+        """,
+        [list(column) for column in zip(*rows)],
+    )
+
+
+async def _persist_webhook_batch(batch: list[_WebhookRow]) -> None:
+    """Записать пачку с повторами и экспоненциальной паузой.
+
+    Кратковременный сбой БД (рестарт, исчерпанный пул) переживается
+    повтором; если все попытки неудачны — пачка теряется, это видно
+    в логе (error) и в счётчике dropped_webhook_rows().
+    """
+    global _webhook_dropped
+    for attempt in range(1, _WEBHOOK_WRITE_ATTEMPTS + 1):
+        try:
+            await _write_webhook_batch(batch)
+            return
+        except Exception as exc:
+            if attempt == _WEBHOOK_WRITE_ATTEMPTS:
+                _webhook_dropped += len(batch)
+                logger.error(
+                    "Dropped webhook_updates batch (%d rows) after %d attempts: %s",
+                    len(batch), attempt, exc,
+                )
+                return
+            delay = _WEBHOOK_RETRY_DELAY * 2 ** (attempt - 1)
+            logger.warning(
+                "Failed to write webhook_updates batch (%d rows), retry in %.1fs (attempt %d/%d): %s",
+                len(batch), delay, attempt, _WEBHOOK_WRITE_ATTEMPTS, exc,
+            )
+            await asyncio.sleep(delay)
+
+
+def dropped_webhook_rows() -> int:
+    """Сколько строк webhook_updates потеряно с запуска процесса."""
+    return _webhook_dropped
+
+
+def _drain_webhook_queue(limit: int | None = None) -> list[_WebhookRow]:
+    """Забрать из очереди до limit элементов без ожидания."""
+    batch: list[_WebhookRow] = []
+    while _webhook_queue is not None and not _webhook_queue.empty():
+        if limit is not None and len(batch) >= limit:
+            break
+        batch.append(_webhook_queue.get_nowait())
+    return batch
+
+
+async def _webhook_writer() -> None:
+    """Фоновый цикл: ждёт первую запись, копит пачку ~20 мс, пишет одним INSERT."""
+    assert _webhook_queue is not None
+    while True:
+        batch = [await _webhook_queue.get()]
+        try:
+            await asyncio.sleep(_WEBHOOK_FLUSH_INTERVAL)
+            batch.extend(_drain_webhook_queue(_WEBHOOK_BATCH_MAX - 1))
+            await _persist_webhook_batch(batch)
+        except asyncio.CancelledError:
+            # Остановка посреди пачки: строки уже вынуты из очереди и
+            # flush их не увидит — дописать перед выходом
+            await _persist_webhook_batch(batch)
+            raise
+
+
+def start_webhook_writer() -> None:
+    """Запуск фоновой записи webhook_updates (lifespan приложения)."""
+    global _webhook_queue, _webhook_task
+    if _webhook_task is not None:
+        return
+    _webhook_queue = asyncio.Queue()
+    _webhook_task = asyncio.create_task(_webhook_writer())
+
+
+async def flush_webhook_updates() -> None:
+    """Синхронно записать всё, что накопилось в очереди."""
+    while batch := _drain_webhook_queue(_WEBHOOK_BATCH_MAX):
+        await _persist_webhook_batch(batch)
+
+
+async def stop_webhook_writer() -> None:
+    """Остановка фоновой записи с дозаписью хвоста очереди."""
+    global _webhook_queue, _webhook_task
+    if _webhook_task is None:
+        return
+    _webhook_task.cancel()
+    try:
+        await _webhook_task
+    except asyncio.CancelledError:
+        pass
+    await flush_webhook_updates()
+    _webhook_queue = None
+    _webhook_task = None
+
+
+# ---------------------------------------------------------------------------
+# Отложенная запись сущностей апдейтов без обработчиков
+# ---------------------------------------------------------------------------
+
+# После upsert'ов чата/пользователя/участника ingest_update для этих типов
+# ничего не читает и не пишет — запись можно закончить уже после ответа
+_DEFERRED_WRITE_TYPES = frozenset(("chat_member", "my_chat_member"))
+
+# (пачка upsert'ов, чаты для авто-sync, bot_id)
+_EntityWrite = tuple[list[_Statement | None], list[dict[str, Any]], int | None]
+
+_entity_queue: asyncio.Queue[_EntityWrite] | None = None
+_entity_task: asyncio.Task | None = None
+# Держит writer на время записи: синхронный ingest дожидается его, чтобы
+# не обогнать отложенный upsert той же строки
+_entity_lock = asyncio.Lock()
+_entity_dropped = 0  # пачек, потерянных после всех попыток записи
+
+
+async def _write_entities(item: _EntityWrite) -> None:
+    """Записать отложенную пачку с повторами (как _persist_webhook_batch).
+
+    Повтор — на месте, а не в конец очереди: upsert'ы одной строки должны
+    лечь в порядке апдейтов, а синхронный ingest на это время ждёт
+    _entity_lock.
+    """
+    global _entity_dropped
+    writes, chats, bot_id = item
+    for attempt in range(1, _WEBHOOK_WRITE_ATTEMPTS + 1):
+        try:
+            await _execute_batch(writes)
+            break
+        except Exception as exc:
+            if attempt == _WEBHOOK_WRITE_ATTEMPTS:
+                _entity_dropped += 1
+                logger.error(
+                    "Dropped deferred update entities (%d statements) after %d attempts: %s",
+                    len(writes), attempt, exc,
+                )
+                return
+            delay = _WEBHOOK_RETRY_DELAY * 2 ** (attempt - 1)
+            logger.warning(
+                "Failed to write deferred update entities, retry in %.1fs (attempt %d/%d): %s",
+                delay, attempt, _WEBHOOK_WRITE_ATTEMPTS, exc,
+            )
+            await asyncio.sleep(delay)
+    # Авто-sync читает строку чата — только после того, как она записана
+    for chat in chats:
+        _schedule_chat_sync(chat, bot_id=bot_id)
+
+
+async def _entity_writer() -> None:
+    """Фоновый цикл: отложенные пачки пишутся по одной, в порядке приёма."""
+    assert _entity_queue is not None
+    while True:
+        item = await _entity_queue.get()
+        try:
+            async with _entity_lock:
+                await _write_entities(item)
+        except asyncio.CancelledError:
+            # Остановка посреди записи: пачка уже вынута из очереди,
+            # повтор upsert'ов идемпотентен
+            await _write_entities(item)
+            raise
+
+
+def dropped_entity_writes() -> int:
+    """Сколько отложенных пачек сущностей потеряно с запуска процесса."""
+    return _entity_dropped
+
+
+def _drain_entity_queue() -> list[_EntityWrite]:
+    items: list[_EntityWrite] = []
+    while _entity_queue is not None and not _entity_queue.empty():
+        items.append(_entity_queue.get_nowait())
+    return items
+
+
+async def flush_entity_writes() -> None:
+    """Дописать отложенные пачки и дождаться той, что пишется сейчас."""
+    async with _entity_lock:
+        for item in _drain_entity_queue():
+            await _write_entities(item)
+
+
+def start_entity_writer() -> None:
+    """Запуск фоновой записи сущностей (lifespan приложения)."""
+    global _entity_queue, _entity_task
+    if _entity_task is not None:
+        return
+    _entity_queue = asyncio.Queue()
+    _entity_task = asyncio.create_task(_entity_writer())
+
+
+async def stop_entity_writer() -> None:
+    """Остановка фоновой записи с дозаписью хвоста очереди."""
+    global _entity_queue, _entity_task
+    if _entity_task is None:
+        return
+    _entity_task.cancel()
+    try:
+        await _entity_task
+    except asyncio.CancelledError:
+        pass
+    await flush_entity_writes()
+    _entity_queue = None
+    _entity_task = None
+
+
+_WEBHOOK_PURGE_INTERVAL = 3600.0
+_WEBHOOK_PURGE_BATCH = 5000
+
+_webhook_purge_task: asyncio.Task | None = None
+
+
+async def purge_webhook_updates(older_than_days: int) -> int:
+    """
+    Удалить из webhook_updates строки старше older_than_days дней.
+
+    Пачками по _WEBHOOK_PURGE_BATCH (самые старые первыми, по индексу
+    received_at): короткие транзакции не держат блокировки и не раздувают WAL
+    одним гигантским DELETE. Возвращает число удалённых строк.
+    """
+    total = 0
+    while True:
+        row = await execute_returning(
+            """
+            WITH doomed AS (
+                SELECT id FROM webhook_updates
+                WHERE received_at < NOW() - make_interval(days => %s)
+                ORDER BY received_at, id
+                LIMIT %s
+            ),
+            deleted AS (
+                DELETE FROM webhook_updates w
+                USING doomed d
+                WHERE w.id = d.id
+                RETURNING 1
+            )
+            SELECT COUNT(*) AS n FROM deleted
+            """,
+            [older_than_days, _WEBHOOK_PURGE_BATCH],
+        )
+        deleted = row["n"] if row else 0
+        total += deleted
+        if deleted < _WEBHOOK_PURGE_BATCH:
+            return total
+
+
+async def _webhook_purger(retention_days: int) -> None:
+    """Фоновый цикл: раз в _WEBHOOK_PURGE_INTERVAL чистит устаревший журнал."""
+    while True:
+        try:
+            deleted = await purge_webhook_updates(retention_days)
+            if deleted:
+                logger.info("Purged %d webhook_updates older than %d days", deleted, retention_days)
+        except Exception as exc:
+            logger.warning("Failed to purge webhook_updates: %s", exc)
+        await asyncio.sleep(_WEBHOOK_PURGE_INTERVAL)
+
+
+def start_webhook_purger(retention_days: int) -> None:
+    """Запуск очистки webhook_updates (lifespan); retention_days <= 0 — выключена."""
+    global _webhook_purge_task
+    if _webhook_purge_task is not None or retention_days <= 0:
+        return
+    _webhook_purge_task = asyncio.create_task(_webhook_purger(retention_days))
+
+
+async def stop_webhook_purger() -> None:
+    """Остановка очистки webhook_updates."""
+    global _webhook_purge_task
+    if _webhook_purge_task is None:
+        return
+    _webhook_purge_task.cancel()
+    try:
+        await _webhook_purge_task
+    except asyncio.CancelledError:
+        pass
+    _webhook_purge_task = None
+
+
+async def _record_webhook_update(row: _WebhookRow) -> None:
+    """Запись обновления в webhook_updates.
+
+    При запущенном writer'е — неблокирующая постановка в очередь
+    (received_at фиксируется при приёме), иначе — прямой upsert.
+    """
+    if _webhook_queue is not None:
+        _webhook_queue.put_nowait(row)
+        return
+    await _write_webhook_batch([row])
+
+
+async def bulk_ingest_updates(updates: Iterable[dict[str, Any]], bot_id: int | None = None) -> int:
+    """
+    Загрузка пачки сохранённых апдейтов (replay/backfill после сбоя).
+
+    webhook_updates заливается через COPY во временную таблицу и одним
+    INSERT ... SELECT; чаты, пользователи, участники и входящие сообщения —
+    теми же upsert'ами, что и в ingest_update, через executemany (pipeline,
+    без round-trip на строку). Всё в одной транзакции. Бизнес-логика
+    (команды, callback'и, реакции, платежи) не запускается — это
+    восстановление журнала, а не повторная доставка.
+
+    Повторный импорт идемпотентен: счётчики сообщений users и chat_members
+    растут только за update_id, которых ещё не было в webhook_updates.
+
+    Возвращает число записанных апдейтов (повторы update_id схлопываются).
+    """
+    received_at = datetime.now(timezone.utc)
+    rows: dict[Any, _WebhookRow] = {}
+    chats: dict[str, dict[str, Any]] = {}
+    users: dict[str, dict[str, Any]] = {}
+    # update_id -> (chat_id, user_id) отправителя и считается ли апдейт
+    # в message_count (только тип message, как в ingest_update); ключ —
+    # update_id, поэтому повтор апдейта в пачке не считается дважды
+    senders: dict[Any, tuple[tuple[str, str], bool]] = {}
+    messages: list[_Statement] = []
+
+    for update in updates:
+        update_type, message = _classify(update)
+        payload = update.get(update_type)
+        source = message or (payload if isinstance(payload, dict) else {})
+        chat = source.get("chat") or (source.get("message") or {}).get("chat")
+        if update_type in ("chat_member", "my_chat_member"):
+            # Как в ingest_update: пользователь — участник, а не автор изменения
+            user = (source.get("new_chat_member") or {}).get("user")
+        else:
+            user = source.get("from") or source.get("user")
+
+        if chat and chat.get("id") is not None:
+            chats[str(chat["id"])] = chat
+        if user and user.get("id") is not None:
+            users[str(user["id"])] = user
+        update_id = update.get("update_id")
+        if message and chat and chat.get("id") is not None and user and user.get("id") is not None:
+            senders[update_id] = ((str(chat["id"]), str(user["id"])), update_type == "message")
+        if message:
+            statement = _inbound_message_insert(message, update_type, bot_id=bot_id)
+            if statement is not None:
+                messages.append(statement)
+
+        rows[update_id] = (
+            update_id,
+            update_type,
+            str(chat["id"]) if chat and chat.get("id") is not None else None,
+            str(user["id"]) if user and user.get("id") is not None else None,
+            message.get("message_id") if message else None,
+            _dumps(update),
+            bot_id,
+            received_at,
+        )
+
+    if not rows:
+        return 0
+
+    async with transaction() as cur:
+        await cur.execute(
+            """
+            CREATE TEMP TABLE webhook_updates_stage (
+                update_id BIGINT,
+                update_type TEXT,
+                chat_id TEXT,
+                user_id TEXT,
+                message_id BIGINT,
+                payload_json JSONB,
+                bot_id BIGINT,
+                received_at TIMESTAMPTZ
+            ) ON COMMIT DROP
+            """
+        )
+        async with cur.copy(
+            "COPY webhook_updates_stage "
+            "(update_id, update_type, chat_id, user_id, message_id, payload_json, bot_id, received_at) "
+            "FROM STDIN"
+        ) as copy:
+            for row in rows.values():
+                await copy.write_row(row)
+        await cur.execute(
+            """
+            INSERT INTO webhook_updates
+                (update_id, update_type, chat_id, user_id, message_id, payload_json, bot_id, received_at)
+            SELECT update_id, update_type, chat_id, user_id, message_id, payload_json, bot_id, received_at
+            FROM webhook_updates_stage
+            ON CONFLICT (update_id) DO UPDATE
+            SET update_type = EXCLUDED.update_type,
+                chat_id = EXCLUDED.chat_id,
+                user_id = EXCLUDED.user_id,
+                message_id = EXCLUDED.message_id,
+                payload_json = EXCLUDED.payload_json,
+                bot_id = EXCLUDED.bot_id,
+                received_at = EXCLUDED.received_at
+            RETURNING update_id, (xmax = 0) AS inserted
+            """
+        )
+        new_ids = {row["update_id"] for row in await cur.fetchall() if row["inserted"]}
+
+        # message_count — только за впервые записанные апдейты
+        member_messages: dict[tuple[str, str], int] = {}
+        for update_id, (pair, counted) in senders.items():
+            member_messages[pair] = member_messages.get(pair, 0) + int(counted and update_id in new_ids)
+        user_messages: dict[str, int] = {}
+        for (_, user_id), count in member_messages.items():
+            user_messages[user_id] = user_messages.get(user_id, 0) + count
+
+        # У каждой группы один текст SQL — executemany шлёт параметры пачкой
+        for group in (
+            [_chat_upsert(chat, bot_id=bot_id) for chat in chats.values()],
+            [
+                _user_upsert(user, message_count=user_messages.get(user_id, 0))
+                for user_id, user in users.items()
+            ],
+            [
+                _chat_member_upsert(chat_id, user_id, bot_id=bot_id, message_count=count)
+                for (chat_id, user_id), count in member_messages.items()
+            ],
+            messages,
+        ):
+            if group:
+                await cur.executemany(group[0][0], [params for _, params in group])
+
+    return len(rows)
+
+
 async def ingest_update(update: dict[str, Any], bot_id: int | None = None) -> dict[str, Any]:
     update_id = update.get("update_id")
-    update_type = _detect_update_type(update)
-    message = _extract_message(update)
+    update_type, message = _classify(update)
 
     update_chat_id: str | None = None
     update_user_id: str | None = None
     update_message_id: int | None = None
 
+    # Upsert'ы чатов/пользователей/участников и входящее сообщение
+    # копятся здесь и уходят одним запросом (_execute_batch)
+    writes: list[_Statement | None] = []
+    upserted_chats: list[dict[str, Any]] = []
+
+    from_user_id: str | None = None
     if message:
         chat = message.get("chat") or {}
-        update_chat_id = str(chat.get("id")) if chat.get("id") is not None else None
+        update_chat_id = _str_id(chat)
         update_message_id = message.get("message_id")
-        await _upsert_chat(chat, bot_id=bot_id)
-        from_user_id: str | None = None
-        if message.get("from"):
-            from_user = message.get("from") or {}
-            from_user_id = str(from_user.get("id")) if from_user.get("id") is not None else None
+        writes.append(_chat_upsert(chat, bot_id=bot_id))
+        upserted_chats.append(chat)
+        from_user = message.get("from")
+        if from_user:
+            from_user_id = _str_id(from_user)
             update_user_id = from_user_id
-            await _upsert_user(from_user)
-            await _upsert_chat_member(chat.get("id"), from_user.get("id"), bot_id=bot_id)
             # Счётчик сообщений (только для inbound от реальных юзеров)
-            if update_type == "message" and from_user_id and update_chat_id:
-                await _increment_message_count(from_user_id, update_chat_id)
-        await _insert_inbound_message(message, update_type, bot_id=bot_id)
-        # Системные события (join, leave, pin, photo, title)
-        if update_chat_id:
-            await _handle_system_events(message, update_chat_id, from_user_id, bot_id)
-        # Обработка текстовых сообщений для FSM
-        if update_type == "message" and message.get("text"):
-            await _process_text_message(message)
-
-    # Обработка callback_query
+            counted = 1 if update_type == "message" and from_user_id and update_chat_id else 0
+            writes.append(_user_upsert(from_user, message_count=counted))
+            writes.append(_chat_member_upsert(
+                update_chat_id, from_user_id, bot_id=bot_id, message_count=counted,
+            ))
+        writes.append(_inbound_message_insert(message, update_type, bot_id=bot_id))
+
+    # callback_query
+    callback_query: dict[str, Any] = {}
     if update_type == "callback_query":
-        callback_query = update.get("callback_query", {})
-        callback_message = callback_query.get("message", {})
-        callback_chat = callback_message.get("chat", {})
-        callback_user = callback_query.get("from", {})
+        callback_query = update["callback_query"]
+        callback_message = callback_query.get("message") or {}
+        callback_chat = callback_message.get("chat") or {}
+        callback_user = callback_query.get("from") or {}
+        callback_chat_id = _str_id(callback_chat)
 
         if callback_chat:
-            update_chat_id = str(callback_chat.get("id")) if callback_chat.get("id") is not None else update_chat_id
-            await _upsert_chat(callback_chat, bot_id=bot_id)
+            update_chat_id = callback_chat_id or update_chat_id
+            writes.append(_chat_upsert(callback_chat, bot_id=bot_id))
+            upserted_chats.append(callback_chat)
         if callback_user:
-            update_user_id = str(callback_user.get("id")) if callback_user.get("id") is not None else update_user_id
-            await _upsert_user(callback_user)
-            await _upsert_chat_member(callback_chat.get("id"), callback_user.get("id"), bot_id=bot_id)
+            callback_user_id = _str_id(callback_user)
+            update_user_id = callback_user_id or update_user_id
+            writes.append(_user_upsert(callback_user))
+            writes.append(_chat_member_upsert(callback_chat_id, callback_user_id, bot_id=bot_id))
         if callback_message:
             update_message_id = callback_message.get("message_id") or update_message_id
 
-        await _insert_callback_query(callback_query, bot_id=bot_id)
-        # Бизнес-логика обработки callback
-        await _process_callback_query(callback_query)
+        writes.append(_callback_query_insert(callback_query, bot_id=bot_id))
 
-    # Обработка chat_member / my_chat_member (вступление/выход из чата)
+    # chat_member / my_chat_member (вступление/выход из чата)
     if update_type in ("chat_member", "my_chat_member"):
-        member_update = update.get(update_type, {})
+        member_update = update[update_type]
         cm_chat = member_update.get("chat") or {}
         cm_new = member_update.get("new_chat_member") or {}
         cm_user = cm_new.get("user") or {}
@@ -1709,25 +2175,75 @@ async def ingest_update(update: dict[str, Any], bot_id: int | None = None) -> di
         if cm_chat.get("id") and cm_user.get("id"):
             update_chat_id = str(cm_chat["id"])
             update_user_id = str(cm_user["id"])
-            await _upsert_chat(cm_chat, bot_id=bot_id)
-            await _upsert_user(cm_user)
-            await _upsert_chat_member(
-                cm_chat["id"], cm_user["id"],
+            writes.append(_chat_upsert(cm_chat, bot_id=bot_id))
+            upserted_chats.append(cm_chat)
+            writes.append(_user_upsert(cm_user))
+            writes.append(_chat_member_upsert(
+                update_chat_id, update_user_id,
                 bot_id=bot_id,
                 status=cm_status,
                 member_data=cm_new,
-            )
+            ))
 
-    # Обработка message_reaction
+    # message_reaction: чат и пользователь — в общую пачку, сами реакции — ниже
     if update_type == "message_reaction":
-        await _handle_message_reaction(update, bot_id=bot_id)
-        reaction_update = update.get("message_reaction", {})
-        rc = reaction_update.get("chat", {})
-        ru = reaction_update.get("user", {})
+        reaction_update = update["message_reaction"]
+        rc = reaction_update.get("chat") or {}
+        ru = reaction_update.get("user")
+        ru_id = _str_id(ru)
         if rc.get("id"):
             update_chat_id = str(rc["id"])
-        if ru.get("id"):
-            update_user_id = str(ru["id"])
+            if reaction_update.get("message_id"):
+                writes.append(_chat_upsert(rc, bot_id=bot_id))
+                upserted_chats.append(rc)
+                if ru:
+                    writes.append(_user_upsert(ru))
+                    writes.append(_chat_member_upsert(update_chat_id, ru_id, bot_id=bot_id))
+        if ru_id:
+            update_user_id = ru_id
+
+    if _entity_queue is not None:
+        if update_type in _DEFERRED_WRITE_TYPES:
+            # Обработчиков у апдейта нет — upsert'ы и авто-sync уходят в фон
+            _entity_queue.put_nowait((writes, upserted_chats, bot_id))
+            writes, upserted_chats = [], []
+        elif writes and (not _entity_queue.empty() or _entity_lock.locked()):
+            # Отложенные записи идут раньше: порядок upsert'ов одной строки
+            # должен совпадать с порядком апдейтов
+            await flush_entity_writes()
+
+    # Журнал апдейта и сущности независимы: без фонового writer'а это два
+    # upsert'а на разных соединениях пула, их round-trip'ы перекрываются
+    await asyncio.gather(
+        _record_webhook_update((
+            update_id,
+            update_type,
+            update_chat_id,
+            update_user_id,
+            update_message_id,
+            _dumps(update),
+            bot_id,
+            datetime.now(timezone.utc),
+        )),
+        _execute_batch(writes),
+    )
+    for chat in upserted_chats:
+        _schedule_chat_sync(chat, bot_id=bot_id)
+
+    # Бизнес-логика — после того, как чат, пользователь и сообщение записаны
+    if message:
+        # Системные события (join, leave, pin, photo, title)
+        if update_chat_id:
+            await _handle_system_events(message, update_chat_id, from_user_id, bot_id)
+        # Обработка текстовых сообщений для FSM
+        if update_type == "message" and message.get("text"):
+            await _process_text_message(message)
+
+    if update_type == "callback_query":
+        await _process_callback_query(callback_query)
+
+    if update_type == "message_reaction":
+        await _handle_message_reaction(update, bot_id=bot_id)
 
     # Обработка pre_checkout_query (подтверждение перед оплатой)
     if update_type == "pre_checkout_query":
@@ -1738,40 +2254,28 @@ async def ingest_update(update: dict[str, Any], bot_id: int | None = None) -> di
     if update_type == "message" and message and message.get("successful_payment"):
         await _handle_successful_payment(message)
 
-    await execute_returning(
-        """
-        INSERT INTO webhook_updates (update_id, update_type, chat_id, user_id, message_id, payload_json, bot_id)
-        VALUES (%s, %s, %s, %s, %s, %s::jsonb, %s)
-        ON CONFLICT (update_id) DO UPDATE
-        SET update_type = EXCLUDED.update_type,
-            chat_id = EXCLUDED.chat_id,
-            user_id = EXCLUDED.user_id,
-            message_id = EXCLUDED.message_id,
-            payload_json = EXCLUDED.payload_json,
-            bot_id = EXCLUDED.bot_id,
-            received_at = NOW()
-        RETURNING id
-        """,
-        [
-            update_id,
-            update_type,
-            update_chat_id,
-            update_user_id,
-            update_message_id,
-            json.dumps(update),
-            bot_id,
-        ],
-    )
-
     return {"ok": True, "update_type": update_type}
 
 
+# Колонки ленты апдейтов без payload_json (jsonb на десятки КБ)
+_UPDATE_LIST_COLUMNS = "id, update_id, update_type, chat_id, user_id, message_id, bot_id, received_at"
+
+
 async def list_updates(
     limit: int = 100,
     offset: int = 0,
     update_type: str | None = None,
     bot_id: int | None = None,
+    cursor: str | None = None,
+    include_payload: bool = True,
 ) -> list[dict]:
+    """Лента входящих апдейтов, новые первыми.
+
+    cursor (created_cursor(row, "received_at") последней строки страницы)
+    включает keyset-пагинацию по (received_at, id) вместо OFFSET.
+    include_payload=False не тянет payload_json — полный JSON отдельной
+    строки отдаёт get_update_payload().
+    """
     where: list[str] = []
     values: list[Any] = []
     if update_type:
@@ -1780,9 +2284,20 @@ async def list_updates(
     if bot_id is not None:
         where.append("bot_id = %s")
         values.append(bot_id)
+    if cursor is not None:
+        where.append("(received_at, id) < (%s::timestamptz, %s)")
+        values.extend(decode_created_cursor(cursor))
+        offset = 0
 
+    columns = f"{_UPDATE_LIST_COLUMNS}, payload_json" if include_payload else _UPDATE_LIST_COLUMNS
     where_sql = f"WHERE {' AND '.join(where)}" if where else ""
     return await fetch_all(
-        f"SELECT * FROM webhook_updates {where_sql} ORDER BY received_at DESC LIMIT %s OFFSET %s",
+        f"SELECT {columns} FROM webhook_updates {where_sql} ORDER BY received_at DESC, id DESC LIMIT %s OFFSET %s",
         [*values, limit, offset],
     )
+
+
+async def get_update_payload(update_row_id: int) -> dict[str, Any] | None:
+    """Полный JSON апдейта по внутреннему id строки webhook_updates."""
+    row = await fetch_one("SELECT payload_json FROM webhook_updates WHERE id = %s", [update_row_id])
+    return row["payload_json"] if row else None
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
+from functools import lru_cache
 from pathlib import Path
 from typing import Any
 
-from jinja2 import Environment, FileSystemLoader, select_autoescape
+from jinja2 import Environment, FileSystemLoader, Template, select_autoescape
 
 from .config import get_settings
 
@@ -14,12 +15,20 @@ _env = Environment(
     autoescape=select_autoescape(enabled_extensions=("html", "j2")),
     trim_blocks=True,
     lstrip_blocks=True,
+    # Файлы шаблонов попадают в работу через seed в БД, stat на каждый
+    # get_template не нужен
+    auto_reload=False,
 )
 
 
+@lru_cache(maxsize=1024)
+def _compile(template_body: str) -> Template:
+    """Скомпилированный шаблон по тексту: изменение текста — новый ключ."""
+    return _env.from_string(template_body)
+
+
 def render_from_string(template_body: str, variables: dict[str, Any]) -> str:
-    template = _env.from_string(template_body)
-    return template.render(**(variables or {}))
+    return _compile(template_body).render(**(variables or {}))
 
 
 def render_from_file(template_name: str, variables: dict[str, Any]) -> str:
@@ -8,13 +8,12 @@ from __future__ import annotations
 from .services.bots import BotRegistry
 
 
+_HTML_ESCAPES = str.maketrans({"&": "&amp;", "<": "&lt;", ">": "&gt;"})
+
+
 def escape_html(text: str) -> str:
     """Экранирование HTML-спецсимволов для Telegram parse_mode=HTML."""
-    return (
-        text.replace("&", "&amp;")
-        .replace("<", "&lt;")
-        .replace(">", "&gt;")
-    )
+    return text.translate(_HTML_ESCAPES)
 
 
 async def resolve_bot_context(bot_id: int | None) -> tuple[str, int | None]:
@@ -0,0 +1,33 @@
+-- 18_calendar_indexes.sql — Индексы под горячие запросы модуля «Календарь»
+--
+-- (calendar_id, start_at, position) для list_entries и
+-- (entry_id, created_at DESC) для истории уже есть в 11_calendar.sql,
+-- индекс get_due_entries — в 20_calendar_due_at.sql.
+
+-- get_upcoming / list_entries(status=...): диапазон по start_at без сортировки
+CREATE INDEX IF NOT EXISTS idx_cal_entries_calendar_status_start
+    ON calendar_entries (calendar_id, status, start_at);
+
+-- (calendar_id, status) — префикс индекса выше
+DROP INDEX IF EXISTS idx_cal_entries_calendar_status;
+
+-- get_budget: окно по created_at внутри календаря, index-only scan
+CREATE INDEX IF NOT EXISTS idx_cal_entries_budget
+    ON calendar_entries (calendar_id, created_at)
+    INCLUDE (cost_estimate, source_module);
+
+-- get_budget по модулю (в т.ч. без calendar_id)
+CREATE INDEX IF NOT EXISTS idx_cal_entries_budget_source
+    ON calendar_entries (source_module, created_at)
+    INCLUDE (cost_estimate)
+    WHERE source_module IS NOT NULL;
+
+-- (source_module) WHERE source_module IS NOT NULL — префикс индекса выше
+DROP INDEX IF EXISTS idx_cal_entries_source;
+
+-- list_entries: keyset-пагинация по (start_at, position, id) внутри календаря
+CREATE INDEX IF NOT EXISTS idx_cal_entries_keyset
+    ON calendar_entries (calendar_id, start_at, position, id);
+
+-- (calendar_id, start_at, position) из 11_calendar.sql — префикс индекса выше
+DROP INDEX IF EXISTS idx_cal_entries_sort;
@@ -0,0 +1,76 @@
+-- 19_calendar_chain_root.sql — Денормализованный корень цепочки записей
+--
+-- root_id = id корневой записи (parent_id IS NULL) для каждой записи.
+-- get_linked_chain читает цепочку одним range scan по (root_id, start_at)
+-- вместо рекурсии вверх до корня и обратно вниз.
+
+ALTER TABLE calendar_entries ADD COLUMN IF NOT EXISTS root_id BIGINT;
+
+-- Бэкфилл: обход от корней вниз
+WITH RECURSIVE tree AS (
+    SELECT id, id AS root_id FROM calendar_entries WHERE parent_id IS NULL
+    UNION ALL
+    SELECT ce.id, t.root_id FROM calendar_entries ce
+    JOIN tree t ON ce.parent_id = t.id
+)
+UPDATE calendar_entries ce
+SET root_id = tree.root_id
+FROM tree
+WHERE ce.id = tree.id AND ce.root_id IS DISTINCT FROM tree.root_id;
+
+CREATE INDEX IF NOT EXISTS idx_cal_entries_root_start
+    ON calendar_entries (root_id, start_at);
+
+-- BEFORE: root_id новой/перепривязанной записи = root_id родителя (или свой id)
+CREATE OR REPLACE FUNCTION cal_entries_set_root_id()
+RETURNS TRIGGER AS $$
+BEGIN
+    IF NEW.parent_id IS NULL THEN
+        NEW.root_id = NEW.id;
+    ELSE
+        SELECT COALESCE(root_id, id) INTO NEW.root_id
+        FROM calendar_entries WHERE id = NEW.parent_id;
+    END IF;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- AFTER: при смене parent_id переносим поддерево на новый корень
+CREATE OR REPLACE FUNCTION cal_entries_propagate_root_id()
+RETURNS TRIGGER AS $$
+BEGIN
+    WITH RECURSIVE subtree AS (
+        SELECT id FROM calendar_entries WHERE parent_id = NEW.id
+        UNION ALL
+        SELECT ce.id FROM calendar_entries ce
+        JOIN subtree s ON ce.parent_id = s.id
+    )
+    UPDATE calendar_entries
+    SET root_id = NEW.root_id
+    WHERE id IN (SELECT id FROM subtree)
+      AND root_id IS DISTINCT FROM NEW.root_id;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$ BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_trigger WHERE tgname = 'trg_cal_entries_root_id'
+    ) THEN
+        CREATE TRIGGER trg_cal_entries_root_id
+            BEFORE INSERT OR UPDATE OF parent_id ON calendar_entries
+            FOR EACH ROW EXECUTE FUNCTION cal_entries_set_root_id();
+    END IF;
+END $$;
+
+DO $$ BEGIN
+    IF NOT EXISTS (
+        SELECT 1 FROM pg_trigger WHERE tgname = 'trg_cal_entries_root_id_propagate'
+    ) THEN
+        CREATE TRIGGER trg_cal_entries_root_id_propagate
+            AFTER UPDATE OF parent_id ON calendar_entries
+            FOR EACH ROW
+            WHEN (OLD.root_id IS DISTINCT FROM NEW.root_id)
+            EXECUTE FUNCTION cal_entries_propagate_root_id();
+    END IF;
+END $$;
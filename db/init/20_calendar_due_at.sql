@@ -0,0 +1,13 @@
+-- 20_calendar_due_at.sql — Единое время срабатывания для get_due_entries
+--
+-- due_at = next_tick_at для мониторов, trigger_at для остальных.
+-- Вместо OR по entry_type — один range scan по частичному индексу.
+
+ALTER TABLE calendar_entries ADD COLUMN IF NOT EXISTS due_at TIMESTAMPTZ
+    GENERATED ALWAYS AS (
+        CASE WHEN entry_type = 'monitor' THEN next_tick_at ELSE trigger_at END
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_cal_entries_due_at
+    ON calendar_entries (priority DESC, due_at ASC)
+    WHERE status = 'active' AND trigger_status = 'pending' AND due_at IS NOT NULL;
@@ -0,0 +1,11 @@
+-- 21_calendar_history_brin.sql — Индекс истории календаря для выборок по времени
+--
+-- get_entry_history уже обслуживается idx_cal_history_entry
+-- (entry_id, created_at DESC) из 11_calendar.sql: index scan без Sort.
+-- calendar_entry_history пишется только append-ом, created_at растёт вместе
+-- с физическим порядком строк — для диапазонных сканов (ротация, аналитика
+-- по периоду) хватает BRIN, который на порядки меньше btree.
+
+CREATE INDEX IF NOT EXISTS idx_cal_history_created_brin
+    ON calendar_entry_history USING BRIN (created_at)
+    WITH (pages_per_range = 32);
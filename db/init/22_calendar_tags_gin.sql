@@ -0,0 +1,17 @@
+-- 22_calendar_tags_gin.sql — Составной GIN-индекс для фильтра по тегам
+--
+-- list_entries всегда фильтрует по calendar_id, а tags @> %s::text[] —
+-- опционально. С btree_gin оба условия закрываются одним GIN-индексом
+-- (calendar_id, tags); многоколоночный GIN работает и по одному tags,
+-- поэтому одиночный idx_cal_entries_tags при этом становится лишним.
+-- Если contrib-расширение недоступно — остаётся индекс из 11_calendar.sql.
+
+DO $$
+BEGIN
+    IF EXISTS (SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gin') THEN
+        CREATE EXTENSION IF NOT EXISTS btree_gin;
+        CREATE INDEX IF NOT EXISTS idx_cal_entries_calendar_tags
+            ON calendar_entries USING GIN (calendar_id, tags);
+        DROP INDEX IF EXISTS idx_cal_entries_tags;
+    END IF;
+END $$;
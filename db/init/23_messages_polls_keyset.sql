@@ -0,0 +1,18 @@
+-- 23_messages_polls_keyset.sql — Индексы под keyset-пагинацию сообщений и опросов
+--
+-- list_messages / list_polls сортируют по (created_at DESC, id DESC) и
+-- листают курсором (created_at, id) < (...). С этими индексами страница —
+-- range scan на limit строк независимо от глубины, без OFFSET и Sort.
+
+CREATE INDEX IF NOT EXISTS idx_messages_created_keyset
+    ON messages (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_messages_chat_created_keyset
+    ON messages (chat_id, created_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_polls_created_keyset
+    ON polls (created_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_polls_chat_created_keyset
+    ON polls (chat_id, created_at DESC, id DESC);
+
+-- Префикс (chat_id) покрывается составным индексом выше
+DROP INDEX IF EXISTS polls_chat_id_idx;
@@ -0,0 +1,19 @@
+-- 24_prediction_bets_indexes.sql — Индексы под разрешение событий и ставки пользователя
+--
+-- resolve_event выбирает активные ставки события (id, option_id, user_id,
+-- amount): частичный покрывающий индекс отдаёт их index-only scan'ом,
+-- не трогая heap и уже рассчитанные ставки.
+--
+-- list_user_bets сортирует ставки пользователя по created_at DESC —
+-- составной индекс отдаёт страницу без Sort.
+
+CREATE INDEX IF NOT EXISTS idx_prediction_bets_event_active
+    ON prediction_bets (event_id)
+    INCLUDE (id, option_id, user_id, amount)
+    WHERE status = 'active';
+
+CREATE INDEX IF NOT EXISTS idx_prediction_bets_user_created
+    ON prediction_bets (user_id, created_at DESC);
+
+-- Префикс (user_id) покрывается составным индексом выше
+DROP INDEX IF EXISTS idx_prediction_bets_user;
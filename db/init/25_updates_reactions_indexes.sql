@@ -0,0 +1,19 @@
+-- 25_updates_reactions_indexes.sql — Индексы под ленту апдейтов и реакции сообщения
+--
+-- list_updates сортирует webhook_updates по received_at DESC (опционально
+-- с фильтром update_type) — составные индексы отдают страницу range scan'ом
+-- без Sort; id — tie-breaker для стабильного порядка при равном received_at.
+--
+-- get_message_reactions выбирает реакции сообщения (chat_id,
+-- telegram_message_id) в порядке date DESC — порядок берётся из индекса.
+
+CREATE INDEX IF NOT EXISTS idx_webhook_updates_received
+    ON webhook_updates (received_at DESC, id DESC);
+CREATE INDEX IF NOT EXISTS idx_webhook_updates_type_received
+    ON webhook_updates (update_type, received_at DESC, id DESC);
+
+CREATE INDEX IF NOT EXISTS idx_message_reactions_chat_msg_date
+    ON message_reactions (chat_id, telegram_message_id, date DESC);
+
+-- Префикс (chat_id, telegram_message_id) покрывается составным индексом выше
+DROP INDEX IF EXISTS message_reactions_chat_msg_idx;
@@ -0,0 +1,7 @@
+-- 26_reactions_keyset.sql — Индекс под keyset-пагинацию реакций
+--
+-- list_reactions сортирует по (date DESC, id DESC) и листает курсором
+-- (date, id) < (...). Лента апдейтов использует индексы из 25_*.
+
+CREATE INDEX IF NOT EXISTS idx_message_reactions_date_keyset
+    ON message_reactions (date DESC, id DESC);
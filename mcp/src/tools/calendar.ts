@@ -159,6 +159,10 @@ export function register(apiRequest: ApiRequestFn): ToolDef[] {
         source_module: z.string().optional().describe("Фильтр по модулю-источнику"),
         limit: z.number().int().min(1).max(500).optional().default(50),
         offset: z.number().int().min(0).optional().default(0),
+        cursor: z
+          .string()
+          .optional()
+          .describe("next_cursor из предыдущего ответа (keyset-пагинация вместо offset)"),
       }),
       execute: async (params) => {
         const qs = new URLSearchParams();
@@ -176,6 +180,7 @@ export function register(apiRequest: ApiRequestFn): ToolDef[] {
         if (params.source_module) qs.set("source_module", params.source_module);
         qs.set("limit", String(params.limit));
         qs.set("offset", String(params.offset));
+        if (params.cursor) qs.set("cursor", params.cursor);
         return apiRequest(`/v1/calendar/entries?${qs.toString()}`);
       },
     },
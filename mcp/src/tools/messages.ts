@@ -57,6 +57,10 @@ export function register(apiRequest: ApiRequestFn): ToolDef[] {
         status: z.string().optional(),
         limit: z.number().int().min(1).max(500).optional().default(50),
         offset: z.number().int().min(0).optional().default(0),
+        cursor: z
+          .string()
+          .optional()
+          .describe("next_cursor из предыдущего ответа (keyset-пагинация вместо offset)"),
       }),
       execute: async (params) => {
         const qs = new URLSearchParams();
@@ -65,6 +69,7 @@ export function register(apiRequest: ApiRequestFn): ToolDef[] {
         if (params.status) qs.set("status", params.status);
         qs.set("limit", String(params.limit));
         qs.set("offset", String(params.offset));
+        if (params.cursor) qs.set("cursor", params.cursor);
         return apiRequest(`/v1/messages?${qs.toString()}`);
       },
     },
@@ -49,6 +49,10 @@ export function register(apiRequest: ApiRequestFn): ToolDef[] {
         bot_id: z.number().int().optional(),
         limit: z.number().int().min(1).max(500).optional().default(50),
         offset: z.number().int().min(0).optional().default(0),
+        cursor: z
+          .string()
+          .optional()
+          .describe("next_cursor из предыдущего ответа (keyset-пагинация вместо offset)"),
       }),
       execute: async (params) => {
         const qs = new URLSearchParams();
@@ -56,6 +60,7 @@ export function register(apiRequest: ApiRequestFn): ToolDef[] {
         if (params.bot_id !== undefined) qs.set("bot_id", String(params.bot_id));
         qs.set("limit", String(params.limit));
         qs.set("offset", String(params.offset));
+        if (params.cursor) qs.set("cursor", params.cursor);
         return apiRequest(`/v1/polls?${qs.toString()}`);
       },
     },
@@ -85,12 +90,17 @@ export function register(apiRequest: ApiRequestFn): ToolDef[] {
         limit: z.number().int().min(1).max(500).optional().default(100),
         offset: z.number().int().min(0).optional().default(0),
         update_type: z.string().optional().describe("Тип обновления: message, callback_query, edited_message и т.д."),
+        cursor: z
+          .string()
+          .optional()
+          .describe("next_cursor из предыдущего ответа (keyset-пагинация вместо offset)"),
       }),
       execute: async (params) => {
         const qs = new URLSearchParams();
         qs.set("limit", String(params.limit));
         qs.set("offset", String(params.offset));
         if (params.update_type) qs.set("update_type", params.update_type);
+        if (params.cursor) qs.set("cursor", params.cursor);
         return apiRequest(`/v1/updates?${qs.toString()}`);
       },
     },
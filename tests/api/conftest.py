@@ -0,0 +1,66 @@
+"""Pytest fixtures для тестов api.
+
+Интеграционные тесты (маркер integration) ходят в реальную PostgreSQL
+со схемой из db/init (DB_DSN) и пропускаются автоматически, если БД
+недоступна.
+"""
+
+from __future__ import annotations
+
+import sys
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+
+ROOT = Path(__file__).resolve().parents[2]
+sys.path.insert(0, str(ROOT / "api"))
+
+
+def _db_reachable() -> bool:
+    """Проверка что БД доступна (синхронно, для маркировки тестов)."""
+    try:
+        import psycopg
+
+        from app.config import get_settings
+
+        with psycopg.connect(get_settings().db_dsn, connect_timeout=2):
+            return True
+    except Exception:
+        return False
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "integration: тест с реальной БД (DB_DSN)")
+
+
+def pytest_collection_modifyitems(config, items):
+    """Пропустить integration-тесты если БД недоступна."""
+    if not any("integration" in item.keywords for item in items) or _db_reachable():
+        return
+    skip = pytest.mark.skip(reason="БД недоступна (integration tests)")
+    for item in items:
+        if "integration" in item.keywords:
+            item.add_marker(skip)
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def db():
+    """Открытый пул соединений на всю сессию (пул не переоткрывается)."""
+    from app.db import close_pool, init_pool
+
+    await init_pool()
+    yield
+    await close_pool()
+
+
+@pytest_asyncio.fixture(scope="session", loop_scope="session")
+async def client(db):
+    """Async HTTP client для FastAPI поверх открытого пула (без lifespan)."""
+    from httpx import ASGITransport, AsyncClient
+
+    from app.main import app
+
+    transport = ASGITransport(app=app)
+    async with AsyncClient(transport=transport, base_url="http://test") as c:
+        yield c
@@ -0,0 +1,83 @@
+"""Процессный TTL-кеш: ключи, теги и защита от устаревших чтений."""
+
+from __future__ import annotations
+
+import asyncio
+import uuid
+
+import pytest
+
+from app.cache import cached, invalidate, invalidate_tag
+
+pytestmark = pytest.mark.asyncio(loop_scope="session")
+
+
+def _counting_reader(tag: str | None = None):
+    """Чтение, которое считает обращения к «БД» по каждому id."""
+    prefix = uuid.uuid4().hex
+    calls: dict[int, int] = {}
+
+    @cached(lambda item_id: f"{prefix}:{item_id}", ttl=60, tag=tag)
+    async def read(item_id: int) -> dict:
+        calls[item_id] = calls.get(item_id, 0) + 1
+        return {"id": item_id, "version": calls[item_id]}
+
+    return read, calls, prefix
+
+
+async def test_second_read_is_cached() -> None:
+    read, calls, _ = _counting_reader()
+    assert await read(1) == {"id": 1, "version": 1}
+    assert await read(1) == {"id": 1, "version": 1}
+    assert calls == {1: 1}
+
+
+async def test_invalidate_tag_drops_all_tagged_keys() -> None:
+    tag = f"tag-{uuid.uuid4().hex}"
+    read, calls, _ = _counting_reader(tag)
+    other, other_calls, _ = _counting_reader()
+    await read(1)
+    await read(2)
+    await other(1)
+
+    invalidate_tag(tag)
+
+    assert (await read(1))["version"] == 2
+    assert (await read(2))["version"] == 2
+    assert (await other(1))["version"] == 1
+    assert calls == {1: 2, 2: 2}
+    assert other_calls == {1: 1}
+
+
+async def test_invalidate_key_drops_only_that_key() -> None:
+    read, _, prefix = _counting_reader()
+    await read(1)
+    await read(2)
+
+    invalidate(f"{prefix}:1")
+
+    assert (await read(1))["version"] == 2
+    assert (await read(2))["version"] == 1
+
+
+async def test_read_started_before_invalidation_is_not_cached() -> None:
+    tag = f"tag-{uuid.uuid4().hex}"
+    started = asyncio.Event()
+    release = asyncio.Event()
+    calls = {"n": 0}
+
+    @cached(lambda: f"{tag}:slow", ttl=60, tag=tag)
+    async def slow_read() -> int:
+        calls["n"] += 1
+        started.set()
+        await release.wait()
+        return calls["n"]
+
+    pending = asyncio.create_task(slow_read())
+    await started.wait()
+    invalidate_tag(tag)  # запись произошла, пока чтение было в полёте
+    release.set()
+    assert await pending == 1
+
+    # Устаревший результат не попал в кеш — следующее чтение идёт в «БД»
+    assert await slow_read() == 2
@@ -0,0 +1,37 @@
+"""История календаря: фоновая очередь и flush_history()."""
+
+from __future__ import annotations
+
+import asyncio
+import uuid
+
+import pytest
+
+from app.services import calendar as cal_svc
+
+pytestmark = [pytest.mark.asyncio(loop_scope="session"), pytest.mark.integration]
+
+
+async def test_flush_history_writes_queued_rows(db) -> None:
+    cal_svc.start_history_writer()
+    try:
+        calendar = await cal_svc.create_calendar(slug=f"hist-{uuid.uuid4().hex[:12]}", title="History")
+        entry = await cal_svc.create_entry(
+            calendar_id=calendar["id"], title="Entry", start_at="2026-01-01T10:00:00+00:00",
+        )
+        # writer вынимает "created" из очереди и ждёт интервал пачки
+        await asyncio.sleep(0.01)
+        await cal_svc._record_history(entry["id"], "updated", {"title": "Entry 2"}, "tester")
+        await cal_svc._record_history(entry["id"], "status_changed", {"status": "done"}, "tester")
+
+        # Без ожидания интервала writer'а: flush дописывает очередь
+        # и дожидается пачки, которую writer уже вынул
+        await cal_svc.flush_history()
+        history = await cal_svc.get_entry_history(entry["id"])
+    finally:
+        await cal_svc.stop_history_writer()
+
+    assert sorted(row["action"] for row in history) == ["created", "status_changed", "updated"]
+    updated = next(row for row in history if row["action"] == "updated")
+    assert updated["changes"] == {"title": "Entry 2"}
+    assert updated["performed_by"] == "tester"
@@ -0,0 +1,54 @@
+"""Keyset-курсоры: кодирование/разбор и отказ на битом курсоре."""
+
+from __future__ import annotations
+
+from datetime import datetime, timezone
+
+import pytest
+
+from app.db import created_cursor, decode_created_cursor
+from app.services import calendar as cal_svc
+
+_AT = datetime(2026, 10, 17, 12, 30, 15, 123456, tzinfo=timezone.utc)
+
+_BAD_CURSORS = ("garbage", "W10=", "WyJub3QtYS1kYXRlIiwgMV0=")  # мусор, [], ["not-a-date", 1]
+
+
+def test_created_cursor_round_trip() -> None:
+    cursor = created_cursor({"created_at": _AT, "id": 42})
+    assert decode_created_cursor(cursor) == (_AT, 42)
+
+
+def test_created_cursor_custom_column() -> None:
+    cursor = created_cursor({"received_at": _AT, "id": 7}, "received_at")
+    assert decode_created_cursor(cursor) == (_AT, 7)
+
+
+def test_entry_cursor_round_trip() -> None:
+    cursor = cal_svc.entry_cursor({"start_at": _AT, "position": 3, "id": 11})
+    assert cal_svc._decode_entry_cursor(cursor) == (_AT, 3, 11)
+
+
+@pytest.mark.parametrize("cursor", _BAD_CURSORS)
+def test_malformed_cursor_raises_value_error(cursor: str) -> None:
+    with pytest.raises(ValueError):
+        decode_created_cursor(cursor)
+    with pytest.raises(ValueError):
+        cal_svc._decode_entry_cursor(cursor)
+
+
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.integration
+@pytest.mark.parametrize("path", ["/v1/updates", "/v1/messages", "/v1/polls", "/v1/reactions"])
+@pytest.mark.parametrize("cursor", _BAD_CURSORS)
+async def test_malformed_cursor_is_400(client, path: str, cursor: str) -> None:
+    resp = await client.get(path, params={"cursor": cursor})
+    assert resp.status_code == 400
+
+
+@pytest.mark.asyncio(loop_scope="session")
+@pytest.mark.integration
+@pytest.mark.parametrize("cursor", _BAD_CURSORS)
+async def test_malformed_entry_cursor_is_400(client, cursor: str) -> None:
+    resp = await client.get("/v1/calendar/entries", params={"calendar_id": 1, "cursor": cursor})
+    assert resp.status_code == 400
@@ -0,0 +1,98 @@
+"""POST /v1/updates/import: повторный импорт ничего не меняет."""
+
+from __future__ import annotations
+
+import random
+
+import pytest
+
+from app.db import fetch_all
+
+pytestmark = [pytest.mark.asyncio(loop_scope="session"), pytest.mark.integration]
+
+
+def _ids() -> tuple[int, int, int, int]:
+    """Уникальные chat/user/admin/update_id, чтобы не задеть чужие строки."""
+    base = random.randint(10**9, 2 * 10**9)
+    return -base, base, base + 1, base * 10
+
+
+async def _snapshot(chat_id: int, user_ids: list[int], first_update_id: int) -> dict[str, list[dict]]:
+    users = [str(user_id) for user_id in user_ids]
+    return {
+        "users": await fetch_all(
+            "SELECT user_id, first_name, message_count FROM users WHERE user_id = ANY(%s) ORDER BY user_id",
+            [users],
+        ),
+        "members": await fetch_all(
+            "SELECT user_id, status, message_count FROM chat_members WHERE chat_id = %s ORDER BY user_id",
+            [str(chat_id)],
+        ),
+        "messages": await fetch_all(
+            "SELECT telegram_message_id, text FROM messages WHERE chat_id = %s ORDER BY telegram_message_id",
+            [str(chat_id)],
+        ),
+        "updates": await fetch_all(
+            "SELECT update_id, update_type, chat_id, user_id FROM webhook_updates "
+            "WHERE update_id BETWEEN %s AND %s ORDER BY update_id",
+            [first_update_id, first_update_id + 100],
+        ),
+    }
+
+
+async def test_reimport_same_payload_changes_nothing(client) -> None:
+    chat_id, user_id, admin_id, update_id = _ids()
+    chat = {"id": chat_id, "type": "supergroup", "title": "Import"}
+    user = {"id": user_id, "is_bot": False, "first_name": "Member"}
+    admin = {"id": admin_id, "is_bot": False, "first_name": "Admin"}
+    payload = [
+        {"update_id": update_id, "message": {"message_id": 1, "chat": chat, "from": user, "text": "a", "date": 0}},
+        {"update_id": update_id + 1, "message": {"message_id": 2, "chat": chat, "from": user, "text": "b", "date": 0}},
+        {
+            "update_id": update_id + 2,
+            "chat_member": {
+                "chat": chat,
+                "from": admin,
+                "date": 0,
+                "old_chat_member": {"status": "left", "user": user},
+                "new_chat_member": {"status": "member", "user": user},
+            },
+        },
+    ]
+
+    first = await client.post("/v1/updates/import", json=payload)
+    assert first.status_code == 200
+    assert first.json() == {"ok": True, "count": 3}
+    before = await _snapshot(chat_id, [user_id, admin_id], update_id)
+
+    again = await client.post("/v1/updates/import", json=payload)
+    assert again.status_code == 200
+    assert await _snapshot(chat_id, [user_id, admin_id], update_id) == before
+
+    # Счётчики users и chat_members совпадают; участник из chat_member —
+    # new_chat_member.user, автор изменения в users не попадает
+    assert before["users"] == [{"user_id": str(user_id), "first_name": "Member", "message_count": 2}]
+    assert before["members"] == [{"user_id": str(user_id), "status": "member", "message_count": 2}]
+    assert [row["user_id"] for row in before["updates"]] == [str(user_id)] * 3
+
+
+async def test_repeated_update_id_in_payload_counts_once(client) -> None:
+    chat_id, user_id, _, update_id = _ids()
+    update = {
+        "update_id": update_id,
+        "message": {
+            "message_id": 1,
+            "chat": {"id": chat_id, "type": "group", "title": "Dup"},
+            "from": {"id": user_id, "is_bot": False, "first_name": "Dup"},
+            "text": "x",
+            "date": 0,
+        },
+    }
+
+    response = await client.post("/v1/updates/import", json=[update, update])
+    assert response.status_code == 200
+    assert response.json()["count"] == 1
+
+    snapshot = await _snapshot(chat_id, [user_id], update_id)
+    assert [row["message_count"] for row in snapshot["users"]] == [1]
+    assert [row["message_count"] for row in snapshot["members"]] == [1]